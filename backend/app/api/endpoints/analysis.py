@@ -1,49 +1,384 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse
-from typing import Annotated
-from app.schemas import AnalysisResponse, AnalysisResult, RiskItem
-from app.services.ocr import ocr_service
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from app.schemas import AnalysisResponse, AnalysisResult, HistoryEntry, HistoryPage, JobStatus, RiskItem, SimilarClauses
 from app.services.logic import risk_engine
 from app.services.llm import llm_service
-# from app.services.report_generator import generate_pdf_report
-import shutil
+from app.services.ml_service import ml_service
+from app.services.result_cache import result_cache
+from app.services.clause_index import clause_search
+from app.services.embedding_server import EmbeddingClient
+from app.services.history import history_entry, history_service
+from app.services.jobs import job_service
+from app.services.pipeline import (
+    extract_text, analyze_streamed, cached_risks, cached_clause_map, cache_clause_map, analyze_revision, analyze_risks, index_clauses, save_analysis, to_result
+)
+from app.services.segmenter import segment_clauses
+from app.services.upload_store import StoredUpload, UploadTooLarge, upload_store
+import asyncio
+from datetime import datetime
+import json
 import os
 from app.core.config import settings
+from app.core.executor import run_cpu_bound
 
 router = APIRouter()
 
+async def _store_upload(file: UploadFile) -> StoredUpload:
+    """Stream the upload into the content-addressed store; 413 past UPLOAD_MAX_BYTES."""
+    try:
+        return await upload_store.ingest(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_contract(
     file: UploadFile = File(...),
-    user_explanation: str = Form(...)
+    user_explanation: str = Form(...),
+    async_job: bool = Form(False),
+    report: bool = Form(False),
+    user_id: str = Form("anonymous"),
+    previous_analysis_id: Optional[int] = Form(None)
 ):
+    """
+    Analyze a contract. With async_job=true the analysis runs as a background job
+    instead: the response is 202 with a job id to poll at /jobs/{job_id}.
+    report=true also renders the PDF report (background jobs only).
+    previous_analysis_id marks the upload as a revision of an earlier analysis:
+    only the clauses that changed are re-analyzed, and the response lists them.
+    """
+    previous = None
+    if previous_analysis_id is not None:
+        previous = await run_in_threadpool(history_service.get, previous_analysis_id, user_id)
+        if previous is None:
+            raise HTTPException(status_code=404, detail="Previous analysis not found.")
+
+    if async_job:
+        # The job reads the stored file by path; the store keeps recently used files
+        upload = await _store_upload(file)
+        record = await job_service.submit(
+            upload.path, upload.sha256, user_explanation, report, user_id, file.filename, previous_analysis_id
+        )
+        return JSONResponse(_job_status(record).model_dump(), status_code=202)
+
     # 1. Save file
-    os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
-    file_path = f"{settings.UPLOAD_FOLDER}/{file.filename}"
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    upload = await _store_upload(file)
     
     # 2. OCR/Extract Text
-    contract_text = ocr_service.process_file(file_path)
-    if not contract_text:
+    contract_text = await extract_text(upload.path, upload.sha256, upload.data)
+    if contract_text == "":
         raise HTTPException(status_code=400, detail="Could not extract text from file.")
     
-    # 3. Analyze Risks (Deterministic/ML)
-    risk_data = risk_engine.analyze(contract_text, user_explanation)
+    # 3. Analyze Risks (Deterministic/ML); a revision re-analyzes only its changed clauses
+    clause_map = revision = None
+    if contract_text is None:
+        # Too long to hold in memory: analyzed as it is read, without clause map or revision
+        risk_data = await analyze_streamed(upload.path, user_explanation, upload.data)
+        if risk_data is None:
+            raise HTTPException(status_code=400, detail="Could not extract text from file.")
+    elif previous is not None:
+        risk_data, clause_map, revision = await analyze_revision(contract_text, user_explanation, previous)
+    else:
+        risk_data, clause_map = await analyze_risks(contract_text, user_explanation)
+    
+    # 4. Generate AI Explanation & Negotiation (LLM), both at once
+    explanation, negotiation_email = await llm_service.agenerate_all(risk_data, user_explanation)
     
-    # 4. Generate AI Explanation & Negotiation (LLM)
-    explanation = llm_service.generate_explanation(risk_data, user_explanation)
-    negotiation_email = llm_service.generate_negotiation_email(risk_data)
+    analysis_result = to_result(risk_data, explanation, negotiation_email)
     
-    analysis_result = AnalysisResult(
-        score=risk_data["score"],
-        risks=[RiskItem(**r) for r in risk_data["risks"]],
-        contract_summary=risk_data["contract_summary"],
-        explanation=explanation,
-        negotiation_email=negotiation_email
+    # 5. Save to history and the clause index
+    analysis_id = await save_analysis(
+        history_entry(risk_data, user_id, file.filename, upload.sha256, user_explanation, explanation, negotiation_email),
+        contract_text,
+        clause_map
     )
     
-    return AnalysisResponse(analysis=analysis_result)
+    return AnalysisResponse(analysis=analysis_result, analysis_id=analysis_id, revision=revision)
+
+def _sse(event: str, data) -> str:
+    payload = data.model_dump_json() if isinstance(data, AnalysisResult) else json.dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+async def _merge_streams(streams: dict):
+    """Interleave several async generators, yielding (name, item) as items arrive."""
+    queue = asyncio.Queue()
+    done = object()
+
+    async def pump(name, stream):
+        try:
+            async for item in stream:
+                await queue.put((name, item))
+        finally:
+            await queue.put((name, done))
+
+    tasks = [asyncio.create_task(pump(name, stream)) for name, stream in streams.items()]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            name, item = await queue.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield name, item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def _analysis_events(upload: StoredUpload, user_explanation: str, user_id: str, file_name: str):
+    # 1. Extracted text
+    contract_text = await extract_text(upload.path, upload.sha256, upload.data)
+    streamed = None
+    if contract_text is None:
+        # Too long to hold in memory: analyzed as it is read (no clause map)
+        streamed = await analyze_streamed(upload.path, user_explanation, upload.data)
+    if not contract_text and streamed is None:
+        yield _sse("error", {"detail": "Could not extract text from file."})
+        return
+
+    if streamed is not None:
+        yield _sse("text", {"streamed": True, "contract_summary": streamed["contract_summary"]})
+        risk_data, engine_version = streamed, None
+    else:
+        yield _sse("text", {"characters": len(contract_text), "contract_summary": contract_text[:200] + "..."})
+        risk_data, engine_version = await cached_risks(contract_text, user_explanation)
+
+    clause_map = None
+    if risk_data is not None:
+        # Streamed or cache hit: both scoring stages are already done
+        if streamed is None:
+            clause_map = await cached_clause_map(contract_text)
+        yield _sse("rules", to_result(risk_data))
+        yield _sse("semantic", to_result(risk_data))
+    else:
+        # 2. Deterministic findings
+        spans = await run_cpu_bound(segment_clauses, contract_text)
+        risks, score = await run_cpu_bound(risk_engine.analyze_rules, contract_text, user_explanation, spans)
+        yield _sse("rules", to_result(risk_engine.build_result(contract_text, risks, score)))
+
+        # 3. Semantic findings, kept per clause for the clause map
+        findings = await run_cpu_bound(ml_service.clause_findings, contract_text, spans)
+        semantic_risks, score = risk_engine.merge_semantic(risks, score, ml_service.assemble_findings(findings))
+        risk_data = risk_engine.build_result(contract_text, risks + semantic_risks, score)
+        if engine_version is not None:
+            await run_in_threadpool(result_cache.set_risks, contract_text, user_explanation, engine_version, risk_data)
+        yield _sse("semantic", to_result(risk_data))
+
+        if settings.REVISION_TRACKING_ENABLED:
+            clause_map = await run_cpu_bound(risk_engine.build_clause_map, contract_text, spans, findings, risk_data["risks"])
+            await cache_clause_map(contract_text, clause_map)
+
+    # 4. LLM tokens from both generations, interleaved as they arrive
+    parts = {"explanation": [], "negotiation_email": []}
+    streams = {
+        "explanation": llm_service.astream_explanation(risk_data, user_explanation),
+        "negotiation_email": llm_service.astream_negotiation_email(risk_data)
+    }
+    async for name, delta in _merge_streams(streams):
+        parts[name].append(delta)
+        yield _sse(name, {"delta": delta})
+
+    explanation, negotiation_email = "".join(parts["explanation"]), "".join(parts["negotiation_email"])
+    yield _sse("result", to_result(risk_data, explanation, negotiation_email))
+
+    # 5. History entry of the finished analysis
+    analysis_id = await save_analysis(
+        history_entry(risk_data, user_id, file_name, upload.sha256, user_explanation, explanation, negotiation_email),
+        contract_text,
+        clause_map
+    )
+    if analysis_id is not None:
+        yield _sse("history", {"analysis_id": analysis_id})
+
+@router.post("/analyze/stream")
+async def analyze_contract_stream(
+    file: UploadFile = File(...),
+    user_explanation: str = Form(...),
+    user_id: str = Form("anonymous")
+):
+    """
+    Same pipeline as /analyze, streamed as Server-Sent Events:
+    text -> rules -> semantic -> explanation/negotiation_email deltas -> result -> history.
+    """
+    upload = await _store_upload(file)
+    return StreamingResponse(
+        _analysis_events(upload, user_explanation, user_id, file.filename),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _score_group(group: list, user_explanation: str, user_id: str, filenames: list):
+    """Yield one NDJSON line per document of the group once the group is scored."""
+    texts = await asyncio.gather(*(extract_text(path, file_hash) for _, path, file_hash in group))
+
+    risk_data = {}
+    pending = []
+    for (index, path, _), text in zip(group, texts):
+        if text is None:
+            # Too long to hold in memory: analyzed on its own as it is read (not indexed)
+            streamed = await analyze_streamed(path, user_explanation)
+            if streamed is not None:
+                risk_data[index] = streamed
+        elif text:
+            cached, engine_version = await cached_risks(text, user_explanation)
+            if cached is not None:
+                risk_data[index] = cached
+            else:
+                pending.append((index, text, engine_version))
+
+    # Everything not cached is scored together: pooled encoder batches, parallel rules
+    scored = await run_cpu_bound(risk_engine.analyze_batch, [(text, user_explanation) for _, text, _ in pending])
+    for (index, text, engine_version), result in zip(pending, scored):
+        risk_data[index] = result
+        if engine_version is not None:
+            await run_in_threadpool(result_cache.set_risks, text, user_explanation, engine_version, result)
+
+    # One bulk insert per group
+    entries = [
+        history_entry(risk_data[index], user_id, filenames[index], file_hash, user_explanation)
+        for index, _, file_hash in group if index in risk_data
+    ]
+    analysis_ids = iter(await run_in_threadpool(history_service.record_many, entries))
+    for (index, _, file_hash), text in zip(group, texts):
+        if index in risk_data:
+            analysis_id = next(analysis_ids, None)
+            if text:
+                await index_clauses(analysis_id, file_hash, text, risk_data[index]["risks"])
+
+    lines = []
+    for index, _, _ in group:
+        if index in risk_data:
+            lines.append({"index": index, "analysis": to_result(risk_data[index]).model_dump()})
+        else:
+            lines.append({"index": index, "error": "Could not extract text from file."})
+    return lines
+
+async def _batch_lines(stored: list, filenames: list, user_explanation: str, user_id: str):
+    groups = [stored[i:i + settings.BATCH_GROUP_SIZE] for i in range(0, len(stored), settings.BATCH_GROUP_SIZE)]
+    # Extract/score the next group while the current one is being written out
+    next_group = asyncio.create_task(_score_group(groups[0], user_explanation, user_id, filenames)) if groups else None
+    for g in range(len(groups)):
+        lines = await next_group
+        if g + 1 < len(groups):
+            next_group = asyncio.create_task(_score_group(groups[g + 1], user_explanation, user_id, filenames))
+        for line in lines:
+            line["filename"] = filenames[line["index"]]
+            yield json.dumps(line) + "\n"
+
+@router.post("/analyze/batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    user_explanation: str = Form(""),
+    user_id: str = Form("anonymous")
+):
+    """
+    Score many contracts in one request (no LLM generation). Results stream back
+    as NDJSON, one line per document, as each group of BATCH_GROUP_SIZE finishes.
+    """
+    stored = []
+    for index, file in enumerate(files):
+        # By path only: holding every document's bytes until its group is scored would not be bounded
+        upload = await _store_upload(file)
+        stored.append((index, upload.path, upload.sha256))
+    return StreamingResponse(
+        _batch_lines(stored, [f.filename for f in files], user_explanation, user_id),
+        media_type="application/x-ndjson"
+    )
+
+def _job_status(record: dict) -> JobStatus:
+    job_id = record["job_id"]
+    return JobStatus(
+        job_id=job_id,
+        status=record["status"],
+        stage=record["stage"],
+        error=record["error"],
+        created_at=record["created_at"],
+        updated_at=record["updated_at"],
+        result_url=f"{settings.API_V1_STR}/jobs/{job_id}/result",
+        report_url=f"{settings.API_V1_STR}/jobs/{job_id}/report" if record["report"] else None
+    )
+
+async def _get_job(job_id: str) -> dict:
+    record = await job_service.get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return record
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def job_status(job_id: str):
+    """Status and current stage of a background analysis job"""
+    return _job_status(await _get_job(job_id))
+
+@router.get("/jobs/{job_id}/result", response_model=AnalysisResponse)
+async def job_result(job_id: str):
+    """The analysis once the job has completed; 202 with the job status while it is still running"""
+    record = await _get_job(job_id)
+    if record["status"] == "failed":
+        raise HTTPException(status_code=record["status_code"], detail=record["error"])
+    if record["status"] != "completed":
+        return JSONResponse(_job_status(record).model_dump(), status_code=202)
+    return record["result"]
+
+@router.get("/jobs/{job_id}/report")
+async def job_report(job_id: str):
+    """The PDF report of a completed job submitted with report=true"""
+    record = await _get_job(job_id)
+    if not record["report_path"] or not os.path.exists(record["report_path"]):
+        raise HTTPException(status_code=404, detail="Report not available.")
+    return FileResponse(record["report_path"], media_type="application/pdf", filename=f"ContractIQ_Report_{job_id}.pdf")
+
+@router.get("/history", response_model=HistoryPage)
+async def list_history(user_id: str = "anonymous", limit: int = 20, cursor: str = None):
+    """A user's analyses, newest first; follow next_cursor for older pages"""
+    limit = max(1, min(limit, 100))
+    try:
+        items, next_cursor = await run_in_threadpool(history_service.list_for_user, user_id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return HistoryPage(items=items, next_cursor=next_cursor)
+
+@router.get("/history/{analysis_id}", response_model=HistoryEntry)
+async def get_history_entry(analysis_id: int, user_id: str = "anonymous"):
+    """A stored analysis with its risks and LLM outputs"""
+    entry = await run_in_threadpool(history_service.get, analysis_id, user_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Analysis not found.")
+    return HistoryEntry(
+        id=entry.id,
+        created_at=entry.created_at,
+        file_name=entry.file_name,
+        score=entry.score,
+        contract_summary=entry.contract_summary,
+        document_hash=entry.document_hash,
+        user_explanation=entry.user_explanation,
+        analysis=to_result(
+            {"score": entry.score, "risks": entry.risks, "contract_summary": entry.contract_summary},
+            entry.explanation,
+            entry.negotiation_email
+        )
+    )
+
+@router.delete("/history/{analysis_id}")
+async def delete_history_entry(analysis_id: int, user_id: str = "anonymous"):
+    if not await run_in_threadpool(history_service.delete, analysis_id, user_id):
+        raise HTTPException(status_code=404, detail="Analysis not found.")
+    return {"deleted": analysis_id}
+
+@router.get("/clauses/similar", response_model=SimilarClauses)
+async def similar_clauses(text: str, user_id: str = "anonymous", k: int = 10, group_by_document: bool = True):
+    """The user's indexed clauses most similar to `text`; by default the best match per contract"""
+    if not clause_search.enabled:
+        raise HTTPException(status_code=503, detail="Clause index is not available.")
+    k = max(1, min(k, 100))
+    embedding = await run_cpu_bound(ml_service.embed_text, text)
+    if embedding is None:
+        raise HTTPException(status_code=503, detail="Embedding model is not available.")
+    matches = await run_in_threadpool(clause_search.similar, embedding, user_id, k, group_by_document)
+    return SimilarClauses(matches=matches)
+
+def _iter_bytes(data: bytes, chunk_size: int = 64 * 1024):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
 
 @router.post("/download-report")
 async def download_report(
@@ -52,6 +387,61 @@ async def download_report(
     explanation: str = Form(...),
     email: str = Form(...)
 ):
-    """Generate and download PDF report - Coming soon"""
-    return {"message": "PDF download feature coming soon. Please copy the email for now."}
+    """Generate the PDF report in memory and stream it back; risks is the JSON list from /analyze"""
+    # reportlab is only imported once a report is requested, keeping startup fast
+    from app.services.report_generator import generate_pdf_report
+    try:
+        risk_list = [RiskItem(**r).model_dump() for r in json.loads(risks)]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid risks: {e}")
+
+    # Rendering is CPU-bound; keep it off the event loop
+    pdf = await run_cpu_bound(generate_pdf_report, score, risk_list, explanation, email)
+    filename = f"ContractIQ_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return StreamingResponse(
+        _iter_bytes(pdf),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Content-Length": str(len(pdf))}
+    )
+
+
+@router.get("/stats/embedding-cache")
+async def embedding_cache_stats():
+    """Hit/miss counters and size of the sentence embedding cache"""
+    return ml_service.embedding_cache.stats()
+
+@router.get("/stats/encode-batching")
+async def encode_batching_stats():
+    """Batch size distribution and queueing delay of coalesced encode calls in this worker"""
+    if ml_service.batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **ml_service.batcher.stats()}
+
+@router.get("/stats/embedding-server")
+async def embedding_server_stats():
+    """Batching counters of the shared embedding server, if this worker uses one"""
+    if not isinstance(ml_service.model, EmbeddingClient):
+        return {"enabled": False}
+    return {"enabled": True, **await run_in_threadpool(ml_service.model.info)}
+
+@router.get("/stats/llm")
+async def llm_stats():
+    """Concurrency, rate limiting, retry and circuit breaker state of the Groq client, with token totals"""
+    if llm_service.client is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_service.client.stats()}
+
+@router.get("/stats/upload-store")
+async def upload_store_stats():
+    """Size bound and bytes held by the content-addressed upload store (as of its last scan in this worker)"""
+    return upload_store.stats()
+
+@router.get("/stats/clause-index")
+async def clause_index_stats():
+    """Size, layout and kNN status of the clause similarity index"""
+    return await run_in_threadpool(clause_search.stats)
 
+@router.get("/stats/result-cache")
+async def result_cache_stats():
+    """Hit/miss counters per layer of the analysis result cache"""
+    return result_cache.stats()
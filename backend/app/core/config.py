@@ -6,12 +6,94 @@ class Settings(BaseSettings):
     
     # Storage
     UPLOAD_FOLDER: str = "backend/data/uploads"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_MAX_BYTES: int = 25 * 1024 * 1024 # Per file; larger uploads get a 413
+    UPLOAD_MAX_REQUEST_BYTES: int = 200 * 1024 * 1024 # Whole request (batch uploads), checked against Content-Length
+    UPLOAD_MEMORY_MAX_BYTES: int = 8 * 1024 * 1024 # Uploads up to this size go to OCR from memory; larger ones are memory-mapped
+    UPLOAD_STORE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024 # Least recently used uploads are evicted beyond this
+    UPLOAD_STORE_MIN_AGE_SECONDS: float = 3600 # Uploads used more recently are never evicted (queued jobs still read them)
+
+    # Execution
+    CPU_WORKERS: int = 0 # Threads for OCR/scoring; 0 = min(4, cpu count)
+    OCR_WORKERS: int = 2 # Processes running docTR on scanned pages, one model each
+    OCR_MAX_PAGES_IN_FLIGHT: int = 4 # Cap on pages queued for rasterization at once
+    OCR_RENDER_SCALE: float = 2.0 # 144 dpi
+    OCR_MOCK_FALLBACK: bool = False # Dev only: analyze a built-in sample agreement when PDF/OCR dependencies are missing
+    BATCH_RULE_WORKERS: int = 0 # Processes for rule scans in batch analysis; 0 = cpu count
+    BATCH_GROUP_SIZE: int = 32 # Documents scored together per encoder pass in batch analysis
     
     # ML/AI
     GROQ_API_KEY: str = ""
+    GROQ_BASE_URL: str = "" # e.g. the fake server in benchmarks/ for load tests; empty = api.groq.com
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_CONCURRENCY: int = 16 # Groq calls in flight per process; the rest queue
+    LLM_REQUESTS_PER_MINUTE: int = 30 # Client-side limits matching the Groq plan; 0 = unlimited
+    LLM_TOKENS_PER_MINUTE: int = 12000
+    LLM_MAX_RETRIES: int = 3 # On 429, 5xx and connection errors, with jittered exponential backoff
+    LLM_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    LLM_BREAKER_FAILURES: int = 5 # Failed calls in a row before Groq is skipped (mock output) for the cooldown
+    LLM_BREAKER_COOLDOWN_SECONDS: float = 30.0
+    LLM_PROMPT_RISK_TOKENS: int = 1500 # Budget for the risk list in each prompt; least severe risks are left out beyond it
+    MODEL_READY_TIMEOUT_SECONDS: float = 0.0 # How long a request waits for model warm-up before going rule-only
+    EMBEDDING_BACKEND: str = "torch" # torch, torch-int8, onnx, onnx-int8
+    EMBEDDING_THREADS: int = 0 # Intra-op threads per worker for the embedding backend; 0 = library default
+    EMBEDDING_ONNX_INT8_FILE: str = "onnx/model_qint8_avx2.onnx" # Quantized export in the model repo
+    EMBEDDING_SERVER_SOCKET: str = "" # Unix socket of a shared embedding server; empty = each worker loads the model
+    EMBEDDING_SERVER_TIMEOUT_SECONDS: float = 30.0 # Per request, and how long warm-up waits for the server to come up
+    EMBEDDING_SERVER_MAX_BATCH: int = 256 # Sentences coalesced into one encode on the server
+    EMBEDDING_SERVER_MAX_WAIT_MS: float = 5.0 # How long the server waits for more requests to join a batch
+    ENCODE_BATCH_SIZE: int = 64
+    ENCODE_BATCH_MAX_WAIT_MS: float = 2.0 # How long concurrent encode calls in a worker wait to share one model call
+    ENCODE_BATCH_MAX_SENTENCES: int = 256 # Sentences per coalesced model call; reaching it dispatches immediately
+    EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    STREAMING_ANALYSIS_MIN_CHARS: int = 1_000_000 # Longer texts are analyzed in streaming mode (bounded memory); 0 = never
+    STREAM_PIECE_CHARS: int = 64 * 1024 # Text fed to the rules and segmenter at a time in streaming mode
+    STREAM_ENCODE_BATCH: int = 256 # Clauses encoded together in streaming mode
+    STREAM_TOP_K: int = 50 # Semantic findings kept per category in streaming mode
+    PATTERN_ARTIFACT_DIR: str = "backend/data/artifacts"
+    EMBEDDING_CACHE_DIR: str = "" # e.g. backend/data/embedding_cache; empty keeps the cache in memory only
+    
+    # Clause similarity index (FAISS)
+    CLAUSE_INDEX_ENABLED: bool = True
+    CLAUSE_INDEX_DIR: str = "backend/data/clause_index"
+    CLAUSE_INDEX_COMPACT_EVERY: int = 10000 # Clauses added before the delta is merged into the on-disk base
+    CLAUSE_INDEX_IVF_THRESHOLD: int = 100000 # Base switches from exact (flat) to IVF search at this size
+    CLAUSE_INDEX_NPROBE: int = 16
+    CLAUSE_KNN_K: int = 10
+    CLAUSE_KNN_MIN_SIMILARITY: float = 0.75 # Neighbours below this do not vote
+    CLAUSE_KNN_MIN_SHARE: float = 0.5 # Share of the vote a category needs to be reported
+    CLAUSE_KNN_MIN_LABELLED: int = 50 # kNN classification starts once this many labelled clauses are indexed
+    
+    # Result cache
+    RESULT_CACHE_BACKEND: str = "memory" # "memory" or "redis"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    RESULT_CACHE_MAX_ENTRIES: int = 1024 # memory backend only
+    TEXT_CACHE_TTL_SECONDS: int = 24 * 3600
+    RISK_CACHE_TTL_SECONDS: int = 24 * 3600
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
     
+    # Background jobs
+    JOB_QUEUE_BACKEND: str = "local" # "local" (in-process stages) or "celery"
+    CELERY_BROKER_URL: str = "" # empty = REDIS_URL
+    JOB_TTL_SECONDS: int = 24 * 3600
+    JOB_MAX_RECORDS: int = 10000 # local backend only
+    JOB_OCR_CONCURRENCY: int = 2 # Jobs in each stage at once (local), or threads per stage worker (celery)
+    JOB_SCORING_CONCURRENCY: int = 2
+    JOB_LLM_CONCURRENCY: int = 8
+    JOB_REPORT_CONCURRENCY: int = 2
+    REPORT_FOLDER: str = "backend/data/reports"
+    
+    # Observability
+    METRICS_ENABLED: bool = True # Stage timings and counters at /metrics; off = no-op timers
+
     # DB
     DATABASE_URL: str = "sqlite:///./sql_app.db" # Default to sqlite for local dev
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000 # How long a writer waits for the WAL write lock
+    HISTORY_PAGE_SIZE: int = 20
+    REVISION_TRACKING_ENABLED: bool = True # Store per-clause results of each analysis, so revisions re-analyze only changed clauses
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,47 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from app.core.config import settings
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+def _create_engine():
+    if settings.DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(
+            settings.DATABASE_URL,
+            # Connections are pooled and handed between threadpool workers
+            connect_args={"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW
+        )
+
+        @event.listens_for(engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            # WAL: readers never block the writer and vice versa; writers queue on busy_timeout
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+        return engine
+
+    return create_engine(
+        settings.DATABASE_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=True
+    )
+
+
+engine = _create_engine()
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+
+def init_db():
+    """Create missing tables; existing tables are left as they are."""
+    import app.models  # noqa: F401 - registers the models on Base.metadata
+    Base.metadata.create_all(bind=engine)
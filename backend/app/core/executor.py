@@ -0,0 +1,23 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+
+# Bounded pool for CPU-heavy stages (OCR, torch/numpy scoring). Threads rather than
+# processes: torch and numpy release the GIL in their kernels, and the loaded models
+# stay shared in one process instead of being duplicated per worker.
+cpu_executor = ThreadPoolExecutor(
+    max_workers=settings.CPU_WORKERS or min(4, os.cpu_count() or 1),
+    thread_name_prefix="contractiq-cpu"
+)
+
+
+async def run_cpu_bound(func, *args, **kwargs):
+    """Run a blocking, CPU-bound callable on the bounded pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (the request's trace id) into the pool thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(cpu_executor, functools.partial(context.run, func, *args, **kwargs))
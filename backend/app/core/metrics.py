@@ -0,0 +1,176 @@
+# In-process metrics in the Prometheus text format, served at /metrics.
+# Each process (uvicorn worker, celery worker, embedding server) keeps its own
+# counters; scrape every worker, or aggregate by instance, as with any
+# multi-process Prometheus setup. Work done inside OCR/rule process pools is
+# timed from the calling process. With METRICS_ENABLED off, observe/inc/time
+# return immediately.
+import bisect
+import functools
+import threading
+import time
+from app.core.config import settings
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+
+
+def _label_text(labelnames: tuple, labelvalues: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class _Timer:
+    __slots__ = ("histogram", "labelvalues", "started")
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+        return False
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount: float = 1):
+        if not settings.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            return [f"{self.name}{_label_text(self.labelnames, k)} {v}" for k, v in sorted(self._values.items())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labelvalues -> [per-bucket counts (+Inf last), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labelvalues):
+        if not settings.METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labelvalues):
+        """Context manager observing the elapsed seconds of its block."""
+        if not settings.METRICS_ENABLED:
+            return _NOOP_TIMER
+        return _Timer(self, labelvalues)
+
+    def timed(self, *labelvalues):
+        """Decorator form of time()."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(*labelvalues):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self, *labelvalues) -> dict:
+        """Cumulative bucket counts, sum and count of one series (for JSON stats endpoints)."""
+        with self._lock:
+            counts, total, count = self._values.get(labelvalues, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            cumulative, running = {}, 0
+            for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+                running += n
+                cumulative[str(bound)] = running
+            return {"count": count, "sum": round(total, 6), "buckets": cumulative}
+
+    def render(self) -> list:
+        lines = []
+        with self._lock:
+            for labelvalues, (counts, total, count) in sorted(self._values.items()):
+                running = 0
+                for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+                    running += n
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labelvalues, le)} {running}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, labelvalues)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, labelvalues)} {count}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Pipeline stages: upload_save, ocr, segmentation, rules, encode, similarity, pdf_render
+STAGE_SECONDS = Histogram("contractiq_stage_seconds", "Time spent in each analysis stage", ("stage",))
+HTTP_REQUEST_SECONDS = Histogram(
+    "contractiq_http_request_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "contractiq_llm_request_seconds", "Groq completion latency", ("kind", "outcome")
+)
+LLM_FALLBACKS = Counter(
+    "contractiq_llm_fallbacks_total", "LLM outputs replaced by the mock response", ("kind", "reason")
+)
+LLM_RETRIES = Counter(
+    "contractiq_llm_retries_total", "Groq attempts retried after a transient failure", ("kind", "reason")
+)
+LLM_TOKENS = Counter(
+    "contractiq_llm_tokens_total", "Tokens reported by Groq, by prompt/completion", ("kind", "type")
+)
+CACHE_LOOKUPS = Counter(
+    "contractiq_cache_lookups_total", "Cache lookups by cache/layer and result", ("cache", "result")
+)
+ENCODE_BATCH_SENTENCES = Histogram(
+    "contractiq_encode_batch_sentences", "Sentences per coalesced encode call", ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+)
+ENCODE_QUEUE_DELAY_SECONDS = Histogram(
+    "contractiq_encode_queue_delay_seconds", "Time an encode request waited for its batch to start", ("batcher",),
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+)
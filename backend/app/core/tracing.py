@@ -0,0 +1,33 @@
+# Per-request trace id: taken from the X-Trace-Id request header or generated,
+# returned in the X-Trace-Id response header, and stamped on every log line
+# written while the request is handled (including threadpool/CPU-pool work and
+# the background job stages it starts).
+import logging
+import uuid
+from contextvars import ContextVar
+
+TRACE_HEADER = "X-Trace-Id"
+
+trace_id_var = ContextVar("trace_id", default="-")
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+def configure_logging(level=logging.INFO):
+    """Root handler with the trace id in every line; safe to call more than once."""
+    root = logging.getLogger()
+    if any(isinstance(f, TraceIdFilter) for h in root.handlers for f in h.filters):
+        return
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(level)
@@ -1 +1,4 @@
 # This file makes the models directory a Python package
+from app.models.analysis import Analysis
+from app.models.clause import Clause
+from app.models.clause_map import ClauseMap
@@ -0,0 +1,29 @@
+import time
+from typing import Optional
+from sqlalchemy import JSON, Float, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+
+class Analysis(Base):
+    """One completed contract analysis."""
+    __tablename__ = "analyses"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String(64), default="anonymous")
+    created_at: Mapped[float] = mapped_column(Float, default=time.time) # Unix seconds
+    file_name: Mapped[Optional[str]] = mapped_column(String(255))
+    document_hash: Mapped[Optional[str]] = mapped_column(String(64)) # sha256 of the uploaded bytes
+    score: Mapped[int] = mapped_column(Integer)
+    risks: Mapped[list] = mapped_column(JSON)
+    contract_summary: Mapped[str] = mapped_column(Text)
+    user_explanation: Mapped[Optional[str]] = mapped_column(Text)
+    explanation: Mapped[Optional[str]] = mapped_column(Text)
+    negotiation_email: Mapped[Optional[str]] = mapped_column(Text)
+
+    __table_args__ = (
+        # Serves the history list: equality on user, then the keyset order
+        Index("ix_analyses_user_created", "user_id", "created_at", "id"),
+        Index("ix_analyses_created_at", "created_at"),
+        Index("ix_analyses_document_hash", "document_hash"),
+    )
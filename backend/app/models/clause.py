@@ -0,0 +1,26 @@
+import time
+from typing import Optional
+from sqlalchemy import Float, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+
+class Clause(Base):
+    """An analyzed clause; its id is the vector id in the FAISS clause index."""
+    __tablename__ = "clauses"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    analysis_id: Mapped[Optional[int]] = mapped_column(ForeignKey("analyses.id", ondelete="SET NULL"))
+    document_hash: Mapped[Optional[str]] = mapped_column(String(64))
+    start: Mapped[int] = mapped_column(Integer) # Character offsets in the contract text
+    end: Mapped[int] = mapped_column(Integer)
+    text: Mapped[str] = mapped_column(Text)
+    # Label from a rule or risk-pattern finding on this clause; None for clauses nothing flagged
+    category: Mapped[Optional[str]] = mapped_column(String(64))
+    severity: Mapped[Optional[str]] = mapped_column(String(16))
+    created_at: Mapped[float] = mapped_column(Float, default=time.time)
+
+    __table_args__ = (
+        Index("ix_clauses_document_hash", "document_hash"),
+        Index("ix_clauses_analysis_id", "analysis_id"),
+    )
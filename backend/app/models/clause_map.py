@@ -0,0 +1,22 @@
+import time
+from typing import Optional
+from sqlalchemy import JSON, Float, ForeignKey, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+
+class ClauseMap(Base):
+    """
+    Per-clause results of one analysis, in document order: content hash, rule
+    phrase hits and semantic finding (offsets relative to the clause) and the
+    categories flagged on it. A revised upload is diffed against this to
+    re-analyze only the clauses that changed.
+    """
+    __tablename__ = "clause_maps"
+
+    analysis_id: Mapped[int] = mapped_column(ForeignKey("analyses.id", ondelete="CASCADE"), primary_key=True)
+    # RiskEngine.clause_version() the results were computed under; reused only on a match.
+    # None when computed during model warm-up (rule-only): the hashes still serve the diff
+    version: Mapped[Optional[str]] = mapped_column(String(64))
+    clauses: Mapped[list] = mapped_column(JSON)
+    created_at: Mapped[float] = mapped_column(Float, default=time.time)
@@ -6,6 +6,8 @@ class RiskItem(BaseModel):
     severity: str
     finding: str
     expectation_check: str
+    start: Optional[int] = None # Character offsets of the finding in the contract text
+    end: Optional[int] = None
 
 class AnalysisResult(BaseModel):
     score: int
@@ -17,5 +19,68 @@ class AnalysisResult(BaseModel):
 class UserExpectation(BaseModel):
     text: str
 
+class ClauseDelta(BaseModel):
+    status: str # inserted, modified, removed, or unchanged (flags changed by edits elsewhere)
+    position: Optional[int] = None # Clause index in this version; None for removed clauses
+    previous_position: Optional[int] = None # Clause index in the previous version; None for inserted clauses
+    start: Optional[int] = None
+    end: Optional[int] = None
+    excerpt: str
+    risks_added: List[str] = []
+    risks_removed: List[str] = []
+
+class RevisionDelta(BaseModel):
+    previous_analysis_id: int
+    previous_score: int
+    score_delta: int
+    incremental: bool # False when the previous per-clause results could not be reused (rules or model changed)
+    clauses_total: int
+    clauses_reused: int
+    clauses_analyzed: int
+    clauses: List[ClauseDelta]
+
 class AnalysisResponse(BaseModel):
     analysis: AnalysisResult
+    analysis_id: Optional[int] = None # History entry, when the analysis was stored
+    revision: Optional[RevisionDelta] = None # Changes against previous_analysis_id, for revised uploads
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str # queued, running, completed, failed
+    stage: Optional[str] = None # ocr, scoring, llm, report
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    result_url: Optional[str] = None
+    report_url: Optional[str] = None
+
+class HistoryItem(BaseModel):
+    id: int
+    created_at: float
+    file_name: Optional[str] = None
+    score: int
+    contract_summary: str
+
+class HistoryPage(BaseModel):
+    items: List[HistoryItem]
+    next_cursor: Optional[str] = None # Pass back as ?cursor= for the next page
+
+class HistoryEntry(HistoryItem):
+    document_hash: Optional[str] = None
+    user_explanation: Optional[str] = None
+    analysis: AnalysisResult
+
+class SimilarClause(BaseModel):
+    clause_id: int
+    similarity: float # Cosine similarity to the query
+    analysis_id: Optional[int] = None
+    document_hash: Optional[str] = None
+    file_name: Optional[str] = None
+    start: int
+    end: int
+    text: str
+    category: Optional[str] = None
+    severity: Optional[str] = None
+
+class SimilarClauses(BaseModel):
+    matches: List[SimilarClause]
@@ -0,0 +1,439 @@
+# Persistent FAISS index over every analyzed clause, for "similar clause" search
+# and kNN risk classification against the labelled clause corpus.
+#
+# On disk (CLAUSE_INDEX_DIR):
+# - base-<generation>.faiss: immutable, memory-mapped read-only. Exact inner-product
+#   search while small; IVF once it passes CLAUSE_INDEX_IVF_THRESHOLD clauses.
+# - delta-<generation>.bin: append-only (id, vector) records added since the base
+#   was written, searched exactly from memory. Every CLAUSE_INDEX_COMPACT_EVERY
+#   clauses the delta is merged into a new base generation.
+# - manifest.json: current generation, kind and dimension.
+# Clause metadata (document, offsets, category, severity) lives in the clauses table;
+# vector ids are Clause.id.
+import contextlib
+import json
+import logging
+import os
+import threading
+import numpy as np
+from sqlalchemy import func, insert, select, update
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.analysis import Analysis
+from app.models.clause import Clause
+from app.services.similarity import normalize_rows
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev servers only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class ClauseIndex:
+    """Vector storage: memory-mapped base + in-memory delta, shared on disk by all workers."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.dim = None
+        self.kind = None
+        self.generation = None
+        self.base = None
+        self.delta = None
+        self._delta_bytes = 0 # Bytes of the delta file already loaded into self.delta
+        self._manifest_mtime = None
+        self._lock = threading.RLock()
+        self._compacting = False
+
+    def _base_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"base-{generation}.faiss")
+
+    def _delta_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"delta-{generation}.bin")
+
+    def _record_dtype(self):
+        return np.dtype([("id", "<i8"), ("vector", "<f4", (self.dim,))])
+
+    @contextlib.contextmanager
+    def _file_lock(self, name: str = "index.lock", blocking: bool = True):
+        """
+        Cross-process lock. index.lock serializes appends and the generation switch;
+        compact.lock keeps a single compaction running. Yields False if not acquired.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), "a") as f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    yield False
+                    return
+            yield True
+
+    def _write_manifest(self, generation: int, kind: str, dim: int, count: int):
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"generation": generation, "kind": kind, "dim": dim, "count": count}, f)
+        os.replace(tmp, self.manifest_path)
+
+    def _refresh(self):
+        """Pick up a new base written by a compaction and delta records appended by other workers."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._manifest_mtime:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            self._manifest_mtime = mtime
+            if manifest["generation"] != self.generation:
+                self.dim, self.kind, self.generation = manifest["dim"], manifest["kind"], manifest["generation"]
+                base_path = self._base_path(self.generation)
+                self.base = None
+                if os.path.exists(base_path):
+                    self.base = faiss.read_index(base_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                    if self.kind == "ivf":
+                        faiss.extract_index_ivf(self.base).nprobe = settings.CLAUSE_INDEX_NPROBE
+                self.delta = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+                self._delta_bytes = 0
+
+        delta_path = self._delta_path(self.generation)
+        size = os.path.getsize(delta_path) if os.path.exists(delta_path) else 0
+        record_size = self._record_dtype().itemsize
+        complete = size - size % record_size
+        if complete > self._delta_bytes:
+            with open(delta_path, "rb") as f:
+                f.seek(self._delta_bytes)
+                records = np.frombuffer(f.read(complete - self._delta_bytes), dtype=self._record_dtype())
+            self.delta.add_with_ids(np.ascontiguousarray(records["vector"]), np.ascontiguousarray(records["id"]))
+            self._delta_bytes = complete
+
+    def version(self):
+        """(generation on disk, clauses indexed), read together; changes with every append and compaction."""
+        with self._lock:
+            self._refresh()
+            count = (self.base.ntotal if self.base is not None else 0) + (self.delta.ntotal if self.delta is not None else 0)
+            return self.generation, count
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return (self.base.ntotal if self.base is not None else 0) + (self.delta.ntotal if self.delta is not None else 0)
+
+    def add(self, ids, vectors):
+        """Append clauses to the delta; durable once this returns."""
+        vectors = normalize_rows(np.atleast_2d(vectors))
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            with self._file_lock():
+                self._refresh()
+                if self.dim is None:
+                    self._write_manifest(0, "flat", int(vectors.shape[1]), 0)
+                    self._refresh()
+                elif vectors.shape[1] != self.dim:
+                    logger.warning(f"Clause embedding dim {vectors.shape[1]} does not match index dim {self.dim}; not indexed")
+                    return
+
+                records = np.empty(len(ids), dtype=self._record_dtype())
+                records["id"], records["vector"] = ids, vectors
+                delta_path = self._delta_path(self.generation)
+                with open(delta_path, "ab") as f:
+                    # Drop a partial record left by a crashed writer before appending
+                    size = f.seek(0, os.SEEK_END)
+                    if size % records.itemsize:
+                        f.truncate(size - size % records.itemsize)
+                    f.write(records.tobytes())
+                self._refresh()
+            pending = self.delta.ntotal
+
+        if pending >= settings.CLAUSE_INDEX_COMPACT_EVERY:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Clause index compaction failed: {e}")
+            finally:
+                self._compacting = False
+
+        threading.Thread(target=run, name="clause-index-compaction", daemon=True).start()
+
+    def _build_base(self, ids: np.ndarray, vectors: np.ndarray):
+        if len(ids) < settings.CLAUSE_INDEX_IVF_THRESHOLD:
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+            index.add_with_ids(vectors, ids)
+            return index, "flat"
+        # sqrt(n) lists keeps k-means training to seconds; 40 points per list is what faiss asks for
+        nlist = int(np.sqrt(len(ids)))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(self.dim), self.dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        sample = np.random.default_rng(0).choice(len(ids), size=min(len(ids), nlist * 40), replace=False)
+        index.train(vectors[sample])
+        index.add_with_ids(vectors, ids)
+        return index, "ivf"
+
+    def compact(self):
+        """
+        Merge the delta into a new base generation. The new base is built without
+        holding the append lock: searches and appends continue meanwhile, and records
+        appended during the build are carried over into the new generation's delta.
+        """
+        with self._file_lock("compact.lock", blocking=False) as acquired:
+            if not acquired:
+                return
+            with self._file_lock():
+                with self._lock:
+                    self._refresh()
+                    if self.delta is None or self.delta.ntotal == 0:
+                        return
+                    delta_ids = faiss.vector_to_array(self.delta.id_map).copy()
+                    delta_vectors = self.delta.index.reconstruct_n(0, self.delta.ntotal)
+                    generation, kind, snapshot_bytes = self.generation, self.kind, self._delta_bytes
+
+            base_path = self._base_path(generation)
+            base = faiss.read_index(base_path) if os.path.exists(base_path) else None
+            if base is not None and kind == "ivf":
+                base.add_with_ids(delta_vectors, delta_ids)
+            else:
+                ids, vectors = delta_ids, delta_vectors
+                if base is not None:
+                    ids = np.concatenate([faiss.vector_to_array(base.id_map), delta_ids])
+                    vectors = np.vstack([base.index.reconstruct_n(0, base.ntotal), delta_vectors])
+                base, kind = self._build_base(ids, vectors)
+
+            new_generation = generation + 1
+            tmp = f"{self._base_path(new_generation)}.{os.getpid()}.tmp"
+            faiss.write_index(base, tmp)
+            os.replace(tmp, self._base_path(new_generation))
+
+            with self._file_lock():
+                with open(self._delta_path(generation), "rb") as f:
+                    f.seek(snapshot_bytes)
+                    appended = f.read()
+                record_size = self._record_dtype().itemsize
+                with open(self._delta_path(new_generation), "wb") as f:
+                    f.write(appended[:len(appended) - len(appended) % record_size])
+                # The manifest switch is the commit point; old files are only removed after it
+                self._write_manifest(new_generation, kind, self.dim, int(base.ntotal))
+                for path in (base_path, self._delta_path(generation)):
+                    if os.path.exists(path):
+                        os.remove(path)
+            logger.info(f"Clause index compacted: generation {new_generation}, {base.ntotal} clauses ({kind})")
+
+        with self._lock:
+            self._refresh()
+
+    def search(self, vectors, k: int):
+        """Top-k (similarities, ids) per query over base and delta; ids are -1 where there are fewer than k."""
+        queries = normalize_rows(np.atleast_2d(vectors))
+        with self._lock:
+            self._refresh()
+            results = [index.search(queries, k) for index in (self.base, self.delta) if index is not None and index.ntotal]
+        if not results:
+            return np.full((len(queries), k), -np.inf, dtype=np.float32), np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.hstack([r[0] for r in results])
+        ids = np.hstack([r[1] for r in results])
+        scores[ids < 0] = -np.inf
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+class ClauseSearchService:
+    """Clause metadata in the database, vectors in the FAISS index."""
+
+    def __init__(self):
+        self.index = ClauseIndex(settings.CLAUSE_INDEX_DIR) if faiss is not None else None
+        self._labelled = None
+        if faiss is None:
+            logger.warning("⚠️ faiss not installed; clause similarity index disabled")
+
+    @property
+    def enabled(self) -> bool:
+        return settings.CLAUSE_INDEX_ENABLED and self.index is not None
+
+    def labelled_count(self) -> int:
+        if self._labelled is None:
+            with SessionLocal() as session:
+                self._labelled = session.scalar(select(func.count()).select_from(Clause).where(Clause.category.isnot(None)))
+        return self._labelled
+
+    def knn_version(self):
+        """
+        Index version while kNN classification is active, else None; part of the risk
+        cache key. Every indexed clause takes part in the vote, so the version counts
+        the clauses as well as the generation: any append may change a kNN finding.
+        """
+        if not self.enabled or self.labelled_count() < settings.CLAUSE_KNN_MIN_LABELLED:
+            return None
+        return self.index.version()
+
+    def add_document(self, analysis_id, document_hash: str, text: str, spans: list, embeddings, risks: list) -> int:
+        """
+        Index every clause of an analyzed document. A clause is labelled with the
+        category/severity of the most severe rule or pattern finding overlapping it;
+        kNN findings are never used as labels, so the corpus cannot feed on itself.
+        """
+        if not self.enabled or not spans:
+            return 0
+        if document_hash is not None:
+            with SessionLocal() as session:
+                if session.scalar(select(Clause.id).where(Clause.document_hash == document_hash).limit(1)) is not None:
+                    # Re-upload of an indexed document: its clauses are already in the corpus
+                    return 0
+        labels = [r for r in risks if r.get("source") != "knn" and r.get("start") is not None]
+        rows = []
+        for start, end in spans:
+            label = next((r for r in labels if r["start"] < end and r["end"] > start), None)
+            rows.append({
+                "analysis_id": analysis_id,
+                "document_hash": document_hash,
+                "start": start,
+                "end": end,
+                "text": text[start:end],
+                "category": label["category"] if label else None,
+                "severity": label["severity"] if label else None
+            })
+        with SessionLocal.begin() as session:
+            ids = session.scalars(insert(Clause).returning(Clause.id, sort_by_parameter_order=True), rows).all()
+        self.index.add(ids, embeddings)
+        if self._labelled is not None:
+            self._labelled += sum(1 for row in rows if row["category"])
+        return len(ids)
+
+    def assign_analysis(self, document_hash: str, analysis_id: int) -> int:
+        """Attach an analysis id to a document's clauses indexed before the analysis was recorded."""
+        with SessionLocal.begin() as session:
+            result = session.execute(
+                update(Clause).where(Clause.document_hash == document_hash, Clause.analysis_id.is_(None)).values(analysis_id=analysis_id)
+            )
+            return result.rowcount
+
+    def _labels(self, ids) -> dict:
+        """Clause id -> (category, severity), for the labelled clauses among `ids`."""
+        ids = [int(i) for i in set(np.asarray(ids).ravel().tolist()) if i >= 0]
+        labels = {}
+        with SessionLocal() as session:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for i in range(0, len(ids), 5000):
+                query = select(Clause.id, Clause.category, Clause.severity).where(
+                    Clause.id.in_(ids[i:i + 5000]), Clause.category.isnot(None)
+                )
+                labels.update((row.id, (row.category, row.severity)) for row in session.execute(query))
+        return labels
+
+    def classify(self, embeddings) -> list:
+        """
+        Similarity-weighted kNN vote per clause over its nearest indexed clauses.
+        Unlabelled neighbours vote for "no risk". Returns (category, severity,
+        share of the vote) per clause, or None when no category wins.
+        """
+        if self.knn_version() is None or len(embeddings) == 0:
+            return [None] * len(embeddings)
+        scores, ids = self.index.search(embeddings, settings.CLAUSE_KNN_K)
+        labels = self._labels(ids)
+
+        predictions = []
+        for row_scores, row_ids in zip(scores, ids):
+            votes, severities, total = {}, {}, 0.0
+            for score, clause_id in zip(row_scores, row_ids):
+                if clause_id < 0 or score < settings.CLAUSE_KNN_MIN_SIMILARITY:
+                    continue
+                total += score
+                label = labels.get(int(clause_id))
+                if label is not None:
+                    votes[label[0]] = votes.get(label[0], 0.0) + score
+                    severities[label] = severities.get(label, 0.0) + score
+            if not votes:
+                predictions.append(None)
+                continue
+            category = max(votes, key=votes.get)
+            share = votes[category] / total
+            if share < settings.CLAUSE_KNN_MIN_SHARE:
+                predictions.append(None)
+                continue
+            severity = max((s for c, s in severities if c == category), key=lambda s: severities[(category, s)])
+            predictions.append((category, severity, float(share)))
+        return predictions
+
+    def similar(self, embedding, user_id: str, k: int = 10, group_by_document: bool = True) -> list:
+        """
+        Nearest indexed clauses to one query embedding, with their document metadata.
+        Only clauses of user_id's own analyses are returned, as in the history.
+        """
+        if not self.enabled:
+            return []
+        # Over-fetch: other users' hits are dropped, and when grouping several hits may
+        # come from the same contract. Widen the search until k matches or the whole index.
+        fetch, size = k * 4, len(self.index)
+        while True:
+            matches = self._similar(embedding, user_id, k, group_by_document, fetch)
+            if len(matches) == k or fetch >= size:
+                return matches
+            fetch *= 4
+
+    def _similar(self, embedding, user_id: str, k: int, group_by_document: bool, fetch: int) -> list:
+        scores, ids = self.index.search(embedding, fetch)
+        hits = [(float(s), int(i)) for s, i in zip(scores[0], ids[0]) if i >= 0]
+        if not hits:
+            return []
+
+        with SessionLocal() as session:
+            query = (
+                select(Clause, Analysis.file_name)
+                .join(Analysis, Analysis.id == Clause.analysis_id)
+                .where(Clause.id.in_([i for _, i in hits]), Analysis.user_id == user_id)
+            )
+            rows = {clause.id: (clause, file_name) for clause, file_name in session.execute(query)}
+
+        matches, seen = [], set()
+        for score, clause_id in hits:
+            if clause_id not in rows:
+                continue
+            clause, file_name = rows[clause_id]
+            if group_by_document:
+                if clause.document_hash in seen:
+                    continue
+                seen.add(clause.document_hash)
+            matches.append({
+                "clause_id": clause.id,
+                "similarity": score,
+                "analysis_id": clause.analysis_id,
+                "document_hash": clause.document_hash,
+                "file_name": file_name,
+                "start": clause.start,
+                "end": clause.end,
+                "text": clause.text,
+                "category": clause.category,
+                "severity": clause.severity
+            })
+            if len(matches) == k:
+                break
+        return matches
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "clauses": len(self.index),
+            "kind": self.index.kind,
+            "generation": self.index.generation,
+            "delta": self.index.delta.ntotal if self.index.delta is not None else 0,
+            "labelled": self.labelled_count(),
+            "knn_active": self.knn_version() is not None
+        }
+
+clause_search = ClauseSearchService()
@@ -0,0 +1,98 @@
+# Sentence-embedding backends behind MLService. All of them serve the same
+# sentence-transformers model; they differ in runtime and precision:
+# - torch:      full-precision PyTorch (the original behaviour)
+# - torch-int8: PyTorch with dynamic int8 quantization of the Linear layers
+# - onnx:       ONNX Runtime on CPU (sentence-transformers backend="onnx")
+# - onnx-int8:  ONNX Runtime with the int8-quantized export of the model
+# Quantized backends produce slightly different vectors, so `embedding_id`
+# (model + backend) is what caches and artifacts are keyed by.
+from abc import ABC, abstractmethod
+from app.core.config import settings
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+class EmbeddingBackend(ABC):
+    name = None
+
+    def __init__(self, model_name: str, threads: int = 0):
+        self.model_name = model_name
+        self.threads = threads
+        self.model = None
+
+    @property
+    def embedding_id(self) -> str:
+        return f"{self.model_name}@{self.name}"
+
+    @abstractmethod
+    def load(self):
+        """Load the model into self.model."""
+
+    def encode(self, sentences: list, batch_size: int = 32):
+        return self.model.encode(sentences, batch_size=batch_size, convert_to_numpy=True)
+
+
+class TorchBackend(EmbeddingBackend):
+    name = "torch"
+
+    def _load_model(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        return SentenceTransformer(self.model_name, device=device)
+
+    def load(self):
+        self.model = self._load_model()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    name = "torch-int8"
+
+    def load(self):
+        import torch
+
+        model = self._load_model().to("cpu")
+        # Weights of every Linear layer stored as int8; activations quantized on the fly
+        self.model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend(EmbeddingBackend):
+    name = "onnx"
+    file_name = None
+
+    def _session_options(self):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+        return options
+
+    def load(self):
+        from sentence_transformers import SentenceTransformer
+
+        model_kwargs = {"provider": "CPUExecutionProvider", "session_options": self._session_options()}
+        if self.file_name:
+            model_kwargs["file_name"] = self.file_name
+        self.model = SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+
+class QuantizedOnnxBackend(OnnxBackend):
+    name = "onnx-int8"
+
+    @property
+    def file_name(self):
+        return settings.EMBEDDING_ONNX_INT8_FILE
+
+
+BACKENDS = {b.name: b for b in (TorchBackend, QuantizedTorchBackend, OnnxBackend, QuantizedOnnxBackend)}
+
+
+def create_backend(name: str, model_name: str, threads: int = 0) -> EmbeddingBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](model_name, threads)
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.metrics import CACHE_LOOKUPS
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev servers only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sentence(sentence: str) -> str:
+    """Canonical form used for cache keys: NFC, collapsed whitespace."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", sentence)).strip()
+
+
+def sentence_key(model_name: str, sentence: str) -> str:
+    """Content address of a sentence embedding for a given model."""
+    payload = f"{model_name}\0{normalize_sentence(sentence)}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """
+    Append-only on-disk store: one float32 matrix (memory-mapped for reads)
+    plus a tab-separated index of key -> row.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.index_path = os.path.join(directory, "index.tsv")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.dim = None
+        self.rows = {}
+        self._matrix = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+
+        # Rows whose vectors never made it to disk (e.g. a crash mid-write) are ignored
+        stored_rows = os.path.getsize(self.vectors_path) // (4 * self.dim) if os.path.exists(self.vectors_path) else 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    key, _, row = line.rstrip("\n").partition("\t")
+                    if row and int(row) < stored_rows:
+                        self.rows[key] = int(row)
+        self._remap(stored_rows)
+
+    def _remap(self, n_rows: int):
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, self.dim)) if n_rows else None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, key: str):
+        # Lock-free: put_many maps the grown file before publishing its rows,
+        # so a row read here is always inside the matrix read after it
+        row = self.rows.get(key)
+        matrix = self._matrix
+        if row is None or matrix is None:
+            return None
+        return np.array(matrix[row])
+
+    def put_many(self, keys: list, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                logger.warning(f"Embedding dim {vectors.shape[1]} does not match disk cache dim {self.dim}; not persisting")
+                return
+
+            new = [(k, v) for k, v in zip(keys, vectors) if k not in self.rows]
+            if not new:
+                return
+            # Vectors first, then the index, so a partial write never points at missing data.
+            # The file lock keeps row numbers consistent when several workers share the store.
+            with open(self.vectors_path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0, os.SEEK_END)
+                start = f.tell() // (4 * self.dim)
+                f.write(np.stack([v for _, v in new]).tobytes())
+                f.flush()
+                with open(self.index_path, "a", encoding="utf-8") as index:
+                    index.writelines(f"{k}\t{start + i}\n" for i, (k, _) in enumerate(new))
+            self._remap(start + len(new))
+            self.rows.update((k, start + i) for i, (k, _) in enumerate(new))
+
+
+class EmbeddingCache:
+    """
+    Content-addressed sentence embedding cache: an in-process LRU bounded by
+    bytes, optionally backed by a DiskEmbeddingStore. Only unseen sentences
+    are sent to the encoder.
+    """
+
+    def __init__(self, model_name: str, max_bytes: int, directory: str = ""):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = None
+        if directory:
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+            try:
+                self.disk = DiskEmbeddingStore(os.path.join(directory, safe_name))
+            except OSError as e:
+                logger.error(f"⚠️ Disk embedding cache unavailable: {e}")
+
+    def _get(self, key: str):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+        if self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self._put(key, vector)
+                with self._lock:
+                    self.disk_hits += 1
+                return vector
+        return None
+
+    def _put(self, key: str, vector: np.ndarray):
+        if vector.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            self._entries[key] = vector
+            self.current_bytes += vector.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def encode(self, sentences: list, encoder) -> np.ndarray:
+        """Embed sentences, calling encoder(list_of_str) only for cache misses."""
+        keys = [sentence_key(self.model_name, s) for s in sentences]
+        found = {}
+        missing = {}
+        for key, sentence in zip(keys, sentences):
+            if key in found or key in missing:
+                continue
+            vector = self._get(key)
+            if vector is None:
+                missing[key] = sentence
+            else:
+                found[key] = vector
+
+        CACHE_LOOKUPS.inc("embedding", "hit", amount=len(found))
+        if missing:
+            CACHE_LOOKUPS.inc("embedding", "miss", amount=len(missing))
+            with self._lock:
+                self.misses += len(missing)
+            encoded = np.asarray(encoder(list(missing.values())), dtype=np.float32)
+            for key, vector in zip(missing, encoded):
+                self._put(key, vector)
+                found[key] = vector
+            if self.disk is not None:
+                try:
+                    self.disk.put_many(list(missing), encoded)
+                except OSError as e:
+                    logger.error(f"Failed to persist embeddings: {e}")
+
+        return np.stack([found[k] for k in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_name,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "disk_entries": len(self.disk) if self.disk is not None else 0
+            }
@@ -0,0 +1,192 @@
+# Shared embedding server: one process owns the model and serves encode requests
+# from every uvicorn/celery worker over a Unix socket, so memory stays flat as
+# workers are added. Sentences from concurrent requests are coalesced into one
+# encode call by an EncodeBatcher (up to EMBEDDING_SERVER_MAX_BATCH sentences,
+# waiting at most EMBEDDING_SERVER_MAX_WAIT_MS for more to arrive).
+#
+# Run from backend/: python -m app.services.embedding_server
+# and start the workers with EMBEDDING_SERVER_SOCKET set to the same path.
+#
+# Wire format, both directions: 8-byte header (JSON length, body length, big-endian
+# uint32) + JSON + raw body. Encode responses carry the float32 matrix as the body.
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import numpy as np
+from app.core.config import settings
+from app.core.tracing import configure_logging
+from app.services.encode_batcher import EncodeBatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/contractiq-embedding.sock"
+_FRAME = struct.Struct(">II")
+
+
+def _pack(header: dict, body: bytes = b"") -> bytes:
+    payload = json.dumps(header).encode("utf-8")
+    return _FRAME.pack(len(payload), len(body)) + payload + body
+
+
+def _recv_exactly(sock, size: int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while size:
+        n = sock.recv_into(view, size)
+        if not n:
+            raise ConnectionError("embedding server closed the connection")
+        view = view[n:]
+        size -= n
+    return bytes(buf)
+
+
+class EmbeddingClient:
+    """
+    Blocking client used by MLService in place of a local model; encode() has the
+    same signature. One connection per thread, reconnected after an error.
+    """
+
+    def __init__(self, path: str, timeout: float):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _call(self, header: dict):
+        sock = self._connection()
+        try:
+            sock.sendall(_pack(header))
+            header_len, body_len = _FRAME.unpack(_recv_exactly(sock, _FRAME.size))
+            response = json.loads(_recv_exactly(sock, header_len))
+            body = _recv_exactly(sock, body_len) if body_len else b""
+        except (OSError, ValueError):
+            # The stream may be mid-frame; start over on the next call
+            sock.close()
+            self._local.sock = None
+            raise
+        if "error" in response:
+            raise RuntimeError(f"Embedding server error: {response['error']}")
+        return response, body
+
+    def info(self) -> dict:
+        return self._call({"op": "info"})[0]
+
+    def wait_until_ready(self, timeout: float) -> dict:
+        """Server info, retrying while the server is still starting (socket not bound yet)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.info()
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+    def encode(self, sentences, batch_size: int = 32):
+        single = isinstance(sentences, str)
+        response, body = self._call({"op": "encode", "sentences": [sentences] if single else list(sentences)})
+        embeddings = np.frombuffer(body, dtype=np.float32).reshape(response["shape"])
+        return embeddings[0] if single else embeddings
+
+
+class EmbeddingServer:
+    def __init__(self, backend, max_batch: int, max_wait_ms: float, encode_batch_size: int):
+        self.backend = backend
+        self.encode_batch_size = encode_batch_size
+        # One dispatcher thread: the model already uses every intra-op thread
+        self.batcher = EncodeBatcher(self._encode, max_batch, max_wait_ms, name="embedding-server")
+        self.started_at = time.time()
+
+    def stats(self) -> dict:
+        return {
+            "embedding_id": self.backend.embedding_id,
+            "uptime_seconds": round(time.time() - self.started_at),
+            **self.batcher.stats()
+        }
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                header_len, body_len = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+                request = json.loads(await reader.readexactly(header_len))
+                if body_len:
+                    await reader.readexactly(body_len)
+
+                if request.get("op") == "info":
+                    writer.write(_pack(self.stats()))
+                elif request.get("op") == "encode":
+                    try:
+                        embeddings = await asyncio.wrap_future(self.batcher.submit(request["sentences"]))
+                        writer.write(_pack({"shape": list(embeddings.shape)}, embeddings.tobytes()))
+                    except Exception as e:
+                        writer.write(_pack({"error": str(e)}))
+                else:
+                    writer.write(_pack({"error": f"unknown op {request.get('op')!r}"}))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _encode(self, sentences: list):
+        return np.ascontiguousarray(self.backend.encode(sentences, batch_size=self.encode_batch_size), dtype=np.float32)
+
+    async def serve(self, path: str):
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self._handle, path)
+        os.chmod(path, 0o660)
+        logger.info(f"✅ Embedding server ({self.backend.embedding_id}) listening on {path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+def main():
+    from app.services.embedding_backends import DEFAULT_MODEL, create_backend
+
+    parser = argparse.ArgumentParser(description="Serve sentence embeddings to ContractIQ workers")
+    parser.add_argument("--socket", default=settings.EMBEDDING_SERVER_SOCKET or DEFAULT_SOCKET)
+    args = parser.parse_args()
+
+    configure_logging()
+    # Same model and backend the workers would otherwise load themselves
+    backend = create_backend(settings.EMBEDDING_BACKEND, DEFAULT_MODEL, settings.EMBEDDING_THREADS)
+    logger.info(f"Loading ML model: {backend.embedding_id}...")
+    backend.load()
+    # The socket is bound only once the model is loaded; clients retry until then
+    server = EmbeddingServer(
+        backend,
+        max_batch=settings.EMBEDDING_SERVER_MAX_BATCH,
+        max_wait_ms=settings.EMBEDDING_SERVER_MAX_WAIT_MS,
+        encode_batch_size=settings.ENCODE_BATCH_SIZE
+    )
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Request-coalescing front for an encoder. Concurrent callers submit their
+# sentences; one dispatcher thread collects submissions for up to max_wait_ms
+# (or until max_batch sentences are queued), runs a single encode, and scatters
+# the rows back to each caller. Submissions that arrive while an encode is
+# running are picked up by the next batch without further waiting.
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from app.core.metrics import ENCODE_BATCH_SENTENCES, ENCODE_QUEUE_DELAY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class EncodeBatcher:
+    def __init__(self, encode, max_batch: int, max_wait_ms: float, name: str = "encode-batcher"):
+        self._encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.sentences = 0
+
+    def submit(self, sentences: list) -> Future:
+        """Future resolving to the (len(sentences), dim) embedding matrix."""
+        future = Future()
+        if not sentences:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return future
+        self._ensure_started()
+        self._queue.put((list(sentences), future, time.perf_counter()))
+        return future
+
+    def encode(self, sentences, batch_size: int = None):
+        """Blocking, model-compatible encode; batch_size is decided by the underlying encoder."""
+        if isinstance(sentences, str):
+            return self.submit([sentences]).result()[0]
+        return self.submit(sentences).result()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self) -> list:
+        """Block for one submission, then collect more until full or max_wait has passed."""
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            sentences = [s for item, _, _ in batch for s in item]
+            try:
+                embeddings = np.asarray(self._encode(sentences), dtype=np.float32)
+            except Exception as e:
+                logger.error(f"❌ Encode failed for a batch of {len(sentences)} sentences: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.sentences += len(sentences)
+            ENCODE_BATCH_SENTENCES.observe(len(sentences), self.name)
+            for _, _, submitted in batch:
+                ENCODE_QUEUE_DELAY_SECONDS.observe(started - submitted, self.name)
+
+            offset = 0
+            for item, future, _ in batch:
+                future.set_result(embeddings[offset:offset + len(item)])
+                offset += len(item)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "requests": self.requests,
+                "batches": self.batches,
+                "sentences": self.sentences,
+                "mean_batch_sentences": round(self.sentences / self.batches, 1) if self.batches else 0,
+                "mean_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0,
+                "batch_size": ENCODE_BATCH_SENTENCES.snapshot(self.name),
+                "queue_delay_seconds": ENCODE_QUEUE_DELAY_SECONDS.snapshot(self.name)
+            }
@@ -0,0 +1,129 @@
+import logging
+import time
+from sqlalchemy import delete, insert, or_, select
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.analysis import Analysis
+from app.models.clause_map import ClauseMap
+
+logger = logging.getLogger(__name__)
+
+# Columns shown in the history list; risks and LLM outputs are only loaded for a single entry
+LIST_COLUMNS = (Analysis.id, Analysis.created_at, Analysis.file_name, Analysis.score, Analysis.contract_summary)
+
+
+def encode_cursor(created_at: float, analysis_id: int) -> str:
+    return f"{created_at!r}:{analysis_id}"
+
+
+def decode_cursor(cursor: str):
+    created_at, analysis_id = cursor.rsplit(":", 1)
+    return float(created_at), int(analysis_id)
+
+
+def history_entry(risk_data: dict, user_id: str, file_name: str = None, document_hash: str = None,
+                  user_explanation: str = None, explanation: str = None, negotiation_email: str = None) -> dict:
+    """Row values for one analysis, as accepted by record() and record_many()."""
+    return {
+        "user_id": user_id,
+        "created_at": time.time(),
+        "file_name": file_name,
+        "document_hash": document_hash,
+        "score": risk_data["score"],
+        "risks": risk_data["risks"],
+        "contract_summary": risk_data["contract_summary"],
+        "user_explanation": user_explanation,
+        "explanation": explanation,
+        "negotiation_email": negotiation_email
+    }
+
+
+class HistoryService:
+    """
+    Stored analyses. Calls are blocking database I/O, so async code runs them in
+    the threadpool; recording failures are logged and never fail a request.
+    """
+
+    def record(self, entry: dict):
+        """Insert one analysis; returns its id, or None if it could not be stored."""
+        try:
+            with SessionLocal.begin() as session:
+                return session.execute(insert(Analysis).returning(Analysis.id), [entry]).scalar_one()
+        except Exception as e:
+            logger.error(f"Could not record analysis: {e}")
+            return None
+
+    def record_many(self, entries: list) -> list:
+        """Bulk insert (one executemany in one transaction); returns the new ids in entry order, [] on failure."""
+        if not entries:
+            return []
+        try:
+            with SessionLocal.begin() as session:
+                return session.scalars(
+                    insert(Analysis).returning(Analysis.id, sort_by_parameter_order=True), entries
+                ).all()
+        except Exception as e:
+            logger.error(f"Could not record {len(entries)} analyses: {e}")
+            return []
+
+    def list_for_user(self, user_id: str, limit: int = None, cursor: str = None):
+        """
+        Newest first, keyset-paginated on (created_at, id): each page is an index
+        range scan, however deep. Returns (rows, cursor of the next page or None).
+        """
+        limit = limit or settings.HISTORY_PAGE_SIZE
+        query = select(*LIST_COLUMNS).where(Analysis.user_id == user_id)
+        if cursor:
+            created_at, analysis_id = decode_cursor(cursor)
+            # The plain <= bound is what lets the index seek; the OR settles ties on created_at
+            query = query.where(
+                Analysis.created_at <= created_at,
+                or_(Analysis.created_at < created_at, Analysis.id < analysis_id)
+            )
+        query = query.order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(limit + 1)
+
+        with SessionLocal() as session:
+            rows = [dict(row._mapping) for row in session.execute(query)]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        return rows, next_cursor
+
+    def get(self, analysis_id: int, user_id: str):
+        with SessionLocal() as session:
+            return session.scalars(
+                select(Analysis).where(Analysis.id == analysis_id, Analysis.user_id == user_id)
+            ).first()
+
+    def find_by_document(self, document_hash: str, user_id: str = None, limit: int = 10) -> list:
+        """Earlier analyses of the same uploaded bytes, newest first."""
+        query = select(*LIST_COLUMNS).where(Analysis.document_hash == document_hash)
+        if user_id is not None:
+            query = query.where(Analysis.user_id == user_id)
+        query = query.order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(limit)
+        with SessionLocal() as session:
+            return [dict(row._mapping) for row in session.execute(query)]
+
+    def delete(self, analysis_id: int, user_id: str) -> bool:
+        with SessionLocal.begin() as session:
+            result = session.execute(
+                delete(Analysis).where(Analysis.id == analysis_id, Analysis.user_id == user_id)
+            )
+            return result.rowcount > 0
+
+    def record_clause_map(self, analysis_id: int, clause_map: dict):
+        """Store the per-clause results of an analysis, so a later revision can build on it."""
+        try:
+            with SessionLocal.begin() as session:
+                session.merge(ClauseMap(analysis_id=analysis_id, version=clause_map["version"], clauses=clause_map["clauses"]))
+        except Exception as e:
+            logger.error(f"Could not record clause map: {e}")
+
+    def get_clause_map(self, analysis_id: int):
+        """{"version", "clauses"} of an analysis, or None if it has none."""
+        with SessionLocal() as session:
+            row = session.get(ClauseMap, analysis_id)
+            return {"version": row.version, "clauses": row.clauses} if row is not None else None
+
+history_service = HistoryService()
@@ -0,0 +1,250 @@
+# Background analysis jobs. A job moves through the stages ocr -> scoring -> llm
+# -> report; each stage has its own concurrency limit. Two runners share the
+# same stage code:
+# - local: stages run as asyncio tasks inside the API process (default; no services needed)
+# - celery: one Celery task per stage, routed to a queue per stage (see app/worker.py)
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.executor import run_cpu_bound
+from app.core.tracing import trace_id_var
+from app.schemas import AnalysisResponse
+from app.services.history import history_entry, history_service
+from app.services.llm import llm_service
+from app.services.ml_service import ml_service
+from app.services.pipeline import extract_text, analyze_revision, analyze_streamed, analyze_risks, index_clauses, save_analysis, to_result
+from app.services.result_cache import MemoryCacheBackend, RedisCacheBackend
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("ocr", "scoring", "llm", "report")
+
+
+class JobError(Exception):
+    """A job failure to report to the client, with the status the synchronous endpoint would use."""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class JobStore:
+    """Job records as JSON in a cache backend: in memory locally, Redis when workers run elsewhere."""
+
+    def __init__(self, backend, prefix: str = "contractiq:job"):
+        self.backend = backend
+        self.prefix = prefix
+
+    def get(self, job_id: str):
+        value = self.backend.get(f"{self.prefix}:{job_id}")
+        return json.loads(value) if value is not None else None
+
+    def put(self, record: dict):
+        self.backend.set(f"{self.prefix}:{record['job_id']}", json.dumps(record), settings.JOB_TTL_SECONDS)
+
+    def create(self, report: bool) -> dict:
+        now = time.time()
+        record = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "stage": None,
+            "error": None,
+            "status_code": None,
+            "report": report,
+            "result": None,
+            "report_path": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        self.put(record)
+        return record
+
+    def update(self, job_id: str, **fields):
+        record = self.get(job_id)
+        if record is None:
+            return None
+        record.update(fields, updated_at=time.time())
+        self.put(record)
+        return record
+
+
+# Stages: each takes and returns the JSON-serializable job payload
+
+async def ocr_stage(payload: dict) -> dict:
+    contract_text = await extract_text(payload["file_path"], payload["file_hash"])
+    if contract_text == "":
+        raise JobError("Could not extract text from file.")
+    # None: too long to hold in memory, the scoring stage reads the file as it analyzes it
+    payload["contract_text"] = contract_text
+    return payload
+
+
+async def scoring_stage(payload: dict) -> dict:
+    # A job can afford to wait for warm-up instead of degrading to rule-only analysis
+    ml_service.start_warm_up()
+    await run_in_threadpool(ml_service.ready.wait)
+    if payload["contract_text"] is None:
+        # Streaming mode: no clause map, revision delta or clause index entry
+        payload["risk_data"] = await analyze_streamed(payload["file_path"], payload["user_explanation"])
+        if payload["risk_data"] is None:
+            raise JobError("Could not extract text from file.")
+        payload["clauses_indexed"] = False
+        del payload["contract_text"]
+        return payload
+
+    if payload.get("previous_analysis_id") is None:
+        payload["risk_data"], payload["clause_map"] = await analyze_risks(payload["contract_text"], payload["user_explanation"])
+    else:
+        previous = await run_in_threadpool(history_service.get, payload["previous_analysis_id"], payload["user_id"])
+        if previous is None:
+            raise JobError("Previous analysis not found.", status_code=404)
+        payload["risk_data"], payload["clause_map"], payload["revision"] = await analyze_revision(
+            payload["contract_text"], payload["user_explanation"], previous
+        )
+
+    # Indexed here, where the model is loaded; the llm stage only attaches the analysis id
+    payload["clauses_indexed"] = await index_clauses(
+        None, payload["file_hash"], payload.pop("contract_text"), payload["risk_data"]["risks"]
+    )
+    return payload
+
+
+async def llm_stage(payload: dict) -> dict:
+    risk_data = payload["risk_data"]
+    explanation, negotiation_email = await llm_service.agenerate_all(risk_data, payload["user_explanation"])
+    analysis_id = await save_analysis(
+        history_entry(
+            risk_data, payload["user_id"], payload["file_name"], payload["file_hash"],
+            payload["user_explanation"], explanation, negotiation_email
+        ),
+        None,
+        payload.pop("clause_map", None),
+        clauses_indexed=payload.pop("clauses_indexed")
+    )
+    payload["result"] = AnalysisResponse(
+        analysis=to_result(risk_data, explanation, negotiation_email),
+        analysis_id=analysis_id,
+        revision=payload.pop("revision", None)
+    ).model_dump()
+    return payload
+
+
+def _write_report(path: str, pdf: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(pdf)
+
+
+async def report_stage(payload: dict) -> dict:
+    if payload.get("report"):
+        from app.services.report_generator import generate_pdf_report
+        analysis = payload["result"]["analysis"]
+        pdf = await run_cpu_bound(
+            generate_pdf_report,
+            analysis["score"], analysis["risks"], analysis["explanation"], analysis["negotiation_email"]
+        )
+        # Named by job id: concurrent jobs never share a file
+        payload["report_path"] = f"{settings.REPORT_FOLDER}/{payload['job_id']}.pdf"
+        await run_in_threadpool(_write_report, payload["report_path"], pdf)
+    return payload
+
+
+STAGE_FUNCTIONS = {"ocr": ocr_stage, "scoring": scoring_stage, "llm": llm_stage, "report": report_stage}
+
+
+async def run_stage(store: JobStore, job_id: str, stage: str, payload: dict):
+    """Run one stage and record progress; returns the payload, or None once the job has failed."""
+    # Log lines of every stage carry the trace id of the request that submitted the job
+    trace_id_var.set(payload.get("trace_id", "-"))
+    await run_in_threadpool(store.update, job_id, status="running", stage=stage)
+    try:
+        payload = await STAGE_FUNCTIONS[stage](payload)
+    except JobError as e:
+        await run_in_threadpool(store.update, job_id, status="failed", error=e.detail, status_code=e.status_code)
+        return None
+    except Exception as e:
+        logger.exception(f"Job {job_id} failed in stage {stage}")
+        await run_in_threadpool(store.update, job_id, status="failed", error=f"{stage} stage failed: {e}", status_code=500)
+        return None
+
+    if stage == STAGES[-1]:
+        await run_in_threadpool(
+            store.update, job_id,
+            status="completed", stage=None, result=payload["result"], report_path=payload.get("report_path")
+        )
+    return payload
+
+
+class LocalJobQueue:
+    """In-process runner: one asyncio task per job, a semaphore per stage."""
+
+    def __init__(self):
+        self.store = JobStore(MemoryCacheBackend(settings.JOB_MAX_RECORDS))
+        self.limits = {
+            "ocr": settings.JOB_OCR_CONCURRENCY,
+            "scoring": settings.JOB_SCORING_CONCURRENCY,
+            "llm": settings.JOB_LLM_CONCURRENCY,
+            "report": settings.JOB_REPORT_CONCURRENCY
+        }
+        self._semaphores = None
+        self._tasks = set()
+
+    async def _run(self, job_id: str, payload: dict):
+        for stage in STAGES:
+            async with self._semaphores[stage]:
+                payload = await run_stage(self.store, job_id, stage, payload)
+            if payload is None:
+                return
+
+    async def enqueue(self, job_id: str, payload: dict):
+        if self._semaphores is None:
+            self._semaphores = {stage: asyncio.Semaphore(limit) for stage, limit in self.limits.items()}
+        task = asyncio.create_task(self._run(job_id, payload))
+        # Keep a reference until the job finishes so the task is not garbage-collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+class CeleryJobQueue:
+    """Celery runner: the stages are chained tasks on per-stage queues; records live in Redis."""
+
+    def __init__(self):
+        self.store = JobStore(RedisCacheBackend(settings.REDIS_URL))
+
+    async def enqueue(self, job_id: str, payload: dict):
+        from app.worker import stage_chain
+        await run_in_threadpool(stage_chain(job_id, payload).apply_async)
+
+
+class JobService:
+    def __init__(self):
+        self.queue = CeleryJobQueue() if settings.JOB_QUEUE_BACKEND == "celery" else LocalJobQueue()
+        self.store = self.queue.store
+
+    async def submit(self, file_path: str, file_hash: str, user_explanation: str, report: bool = False,
+                     user_id: str = "anonymous", file_name: str = None, previous_analysis_id: int = None) -> dict:
+        record = await run_in_threadpool(self.store.create, report)
+        payload = {
+            "job_id": record["job_id"],
+            "file_path": file_path,
+            "file_hash": file_hash,
+            "user_explanation": user_explanation,
+            "report": report,
+            "user_id": user_id,
+            "file_name": file_name,
+            "previous_analysis_id": previous_analysis_id,
+            "trace_id": trace_id_var.get()
+        }
+        await self.queue.enqueue(record["job_id"], payload)
+        return record
+
+    async def get(self, job_id: str):
+        return await run_in_threadpool(self.store.get, job_id)
+
+job_service = JobService()
@@ -1,33 +1,78 @@
+import asyncio
+import logging
 import os
-from groq import Groq
+import time
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.metrics import LLM_FALLBACKS, LLM_REQUEST_SECONDS
+from app.services.llm_client import LLMClient, LLMUnavailable, estimate_tokens
+from app.services.result_cache import result_cache
+from app.services.rules import SEVERITY_ORDER
+
+logger = logging.getLogger(__name__)
+
+# Bump when prompts or generation params change, so cached LLM outputs are not reused
+PROMPT_VERSION = "2"
+
+EXPLANATION_PARAMS = {"model": "llama-3.3-70b-versatile", "temperature": 0.7, "max_tokens": 1024}
+EMAIL_PARAMS = {"model": "llama-3.3-70b-versatile", "temperature": 0.6, "max_tokens": 800}
+
+FINDING_CHARS = 240 # Semantic findings quote whole clauses; the model only needs the gist
+
+
+def format_risks(risks: list, budget_tokens: int) -> str:
+    """
+    Risk list for prompts, one line per risk in document order. When the lines do
+    not fit the token budget, the least severe risks are left out and counted instead.
+    """
+    lines = []
+    for risk in risks:
+        finding = " ".join(str(risk.get("finding", "")).split())
+        if len(finding) > FINDING_CHARS:
+            finding = finding[:FINDING_CHARS - 1].rstrip() + "…"
+        line = f"- [{risk.get('severity', 'Unknown')}] {risk.get('category', 'Unknown')}: {finding}"
+        if risk.get("expectation_check") == "Mismatch":
+            line += " (contradicts the user's expectation)"
+        lines.append(line)
+    if not lines:
+        return "- None"
+
+    costs = [estimate_tokens(line) for line in lines]
+    if sum(costs) <= budget_tokens:
+        return "\n".join(lines)
+    keep, used = set(), 0
+    for i in sorted(range(len(lines)), key=lambda i: -SEVERITY_ORDER.get(risks[i].get("severity"), -1)):
+        if used + costs[i] > budget_tokens:
+            break
+        keep.add(i)
+        used += costs[i]
+    kept = [line for i, line in enumerate(lines) if i in keep]
+    kept.append(f"- ({len(lines) - len(keep)} less severe risk(s) omitted)")
+    return "\n".join(kept)
+
 
 class LLMService:
     def __init__(self):
         self.client = None
         if settings.GROQ_API_KEY and settings.GROQ_API_KEY != "your_groq_api_key_here":
             try:
-                self.client = Groq(api_key=settings.GROQ_API_KEY)
-                print("✅ Groq API initialized successfully")
+                self.client = LLMClient(settings.GROQ_API_KEY, settings.GROQ_BASE_URL)
+                logger.info("✅ Groq API initialized successfully")
             except Exception as e:
-                print(f"⚠️ Groq API initialization failed: {e}")
+                logger.error(f"⚠️ Groq API initialization failed: {e}")
         else:
-            print("⚠️ GROQ_API_KEY not set. Using mock responses.")
+            logger.warning("⚠️ GROQ_API_KEY not set. Using mock responses.")
 
-    def generate_explanation(self, risk_data: dict, user_explanation: str) -> str:
-        if not self.client:
-            # Enhanced mock response
-            return self._generate_mock_explanation(risk_data, user_explanation)
-        
-        try:
-            prompt = f"""You are an expert legal advisor helping freelancers and small business owners understand contract risks.
+    def _explanation_messages(self, risk_data: dict, user_explanation: str) -> list:
+        prompt = f"""You are an expert legal advisor helping freelancers and small business owners understand contract risks.
 
 User's Expectation: {user_explanation}
 
 Contract Analysis Results:
 - Safety Score: {risk_data['score']}/100
 - Risks Found: {len(risk_data['risks'])}
-- Risk Details: {risk_data['risks']}
+- Risk Details:
+{format_risks(risk_data['risks'], settings.LLM_PROMPT_RISK_TOKENS)}
 
 Task: Explain the discrepancies between what the user expected and what the contract actually says. Focus on:
 1. Financial risks and their impact
@@ -36,36 +81,23 @@ Task: Explain the discrepancies between what the user expected and what the cont
 4. Real-world implications
 
 Be direct, helpful, and avoid legalese. Use a conversational tone."""
-            
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful legal assistant who explains contract risks in simple terms."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
-                temperature=0.7,
-                max_tokens=1024
-            )
-            return chat_completion.choices[0].message.content
-        except Exception as e:
-            print(f"❌ Groq API error: {e}")
-            return self._generate_mock_explanation(risk_data, user_explanation)
-
-    def generate_negotiation_email(self, risk_data: dict) -> str:
-        if not self.client:
-            return self._generate_mock_email(risk_data)
+        return [
+            {
+                "role": "system",
+                "content": "You are a helpful legal assistant who explains contract risks in simple terms."
+            },
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ]
 
-        try:
-            prompt = f"""Generate a professional but firm negotiation email based on these contract risks:
+    def _email_messages(self, risk_data: dict) -> list:
+        prompt = f"""Generate a professional but firm negotiation email based on these contract risks:
 
 Safety Score: {risk_data['score']}/100
-Risks: {risk_data['risks']}
+Risks:
+{format_risks(risk_data['risks'], settings.LLM_PROMPT_RISK_TOKENS)}
 
 The email should:
 1. Be polite and professional
@@ -75,26 +107,163 @@ The email should:
 5. Be ready to send (include Subject line)
 
 Format as a complete email."""
-            
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a professional contract negotiator who writes clear, firm but polite emails."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="llama-3.3-70b-versatile",
-                temperature=0.6,
-                max_tokens=800
-            )
-            return chat_completion.choices[0].message.content
+        return [
+            {
+                "role": "system",
+                "content": "You are a professional contract negotiator who writes clear, firm but polite emails."
+            },
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ]
+
+    def _fallback(self, kind: str, reason: str, fallback):
+        LLM_FALLBACKS.inc(kind, reason)
+        return fallback()
+
+    def _generate(self, kind: str, messages: list, params: dict, fallback) -> str:
+        if not self.client:
+            return self._fallback(kind, "no_client", fallback)
+
+        started = time.perf_counter()
+        try:
+            content = self.client.complete(kind, messages, params)
+        except LLMUnavailable:
+            return self._fallback(kind, "circuit_open", fallback)
+        except Exception as e:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, kind, "error")
+            logger.error(f"❌ Groq API error: {e}")
+            return self._fallback(kind, "error", fallback)
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, kind, "ok")
+        return content
+
+    def generate_explanation(self, risk_data: dict, user_explanation: str) -> str:
+        return self._generate(
+            "explanation",
+            self._explanation_messages(risk_data, user_explanation),
+            EXPLANATION_PARAMS,
+            lambda: self._generate_mock_explanation(risk_data, user_explanation)
+        )
+
+    def generate_negotiation_email(self, risk_data: dict) -> str:
+        return self._generate(
+            "negotiation_email",
+            self._email_messages(risk_data),
+            EMAIL_PARAMS,
+            lambda: self._generate_mock_email(risk_data)
+        )
+
+    async def _agenerate(self, kind: str, cache_parts: tuple, messages: list, params: dict, fallback, timeout: float = None) -> str:
+        """
+        One async completion. Real outputs are cached by (kind, risk_data, prompt
+        version); failures and timeouts fall back to the mock, which is never cached.
+        """
+        cached = await run_in_threadpool(result_cache.get_llm, kind, PROMPT_VERSION, *cache_parts)
+        if cached is not None:
+            return cached
+        if not self.client:
+            return self._fallback(kind, "no_client", fallback)
+
+        started = time.perf_counter()
+        try:
+            content = await asyncio.wait_for(self.client.acomplete(kind, messages, params), timeout)
+        except LLMUnavailable:
+            return self._fallback(kind, "circuit_open", fallback)
+        except asyncio.TimeoutError:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, kind, "timeout")
+            logger.error(f"❌ Groq API timed out after {timeout}s")
+            return self._fallback(kind, "timeout", fallback)
+        except Exception as e:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, kind, "error")
+            logger.error(f"❌ Groq API error: {e}")
+            return self._fallback(kind, "error", fallback)
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, kind, "ok")
+
+        await run_in_threadpool(result_cache.set_llm, kind, content, PROMPT_VERSION, *cache_parts)
+        return content
+
+    async def agenerate_explanation(self, risk_data: dict, user_explanation: str, timeout: float = None) -> str:
+        """Async variant of generate_explanation; does not block the event loop."""
+        return await self._agenerate(
+            "explanation",
+            (risk_data, user_explanation),
+            self._explanation_messages(risk_data, user_explanation),
+            EXPLANATION_PARAMS,
+            lambda: self._generate_mock_explanation(risk_data, user_explanation),
+            timeout
+        )
+
+    async def agenerate_negotiation_email(self, risk_data: dict, timeout: float = None) -> str:
+        """Async variant of generate_negotiation_email."""
+        return await self._agenerate(
+            "negotiation_email",
+            (risk_data,),
+            self._email_messages(risk_data),
+            EMAIL_PARAMS,
+            lambda: self._generate_mock_email(risk_data),
+            timeout
+        )
+
+    async def _astream(self, kind: str, cache_parts: tuple, messages: list, params: dict, fallback):
+        """Yield content deltas from Groq as they arrive; fall back to the mock if nothing was streamed."""
+        cached = await run_in_threadpool(result_cache.get_llm, kind, PROMPT_VERSION, *cache_parts)
+        if cached is not None:
+            yield cached
+            return
+        if not self.client:
+            yield self._fallback(kind, "no_client", fallback)
+            return
+
+        parts = []
+        started = time.perf_counter()
+        try:
+            async for delta in self.client.astream(kind, messages, params):
+                parts.append(delta)
+                yield delta
+        except LLMUnavailable:
+            yield self._fallback(kind, "circuit_open", fallback)
+            return
         except Exception as e:
-            print(f"❌ Groq API error: {e}")
-            return self._generate_mock_email(risk_data)
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, kind, "error")
+            logger.error(f"❌ Groq API error: {e}")
+            if not parts:
+                yield self._fallback(kind, "error", fallback)
+            return
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, kind, "ok")
+
+        await run_in_threadpool(result_cache.set_llm, kind, "".join(parts), PROMPT_VERSION, *cache_parts)
+
+    def astream_explanation(self, risk_data: dict, user_explanation: str):
+        return self._astream(
+            "explanation",
+            (risk_data, user_explanation),
+            self._explanation_messages(risk_data, user_explanation),
+            EXPLANATION_PARAMS,
+            lambda: self._generate_mock_explanation(risk_data, user_explanation)
+        )
+
+    def astream_negotiation_email(self, risk_data: dict):
+        return self._astream(
+            "negotiation_email",
+            (risk_data,),
+            self._email_messages(risk_data),
+            EMAIL_PARAMS,
+            lambda: self._generate_mock_email(risk_data)
+        )
+
+    async def agenerate_all(self, risk_data: dict, user_explanation: str, timeout: float = None) -> tuple:
+        """
+        Generate the explanation and negotiation email concurrently.
+        Each call has its own timeout and falls back to its own mock output,
+        so total latency is roughly the slower of the two.
+        """
+        timeout = settings.LLM_TIMEOUT_SECONDS if timeout is None else timeout
+        explanation, negotiation_email = await asyncio.gather(
+            self.agenerate_explanation(risk_data, user_explanation, timeout),
+            self.agenerate_negotiation_email(risk_data, timeout)
+        )
+        return explanation, negotiation_email
 
     def _generate_mock_explanation(self, risk_data: dict, user_explanation: str) -> str:
         """Generate a detailed mock explanation when Groq is unavailable"""
@@ -0,0 +1,419 @@
+# Shared Groq client layer behind LLMService. Every completion in the process
+# goes through:
+# - one pooled client per event loop (plus one for sync callers), so connections are reused
+# - a process-wide cap on calls in flight (LLM_MAX_CONCURRENCY), shared by all loops and threads
+# - token buckets for requests and tokens per minute, matching the Groq plan limits;
+#   a 429 with Retry-After also pauses every other caller for that long
+# - jittered exponential retry on 429, 5xx and connection errors
+# - a circuit breaker: after LLM_BREAKER_FAILURES failed calls in a row, calls fail
+#   fast with LLMUnavailable for LLM_BREAKER_COOLDOWN_SECONDS, then one trial call is let through
+# Token usage, retries and latency are logged and counted per call.
+import asyncio
+import collections
+import logging
+import random
+import threading
+import time
+import weakref
+import groq
+import httpx
+from groq import Groq, AsyncGroq
+from app.core.config import settings
+from app.core.metrics import LLM_RETRIES, LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English); used for budgets and rate limiting."""
+    return len(text) // 4 + 1
+
+
+def estimate_prompt_tokens(messages: list) -> int:
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages)
+
+
+class LLMUnavailable(Exception):
+    """Raised without calling Groq while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at per_minute / 60 per second. reserve() always
+    succeeds and returns how long the caller must wait; the balance may go negative,
+    so waiting callers are served in arrival order.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ConcurrencyLimit:
+    """Process-wide cap on calls in flight, usable from any event loop or thread. Waiters are served FIFO."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    def _acquire_or_wait(self, grant) -> bool:
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                return True
+            self._waiters.append(grant)
+            return False
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                # The slot passes straight to the next waiter; in_flight is unchanged
+                if self._waiters.popleft()():
+                    return
+            self.in_flight -= 1
+
+    def acquire(self):
+        event = threading.Event()
+        if not self._acquire_or_wait(lambda: event.set() or True):
+            event.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def hand_over():
+            if future.cancelled():
+                self.release()
+            else:
+                future.set_result(None)
+
+        def grant():
+            if loop.is_closed():
+                return False
+            loop.call_soon_threadsafe(hand_over)
+            return True
+
+        if self._acquire_or_wait(grant):
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = grant not in self._waiters
+                if not granted:
+                    self._waiters.remove(grant)
+            # Granted and already handed over: the slot is ours to give back
+            if granted and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def queued(self) -> int:
+        return len(self._waiters)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; after the cooldown, one trial call at a time."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            # Trial call: re-arm the cooldown so concurrent callers keep failing fast
+            self.state = "half_open"
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("✅ Groq circuit closed")
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                if self.state == "closed":
+                    logger.warning(f"⚠️ Groq circuit opened after {self.failures} failed calls")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    def __init__(self, api_key: str, base_url: str = ""):
+        self.api_key = api_key
+        self.base_url = base_url or None
+        self.limit = ConcurrencyLimit(settings.LLM_MAX_CONCURRENCY)
+        self.request_bucket = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE) if settings.LLM_REQUESTS_PER_MINUTE > 0 else None
+        self.token_bucket = TokenBucket(settings.LLM_TOKENS_PER_MINUTE) if settings.LLM_TOKENS_PER_MINUTE > 0 else None
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_COOLDOWN_SECONDS)
+        self._paused_until = 0.0
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def _limits(self):
+        return httpx.Limits(max_connections=settings.LLM_MAX_CONCURRENCY, max_keepalive_connections=settings.LLM_MAX_CONCURRENCY)
+
+    def _sync_client(self) -> Groq:
+        with self._lock:
+            if self._client is None:
+                # Retries are ours (with shared backoff and breaker state), not the SDK's
+                self._client = Groq(
+                    api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                    timeout=settings.LLM_TIMEOUT_SECONDS, http_client=groq.DefaultHttpxClient(limits=self._limits())
+                )
+            return self._client
+
+    def _async_client(self) -> AsyncGroq:
+        # Pooled connections belong to the loop that opened them (Celery runs one loop per thread)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = AsyncGroq(
+                    api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                    timeout=settings.LLM_TIMEOUT_SECONDS, http_client=groq.DefaultAsyncHttpxClient(limits=self._limits())
+                )
+            return client
+
+    def _count(self, **amounts):
+        with self._lock:
+            self._stats.update(amounts)
+
+    def _check_open(self):
+        if self.breaker.is_open():
+            self._count(rejected=1)
+            raise LLMUnavailable("Groq circuit breaker is open")
+
+    def _reserve(self, reserved_tokens: int) -> float:
+        """Seconds to wait before sending: the longer of the rate limits and any 429 pause."""
+        wait = max(0.0, self._paused_until - time.monotonic())
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.reserve(reserved_tokens))
+        return wait
+
+    def _unreserve(self, reserved_tokens: int, sent: bool):
+        """Give back the reservation of an attempt that failed, or was never sent."""
+        if self.token_bucket is not None:
+            self.token_bucket.refund(reserved_tokens)
+        if not sent and self.request_bucket is not None:
+            self.request_bucket.refund(1)
+
+    def _begin_attempt(self):
+        if not self.breaker.allow():
+            self._count(rejected=1)
+            raise LLMUnavailable("Groq circuit breaker is open")
+
+    def _wait_turn(self, reserved_tokens: int):
+        try:
+            time.sleep(self._reserve(reserved_tokens))
+            self._begin_attempt()
+        except BaseException:
+            self._unreserve(reserved_tokens, sent=False)
+            raise
+
+    async def _await_turn(self, reserved_tokens: int):
+        """Wait out the rate limits and claim the attempt from the breaker; the reservation is returned if either fails."""
+        try:
+            await asyncio.sleep(self._reserve(reserved_tokens))
+            self._begin_attempt()
+        except BaseException:
+            self._unreserve(reserved_tokens, sent=False)
+            raise
+
+    def _retry_delay(self, kind: str, error: Exception, attempt: int):
+        """Backoff before the next attempt, or None when the error is not worth retrying."""
+        status = getattr(error, "status_code", None)
+        if isinstance(error, groq.APIConnectionError):
+            reason = "timeout" if isinstance(error, groq.APITimeoutError) else "connection"
+        elif status in RETRYABLE_STATUS or (status is not None and status >= 500):
+            reason = "rate_limited" if status == 429 else "server_error"
+        else:
+            return None
+        if attempt >= settings.LLM_MAX_RETRIES:
+            return None
+
+        # Full jitter, so callers that failed together do not retry together
+        delay = random.uniform(0, min(settings.LLM_RETRY_MAX_DELAY_SECONDS, settings.LLM_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+            # The provider asked everyone to back off, not just this call
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        LLM_RETRIES.inc(kind, reason)
+        self._count(retries=1)
+        logger.warning(f"⚠️ Groq {kind} call failed ({reason}), retrying in {delay:.2f}s")
+        return delay
+
+    def _settle(self, kind: str, reserved_tokens: int, prompt_tokens: int, completion_tokens: int, started: float, attempts: int):
+        # Give back what the reservation (prompt estimate + max_tokens) over-counted
+        if self.token_bucket is not None:
+            self.token_bucket.refund(max(0, reserved_tokens - prompt_tokens - completion_tokens))
+        LLM_TOKENS.inc(kind, "prompt", amount=prompt_tokens)
+        LLM_TOKENS.inc(kind, "completion", amount=completion_tokens)
+        self._count(calls=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        logger.info(
+            f"🤖 Groq {kind}: {prompt_tokens} prompt + {completion_tokens} completion tokens "
+            f"in {time.perf_counter() - started:.2f}s ({attempts} attempt{'s' if attempts > 1 else ''})"
+        )
+
+    def _failed(self):
+        self.breaker.record_failure()
+        self._count(failures=1)
+
+    def complete(self, kind: str, messages: list, params: dict) -> str:
+        """Blocking completion; raises LLMUnavailable or the last Groq error."""
+        self._check_open()
+        reserved = estimate_prompt_tokens(messages) + params.get("max_tokens", 0)
+        started = time.perf_counter()
+        self.limit.acquire()
+        try:
+            for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                self._wait_turn(reserved)
+                try:
+                    completion = self._sync_client().chat.completions.create(messages=messages, **params)
+                except Exception as e:
+                    self._unreserve(reserved, sent=True)
+                    delay = self._retry_delay(kind, e, attempt)
+                    if delay is None:
+                        self._failed()
+                        raise
+                    time.sleep(delay)
+                    continue
+                self.breaker.record_success()
+                usage = completion.usage
+                self._settle(kind, reserved, usage.prompt_tokens, usage.completion_tokens, started, attempt + 1)
+                return completion.choices[0].message.content
+        finally:
+            self.limit.release()
+
+    async def acomplete(self, kind: str, messages: list, params: dict) -> str:
+        """Async completion; raises LLMUnavailable or the last Groq error."""
+        self._check_open()
+        reserved = estimate_prompt_tokens(messages) + params.get("max_tokens", 0)
+        started = time.perf_counter()
+        await self.limit.acquire_async()
+        try:
+            for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                await self._await_turn(reserved)
+                try:
+                    completion = await self._async_client().chat.completions.create(messages=messages, **params)
+                except asyncio.CancelledError:
+                    # Timed out by the caller mid-request
+                    self._unreserve(reserved, sent=True)
+                    self._failed()
+                    raise
+                except Exception as e:
+                    self._unreserve(reserved, sent=True)
+                    delay = self._retry_delay(kind, e, attempt)
+                    if delay is None:
+                        self._failed()
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                self.breaker.record_success()
+                usage = completion.usage
+                self._settle(kind, reserved, usage.prompt_tokens, usage.completion_tokens, started, attempt + 1)
+                return completion.choices[0].message.content
+        finally:
+            self.limit.release()
+
+    async def astream(self, kind: str, messages: list, params: dict):
+        """
+        Yield content deltas. Failures before the first delta are retried like
+        acomplete; once output has been streamed, errors are raised to the caller.
+        """
+        self._check_open()
+        reserved = estimate_prompt_tokens(messages) + params.get("max_tokens", 0)
+        started = time.perf_counter()
+        await self.limit.acquire_async()
+        try:
+            for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                await self._await_turn(reserved)
+                streamed = []
+                usage = None
+                try:
+                    stream = await self._async_client().chat.completions.create(messages=messages, stream=True, **params)
+                    async for chunk in stream:
+                        if chunk.x_groq is not None and chunk.x_groq.usage is not None:
+                            usage = chunk.x_groq.usage
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            streamed.append(delta)
+                            yield delta
+                except asyncio.CancelledError:
+                    self._unreserve(reserved, sent=True)
+                    self._failed()
+                    raise
+                except Exception as e:
+                    self._unreserve(reserved, sent=True)
+                    delay = None if streamed else self._retry_delay(kind, e, attempt)
+                    if delay is None:
+                        self._failed()
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                self.breaker.record_success()
+                if usage is not None:
+                    prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+                else:
+                    prompt_tokens, completion_tokens = estimate_prompt_tokens(messages), estimate_tokens("".join(streamed))
+                self._settle(kind, reserved, prompt_tokens, completion_tokens, started, attempt + 1)
+                return
+        finally:
+            self.limit.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._stats)
+        return {
+            "base_url": self.base_url or "https://api.groq.com",
+            "circuit": self.breaker.state,
+            "in_flight": self.limit.in_flight,
+            "queued": self.limit.queued(),
+            "max_concurrency": self.limit.limit,
+            "requests_per_minute": settings.LLM_REQUESTS_PER_MINUTE,
+            "tokens_per_minute": settings.LLM_TOKENS_PER_MINUTE,
+            **{k: counts.get(k, 0) for k in ("calls", "retries", "failures", "rejected", "prompt_tokens", "completion_tokens")}
+        }
@@ -1,78 +1,381 @@
-import re
+import difflib
+import hashlib
+import multiprocessing
+import os
+import threading
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
+from app.services.clause_index import clause_search
 from app.services.ml_service import ml_service
+from app.services.result_cache import canonical_hash
+from app.services.rules import SEVERITY_ORDER, rule_engine
+from app.services.segmenter import segment_clauses, expand_to_clauses, iter_stream_clauses
+
+# Characters of each clause kept in clause maps, to describe removed clauses in a revision delta
+EXCERPT_CHARS = 120
+# Leading characters of the contract shown as its summary
+SUMMARY_CHARS = 200
+
+
+def clause_hash(clause_text: str) -> str:
+    return hashlib.sha256(clause_text.encode("utf-8")).hexdigest()[:32]
+
+
+def _rules_stage(contract_text: str, user_expectations: str):
+    """Segmentation + deterministic rules for one document; runs in the batch worker processes."""
+    spans = segment_clauses(contract_text)
+    risks, score = risk_engine.analyze_rules(contract_text, user_expectations, spans)
+    return spans, risks, score
+
+def _pieces(text: str, size: int):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
 
 class RiskEngine:
+    def __init__(self):
+        self._rule_pool = None
+        self._rule_pool_lock = threading.Lock()
+
+    def _rule_workers(self) -> int:
+        return settings.BATCH_RULE_WORKERS or os.cpu_count() or 1
+
+    def _get_rule_pool(self) -> ProcessPoolExecutor:
+        with self._rule_pool_lock:
+            if self._rule_pool is None:
+                self._rule_pool = ProcessPoolExecutor(
+                    max_workers=self._rule_workers(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._rule_pool
+
     def analyze(self, contract_text: str, user_expectations: str):
         """
         Compare contract text with user expectations using a hybrid of rules and ML.
         """
-        risks = []
-        score = 100
-        
-        contract_lower = contract_text.lower()
-        expectations_lower = user_expectations.lower()
-        
-        # 1. Deterministic Rule-Based Analysis (High Precision)
-        
-        # Payment Terms
-        if "90 days" in contract_lower:
-            risks.append({
-                "category": "Payment Terms",
-                "severity": "High",
-                "finding": "Payment terms are Net 90, which is very long.",
-                "expectation_check": "Mismatch" if ("net 15" in expectations_lower or "net 30" in expectations_lower) else "Concern"
-            })
-            score -= 20
-            
-        # Termination
-        if "immediately" in contract_lower and "without notice" in contract_lower:
-             risks.append({
-                "category": "Termination",
-                "severity": "Critical",
-                "finding": "Client can terminate immediately without cause. You are not protected.",
-                 "expectation_check": "Mismatch"
-            })
-             score -= 30
-
-        # Liability
-        if "unlimited" in contract_lower:
-             risks.append({
-                "category": "Liability",
-                "severity": "Severe",
-                "finding": "Your liability is unlimited. This is a major financial risk.",
-                "expectation_check": "Mismatch"
-            })
-             score -= 40
+        if settings.STREAMING_ANALYSIS_MIN_CHARS and len(contract_text) >= settings.STREAMING_ANALYSIS_MIN_CHARS:
+            return self.analyze_stream(_pieces(contract_text, settings.STREAM_PIECE_CHARS), user_expectations)
+
+        # Segment once; the rules and the semantic engine share the clause spans
+        spans = segment_clauses(contract_text)
+        risks, score = self.analyze_rules(contract_text, user_expectations, spans)
 
         # 2. ML-Based Semantic Analysis (High Recall)
         # This catch risks that don't match exact keywords but have 'risky' meaning
-        semantic_risks = ml_service.analyze_clause_semantic(contract_text)
-        
+        semantic_risks = ml_service.analyze_clause_semantic(contract_text, spans=spans)
+        semantic_risks, score = self.merge_semantic(risks, score, semantic_risks)
+
+        return self.build_result(contract_text, risks + semantic_risks, score)
+
+    def analyze_stream(self, pieces, user_expectations: str, top_k: int = None):
+        """
+        analyze() for a document delivered as successive text pieces (see
+        ocr_service.iter_text), in memory bounded by the piece size rather than the
+        document: clauses are segmented as the text arrives, the rules scan each piece
+        once, clauses are encoded STREAM_ENCODE_BATCH at a time, and only the top_k
+        (STREAM_TOP_K) semantic findings per category are kept. Same result as
+        analyze() on the joined text unless a category has more findings than that.
+        """
+        rules = rule_engine.stream()
+        head = []
+
+        def text():
+            size = 0
+            for piece in pieces:
+                if size < SUMMARY_CHARS:
+                    head.append(piece[:SUMMARY_CHARS - size])
+                size += len(piece)
+                with STAGE_SECONDS.time("rules"):
+                    rules.feed(piece)
+                yield piece
+
+        def clauses():
+            for start, end, clause in iter_stream_clauses(text()):
+                rules.add_clause(start, end)
+                yield start, end, clause
+
+        semantic_risks = ml_service.stream_semantic(clauses(), top_k or settings.STREAM_TOP_K)
+        risks, penalty = rule_engine.risks(rules.matches(), user_expectations)
+        semantic_risks, score = self.merge_semantic(risks, 100 - penalty, semantic_risks)
+        return self.build_result("".join(head), risks + semantic_risks, score)
+
+    def analyze_batch(self, documents: list):
+        """
+        Analyze many (contract_text, user_expectations) pairs. Rules run in parallel
+        across worker processes; the clauses of all documents go through the encoder
+        together. Returns one risk_data dict per document, in order.
+        """
+        if not documents:
+            return []
+        texts = [text for text, _ in documents]
+        expectations = [exp for _, exp in documents]
+
+        if len(documents) > 1 and self._rule_workers() > 1:
+            chunksize = max(1, len(documents) // (4 * self._rule_workers()))
+            # Timed here: observations made inside the pool processes are not exported
+            with STAGE_SECONDS.time("rules"):
+                rule_results = list(self._get_rule_pool().map(_rules_stage, texts, expectations, chunksize=chunksize))
+        else:
+            rule_results = [_rules_stage(text, exp) for text, exp in documents]
+
+        semantic = ml_service.analyze_batch_semantic(texts, [spans for spans, _, _ in rule_results])
+
+        results = []
+        for text, (_, risks, score), semantic_risks in zip(texts, rule_results, semantic):
+            semantic_risks, score = self.merge_semantic(risks, score, semantic_risks)
+            results.append(self.build_result(text, risks + semantic_risks, score))
+        return results
+
+    def cache_version(self):
+        """
+        Identifies everything besides the inputs that shapes analyze() output.
+        None while the model is still warming up: rule-only results must not be cached.
+        """
+        if not ml_service.ready.is_set():
+            return None
+        return canonical_hash(
+            [repr(r) for r in rule_engine.rules], ml_service.embedding_id, ml_service.enabled, ml_service.risk_patterns,
+            # kNN findings depend on the clause corpus; every indexed clause invalidates them
+            clause_search.knn_version()
+        )
+
+    def clause_version(self):
+        """
+        Identifies everything besides the clause text that shapes per-clause results
+        (rule hits, semantic finding). None while the model is still warming up.
+        """
+        if not ml_service.ready.is_set():
+            return None
+        return canonical_hash(
+            [repr(r) for r in rule_engine.rules], ml_service.embedding_id, ml_service.enabled, ml_service.risk_patterns,
+            # Reused clause findings include kNN votes, which any indexed clause can change
+            clause_search.knn_version()
+        )
+
+    @STAGE_SECONDS.timed("rules")
+    def analyze_rules(self, contract_text: str, user_expectations: str, spans: list = None, hits: dict = None):
+        """
+        Deterministic findings only. Returns (risks, score after rule penalties).
+        With clause spans, finding offsets are widened to the clauses they occur in.
+        `hits` are phrase hits already gathered for the whole text (see analyze_revision).
+        """
+        # 1. Deterministic Rule-Based Analysis (High Precision)
+        # All rules in app/services/rules.py are evaluated in a single scan
+        risks, penalty = rule_engine.findings(
+            rule_engine.scan(contract_text) if hits is None else hits, user_expectations
+        )
+        score = 100 - penalty
+
+        if spans:
+            for risk in risks:
+                risk["start"], risk["end"] = expand_to_clauses(spans, risk["start"], risk["end"])
+
+        return risks, score
+
+    def analyze_revision(self, contract_text: str, user_expectations: str, previous: dict = None):
+        """
+        Analyze a contract against the clause map of an earlier version of it.
+        Clause sequences are diffed by content hash; only inserted and modified
+        clauses are scanned by the rules and encoded, and the document-level
+        steps (rule evaluation, merge, score) run over the per-clause results.
+        The output matches analyze() on the same text.
+        Returns (risk_data, clause map of this version, revision delta).
+        """
+        spans = segment_clauses(contract_text)
+        texts = [contract_text[start:end] for start, end in spans]
+        hashes = [clause_hash(t) for t in texts]
+        version = self.clause_version()
+        old = previous["clauses"] if previous else []
+        reusable = previous is not None and version is not None and previous["version"] == version
+
+        # matched[j]: position in the previous version of the identical clause j
+        opcodes = difflib.SequenceMatcher(None, [c["hash"] for c in old], hashes, autojunk=False).get_opcodes()
+        matched = [None] * len(spans)
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "equal":
+                matched[j1:j2] = range(i1, i2)
+
+        fresh = [j for j in range(len(spans)) if matched[j] is None or not reusable]
+        hits = [None] * len(spans)
+        findings = [None] * len(spans)
+        with STAGE_SECONDS.time("rules"):
+            for j in fresh:
+                hits[j] = rule_engine.scan(texts[j])
+        for j, finding in zip(fresh, ml_service.clause_findings(contract_text, [spans[j] for j in fresh])):
+            findings[j] = finding
+        for j in range(len(spans)):
+            if hits[j] is None:
+                clause = old[matched[j]]
+                hits[j] = clause["hits"]
+                findings[j] = self._expand_finding(clause["finding"], spans[j], texts[j])
+
+        if rule_engine.clause_local:
+            doc_hits = {}
+            for (start, _), clause_hits in zip(spans, hits):
+                for phrase, starts in clause_hits.items():
+                    doc_hits.setdefault(phrase, []).extend(start + s for s in starts)
+        else:
+            doc_hits = rule_engine.scan(contract_text)
+        risks, score = self.analyze_rules(contract_text, user_expectations, spans, hits=doc_hits)
+        semantic_risks, score = self.merge_semantic(risks, score, ml_service.assemble_findings(findings))
+        risk_data = self.build_result(contract_text, risks + semantic_risks, score)
+
+        clause_map = self.build_clause_map(contract_text, spans, findings, risk_data["risks"], hits=hits, version=version)
+        categories = [clause["risks"] for clause in clause_map["clauses"]]
+        revision = {
+            "incremental": reusable,
+            "clauses_total": len(spans),
+            "clauses_reused": len(spans) - len(fresh),
+            "clauses_analyzed": len(fresh),
+            "clauses": self._clause_deltas(opcodes, old, spans, texts, categories)
+        }
+        return risk_data, clause_map, revision
+
+    def analyze_with_clause_map(self, contract_text: str, user_expectations: str):
+        """analyze() plus the clause map of the document, from the same single analysis. Returns (risk_data, clause map)."""
+        risk_data, clause_map, _ = self.analyze_revision(contract_text, user_expectations)
+        return risk_data, clause_map
+
+    def build_clause_map(self, contract_text: str, spans: list, findings: list, risks: list, hits: list = None, version=None) -> dict:
+        """
+        Clause map of an analyzed document: its clause spans, the per-clause semantic
+        findings (see ml_service.clause_findings) and the final risks. Per-clause rule
+        hits are scanned here unless given; that scan needs no model.
+        """
+        texts = [contract_text[start:end] for start, end in spans]
+        if hits is None:
+            with STAGE_SECONDS.time("rules"):
+                hits = [rule_engine.scan(t) for t in texts]
+        categories = self._clause_categories(spans, risks)
+        return {
+            "version": self.clause_version() if version is None else version,
+            "clauses": [
+                {
+                    "hash": clause_hash(texts[j]),
+                    "excerpt": texts[j][:EXCERPT_CHARS],
+                    "hits": hits[j],
+                    "finding": self._compact_finding(findings[j]),
+                    "risks": categories[j]
+                }
+                for j in range(len(spans))
+            ]
+        }
+
+    def _compact_finding(self, finding):
+        # The finding covers its whole clause: text and offsets are implied by the clause
+        if finding is None:
+            return None
+        return {k: finding[k] for k in ("category", "severity", "confidence", "source") if k in finding}
+
+    def _expand_finding(self, compact, span, clause_text: str):
+        if compact is None:
+            return None
+        finding = {
+            "category": compact["category"],
+            "finding": clause_text,
+            "severity": compact["severity"],
+            "confidence": compact["confidence"],
+            "start": span[0],
+            "end": span[1]
+        }
+        if "source" in compact:
+            finding["source"] = compact["source"]
+        return finding
+
+    def _clause_categories(self, spans: list, risks: list) -> list:
+        """Sorted categories of the findings overlapping each clause."""
+        starts = [start for start, _ in spans]
+        categories = [set() for _ in spans]
+        for risk in risks:
+            if risk.get("start") is None:
+                continue
+            j = max(0, bisect_right(starts, risk["start"]) - 1)
+            while j < len(spans) and spans[j][0] < risk["end"]:
+                if spans[j][1] > risk["start"]:
+                    categories[j].add(risk["category"])
+                j += 1
+        return [sorted(c) for c in categories]
+
+    def _clause_deltas(self, opcodes: list, old: list, spans: list, texts: list, categories: list) -> list:
+        """
+        Changed clauses in document order: inserted, modified (paired by position
+        within a replaced block) and removed, plus unchanged clauses whose flagged
+        categories changed because of edits elsewhere.
+        """
+        deltas = []
+
+        def add(status, i, j):
+            before = set(old[i]["risks"]) if i is not None else set()
+            after = set(categories[j]) if j is not None else set()
+            if status == "unchanged" and before == after:
+                return
+            deltas.append({
+                "status": status,
+                "position": j,
+                "previous_position": i,
+                "start": spans[j][0] if j is not None else None,
+                "end": spans[j][1] if j is not None else None,
+                "excerpt": texts[j][:EXCERPT_CHARS] if j is not None else old[i]["excerpt"],
+                "risks_added": sorted(after - before),
+                "risks_removed": sorted(before - after)
+            })
+
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "equal":
+                for i, j in zip(range(i1, i2), range(j1, j2)):
+                    add("unchanged", i, j)
+                continue
+            for k in range(max(i2 - i1, j2 - j1)):
+                i = i1 + k if k < i2 - i1 else None
+                j = j1 + k if k < j2 - j1 else None
+                add("modified" if i is not None and j is not None else "inserted" if j is not None else "removed", i, j)
+        return deltas
+
+    def merge_semantic(self, risks: list, score: int, semantic_risks: list):
+        """
+        Keep semantic findings not already covered by earlier findings.
+        Returns (new risks, score after their penalties).
+        """
+        accepted = []
         for s_risk in semantic_risks:
-            # Avoid duplicate categories from rules if the finding is very similar
-            is_duplicate = any(r['category'] == s_risk['category'] and (s_risk['finding'] in r['finding'] or r['finding'] in s_risk['finding']) for r in risks)
+            # Avoid duplicate categories from rules if the finding is very similar or from the same clause.
+            # Accepted semantic findings count for the text check only, as when they were appended to the risks
+            is_duplicate = any(r['category'] == s_risk['category'] and (s_risk['finding'] in r['finding'] or r['finding'] in s_risk['finding']) for r in risks + accepted)
+            is_duplicate = is_duplicate or any(r['category'] == s_risk['category'] and self._same_clause(r, s_risk) for r in risks)
             
             if not is_duplicate:
                 s_risk["expectation_check"] = "AI Flagged"
-                risks.append(s_risk)
+                accepted.append(s_risk)
                 
                 # Penalty based on severity
                 if s_risk["severity"] == "High":
                     score -= 15
                 else:
                     score -= 10
-             
+
+        return accepted, score
+
+    def _same_clause(self, a: dict, b: dict) -> bool:
+        if a.get("start") is None or b.get("start") is None:
+            return False
+        return a["start"] < b["end"] and b["start"] < a["end"]
+
+    def build_result(self, contract_text: str, risks: list, score: int):
+        """Normalize the score and order findings by severity."""
+        risks = list(risks)
+
         # Normalize score
         score = max(5, score) # Cap at 5 minimum for visibility
         
         # Sort risks by severity
-        severity_map = {"Critical": 4, "Severe": 3, "High": 2, "Medium": 1}
-        risks.sort(key=lambda x: severity_map.get(x["severity"], 0), reverse=True)
+        risks.sort(key=lambda x: SEVERITY_ORDER.get(x["severity"], 0), reverse=True)
         
         return {
             "score": score,
             "risks": risks,
-            "contract_summary": contract_text[:200] + "..."
+            "contract_summary": contract_text[:SUMMARY_CHARS] + "..."
         }
 
 risk_engine = RiskEngine()
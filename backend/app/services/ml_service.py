@@ -1,14 +1,28 @@
+import heapq
 import logging
-import torch
+import threading
+import time
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
+from app.services.clause_index import clause_search
+from app.services.embedding_backends import DEFAULT_MODEL, create_backend
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_server import EmbeddingClient
+from app.services.encode_batcher import EncodeBatcher
+from app.services.pattern_artifact import load_artifact, build_artifact
+from app.services.segmenter import segment_clauses
+from app.services.similarity import PatternIndex
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class MLService:
     def __init__(self):
-        self.model_name = 'all-MiniLM-L6-v2'
+        self.model_name = DEFAULT_MODEL
+        self.backend = create_backend(settings.EMBEDDING_BACKEND, self.model_name, settings.EMBEDDING_THREADS)
+        # Model + backend: quantized backends give slightly different vectors, so caches are keyed by both
+        self.embedding_id = self.backend.embedding_id
         self.model = None
+        self.batcher = None
         self.risk_patterns = {
             "Termination": [
                 "terminate at any time without notice",
@@ -35,23 +49,66 @@ class MLService:
                 "perpetual exclusive license to all tools"
             ]
         }
-        self.pattern_embeddings = {}
+        self.pattern_index = None
+        self.embedding_cache = EmbeddingCache(
+            self.embedding_id,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+            directory=settings.EMBEDDING_CACHE_DIR
+        )
         self.enabled = False
-        self._initialize_model()
+        # Set once warm-up has finished, whether or not the model could be loaded
+        self.ready = threading.Event()
+        self.warm_up_seconds = None
+        self._warm_up_lock = threading.Lock()
+        self._warm_up_thread = None
+
+    def start_warm_up(self):
+        """Load the model on a background thread; safe to call more than once."""
+        with self._warm_up_lock:
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(target=self.warm_up, name="ml-warm-up", daemon=True)
+                self._warm_up_thread.start()
+
+    def warm_up(self):
+        started = time.perf_counter()
+        try:
+            self._initialize_model()
+        finally:
+            self.warm_up_seconds = time.perf_counter() - started
+            self.ready.set()
+            logger.info(f"ML warm-up finished in {self.warm_up_seconds:.1f}s (enabled={self.enabled})")
 
     def _initialize_model(self):
         try:
-            import numpy as np
-            from sentence_transformers import SentenceTransformer
-            
-            logger.info(f"Loading ML model: {self.model_name}...")
-            # Use CPU by default for stability
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.model = SentenceTransformer(self.model_name, device=device)
+            if settings.EMBEDDING_SERVER_SOCKET:
+                # Thin client: the shared embedding server owns the model
+                client = EmbeddingClient(settings.EMBEDDING_SERVER_SOCKET, settings.EMBEDDING_SERVER_TIMEOUT_SECONDS)
+                logger.info(f"Connecting to embedding server at {settings.EMBEDDING_SERVER_SOCKET}...")
+                served = client.wait_until_ready(settings.EMBEDDING_SERVER_TIMEOUT_SECONDS)["embedding_id"]
+                if served != self.embedding_id:
+                    raise RuntimeError(f"embedding server serves {served}, expected {self.embedding_id}")
+                self.model = client
+            else:
+                logger.info(f"Loading ML model: {self.model_name} ({self.backend.name} backend)...")
+                self.backend.load()
+                self.model = self.backend
+                # Concurrent requests in this worker share model calls; the embedding server batches on its side
+                self.batcher = EncodeBatcher(
+                    lambda sentences: self.model.encode(sentences, batch_size=settings.ENCODE_BATCH_SIZE),
+                    max_batch=settings.ENCODE_BATCH_MAX_SENTENCES,
+                    max_wait_ms=settings.ENCODE_BATCH_MAX_WAIT_MS
+                )
             
-            # Pre-calculate embeddings for risk patterns
-            for category, patterns in self.risk_patterns.items():
-                self.pattern_embeddings[category] = self.model.encode(patterns)
+            # Pattern embeddings come from the memory-mapped artifact; encode only if it is stale
+            self.pattern_index = load_artifact(self.embedding_id, self.risk_patterns, settings.PATTERN_ARTIFACT_DIR)
+            if self.pattern_index is None:
+                try:
+                    self.pattern_index = build_artifact(self.model, self.embedding_id, self.risk_patterns, settings.PATTERN_ARTIFACT_DIR)
+                except OSError as e:
+                    logger.error(f"⚠️ Could not write pattern artifact: {e}")
+                    self.pattern_index = PatternIndex.from_embeddings(
+                        {c: self.model.encode(p) for c, p in self.risk_patterns.items()}
+                    )
             
             self.enabled = True
             logger.info("✅ ML Model loaded successfully")
@@ -62,49 +119,223 @@ class MLService:
             logger.error(f"❌ Failed to load ML model: {e}")
             self.enabled = False
 
-    def analyze_clause_semantic(self, text: str, threshold: float = 0.45):
+    def _semantic_available(self) -> bool:
+        if not self.ready.is_set():
+            # Requests that arrive during warm-up wait briefly, then fall back to rule-only analysis
+            self.start_warm_up()
+            if not self.ready.wait(settings.MODEL_READY_TIMEOUT_SECONDS):
+                logger.info("ML model still warming up; returning rule-only analysis")
+                return False
+        return self.enabled and self.model is not None
+
+    def _encode(self, sentences: list):
+        with STAGE_SECONDS.time("encode"):
+            if self.batcher is not None:
+                return self.batcher.encode(sentences)
+            return self.model.encode(sentences, batch_size=settings.ENCODE_BATCH_SIZE)
+
+    def _encodable_spans(self, spans: list) -> list:
+        # Very short fragments (headings, list markers) carry no signal for the encoder
+        return [(start, end) for start, end in spans if end - start > 10]
+
+    def embed_clauses(self, text: str, spans: list = None):
+        """
+        (clause spans, embeddings) exactly as the semantic analysis sees them; the
+        embeddings come from the cache right after an analysis. None without a model.
+        """
+        if not self._semantic_available():
+            return None
+        spans = self._encodable_spans(segment_clauses(text) if spans is None else spans)
+        if not spans:
+            return None
+        return spans, self.embedding_cache.encode([text[start:end] for start, end in spans], self._encode)
+
+    def embed_text(self, text: str):
+        """Embedding of one free-text query; None without a model."""
+        if not self._semantic_available():
+            return None
+        return self.embedding_cache.encode([text], self._encode)
+
+    def analyze_clause_semantic(self, text: str, threshold: float = 0.45, spans: list = None):
         """
         Uses semantic similarity to detect risks that might not use exact keywords.
+        `spans` are clause offsets from the segmenter; computed here if not given.
+        """
+        return self.analyze_batch_semantic([text], [spans], threshold)[0]
+
+    def analyze_batch_semantic(self, texts: list, spans_list: list = None, threshold: float = 0.45):
         """
-        if not self.enabled or self.model is None:
-            return []
+        Semantic findings for many documents at once. Clauses of all documents are
+        pooled into one encode call (in ENCODE_BATCH_SIZE batches) and scored with
+        one matrix product; findings come back per document.
+        """
+        if not self._semantic_available():
+            return [[] for _ in texts]
 
         try:
             import numpy as np
-            from sklearn.metrics.pairwise import cosine_similarity
-            
-            # Split text into sentences/clauses (rough split)
-            sentences = [s.strip() for s in text.replace('\n', '. ').split('.') if len(s.strip()) > 10]
+
+            doc_spans = []
+            for text, spans in zip(texts, spans_list or [None] * len(texts)):
+                if spans is None:
+                    spans = segment_clauses(text)
+                doc_spans.append(self._encodable_spans(spans))
+            sentences = [text[start:end] for text, spans in zip(texts, doc_spans) for start, end in spans]
             if not sentences:
-                return []
-
-            sentence_embeddings = self.model.encode(sentences)
-            semantic_risks = []
-
-            for i, s_emb in enumerate(sentence_embeddings):
-                for category, p_embs in self.pattern_embeddings.items():
-                    similarities = cosine_similarity([s_emb], p_embs)[0]
-                    max_sim = np.max(similarities)
-                    
-                    if max_sim > threshold:
-                        semantic_risks.append({
-                            "category": category,
-                            "finding": sentences[i],
-                            "severity": "High" if max_sim > 0.65 else "Medium",
-                            "confidence": float(max_sim)
-                        })
-
-            # De-duplicate: Keep highest confidence per sentence
-            refined_risks = []
-            seen_sentences = set()
-            for risk in sorted(semantic_risks, key=lambda x: x['confidence'], reverse=True):
-                if risk['finding'] not in seen_sentences:
-                    refined_risks.append(risk)
-                    seen_sentences.add(risk['finding'])
-
-            return refined_risks
+                return [[] for _ in texts]
+
+            # Only sentences not seen before (by content hash) reach the model
+            sentence_embeddings = self.embedding_cache.encode(sentences, self._encode)
+            raw = self._raw_findings(sentences, [span for spans in doc_spans for span in spans], sentence_embeddings, threshold)
+
+            bounds = np.cumsum([0] + [len(spans) for spans in doc_spans])
+            return [self.assemble_findings(raw[bounds[d]:bounds[d + 1]]) for d in range(len(doc_spans))]
+        except Exception as e:
+            logger.error(f"Error during ML analysis: {e}")
+            return [[] for _ in texts]
+
+    def clause_findings(self, text: str, spans: list, threshold: float = 0.45) -> list:
+        """
+        The finding for each clause span on its own (or None), before the document-level
+        de-duplication and ordering of assemble_findings. A clause's finding depends only
+        on its text, so incremental re-analysis can reuse it for unchanged clauses.
+        """
+        findings = [None] * len(spans)
+        if not spans or not self._semantic_available():
+            return findings
+        try:
+            positions = [i for i, span in enumerate(spans) if self._encodable_spans([span])]
+            if not positions:
+                return findings
+            encodable = [spans[i] for i in positions]
+            sentences = [text[start:end] for start, end in encodable]
+            sentence_embeddings = self.embedding_cache.encode(sentences, self._encode)
+            for i, finding in zip(positions, self._raw_findings(sentences, encodable, sentence_embeddings, threshold)):
+                findings[i] = finding
         except Exception as e:
             logger.error(f"Error during ML analysis: {e}")
-            return []
+        return findings
+
+    def stream_semantic(self, clauses, top_k: int, threshold: float = 0.45, batch_size: int = None) -> list:
+        """
+        Semantic findings of a document given as a stream of (start, end, clause text),
+        encoded batch_size (STREAM_ENCODE_BATCH) clauses at a time. Only the top_k
+        findings per category are kept (see TopFindings), so memory does not grow with
+        the document. The stream is always consumed to the end, even without a model.
+        """
+        batch_size = batch_size or settings.STREAM_ENCODE_BATCH
+        top = TopFindings(top_k)
+        available = self._semantic_available()
+        batch = []
+        for start, end, clause in clauses:
+            if not available or not self._encodable_spans([(start, end)]):
+                continue
+            batch.append((start, end, clause))
+            if len(batch) == batch_size:
+                available = self._stream_batch(batch, top, threshold)
+                batch = []
+        if batch and available:
+            available = self._stream_batch(batch, top, threshold)
+        # As in analyze_batch_semantic, a failure drops the document's semantic findings
+        return top.findings() if available else []
+
+    def _stream_batch(self, batch: list, top: "TopFindings", threshold: float) -> bool:
+        try:
+            sentences = [clause for _, _, clause in batch]
+            sentence_embeddings = self.embedding_cache.encode(sentences, self._encode)
+            for finding in self._raw_findings(sentences, [(start, end) for start, end, _ in batch], sentence_embeddings, threshold):
+                if finding is not None:
+                    top.add(finding)
+            return True
+        except Exception as e:
+            logger.error(f"Error during ML analysis: {e}")
+            return False
+
+    def _raw_findings(self, sentences: list, spans: list, sentence_embeddings, threshold: float) -> list:
+        """One finding or None per sentence: best risk pattern above threshold, else the kNN vote."""
+        import numpy as np
+
+        findings = [None] * len(sentences)
+        with STAGE_SECONDS.time("similarity"):
+            # Score every sentence against every pattern in one matrix product,
+            # keeping only the best category per sentence above the threshold
+            keep, categories, confidences = self.pattern_index.best_matches(sentence_embeddings, threshold)
+            for i, category, confidence in zip(keep.tolist(), categories.tolist(), confidences):
+                findings[i] = {
+                    "category": self.pattern_index.categories[category],
+                    "finding": sentences[i],
+                    "severity": "High" if confidence > 0.65 else "Medium",
+                    "confidence": float(confidence),
+                    "start": spans[i][0],
+                    "end": spans[i][1]
+                }
+
+            # Sentences no pattern matched are classified against the labelled clause corpus
+            unmatched = np.setdiff1d(np.arange(len(sentences)), keep)
+            for i, prediction in zip(unmatched.tolist(), clause_search.classify(sentence_embeddings[unmatched])):
+                if prediction is not None:
+                    category, severity, share = prediction
+                    findings[i] = {
+                        "category": category,
+                        "finding": sentences[i],
+                        "severity": severity,
+                        "confidence": share,
+                        "start": spans[i][0],
+                        "end": spans[i][1],
+                        "source": "knn"
+                    }
+        return findings
+
+    def assemble_findings(self, findings: list) -> list:
+        """
+        Semantic findings of one document from its per-sentence findings (in document
+        order): pattern findings, then kNN ones, each by descending confidence, with
+        repeated sentences reported once.
+        """
+        def ordered(items):
+            seen, unique = set(), []
+            for finding in items:
+                if finding["finding"] not in seen:
+                    seen.add(finding["finding"])
+                    unique.append(finding)
+            return sorted(unique, key=lambda f: -f["confidence"])
+
+        present = [f for f in findings if f is not None]
+        return ordered([f for f in present if f.get("source") != "knn"]) + ordered([f for f in present if f.get("source") == "knn"])
+
+class TopFindings:
+    """
+    Bounded accumulator for per-sentence findings arriving in document order: keeps
+    the top_k highest-confidence findings per category (pattern and kNN findings
+    separately), earlier ones first among equals, repeated sentences once. Holds
+    exactly what assemble_findings reports while no category exceeds top_k.
+    """
+
+    def __init__(self, top_k: int):
+        self.top_k = top_k
+        self.heaps = {} # (is kNN, category) -> min-heap of (confidence, -order, finding)
+        self.count = 0
+
+    def add(self, finding: dict):
+        order = self.count
+        self.count += 1
+        heap = self.heaps.setdefault((finding.get("source") == "knn", finding["category"]), [])
+        # A repeat ties with its first occurrence and loses to it, kept or not
+        if any(kept["finding"] == finding["finding"] for _, _, kept in heap):
+            return
+        entry = (finding["confidence"], -order, finding)
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    def findings(self) -> list:
+        """Pattern findings, then kNN ones, each by descending confidence then document order."""
+        result = []
+        for knn in (False, True):
+            entries = [entry for (is_knn, _), heap in self.heaps.items() if is_knn == knn for entry in heap]
+            result += [finding for _, _, finding in sorted(entries, key=lambda e: (-e[0], -e[1]))]
+        return result
+
 
 ml_service = MLService()
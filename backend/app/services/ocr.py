@@ -1,38 +1,274 @@
-import random
+import codecs
+import logging
+import mmap
+import multiprocessing
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
 
-class OCRService:
-    def process_file(self, file_path: str) -> str:
-        """
-        Extract text from file.
-        In a real prod env, this would use docTR.
-        For now, we will fallback to simple text reading or mock for demo if docTR fails/missing.
-        """
-        try:
-            # Placeholder for docTR implementation
-            # from doctr.io import DocumentFile
-            # from doctr.models import ocr_predictor
-            # model = ocr_predictor(pretrained=True)
-            # doc = DocumentFile.from_pdf(file_path)
-            # result = model(doc)
-            # return result.render()
-            
-            # Simple fallback for text files or mock
-            if file_path.endswith(".txt"):
-                with open(file_path, "r", encoding="utf-8") as f:
-                    return f.read()
-            
-            # Mock return for PDF/Images if docTR is not set up in this env
-            return """
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp"}
+
+# A page whose embedded text layer is shorter than this is treated as scanned
+MIN_TEXT_LAYER_CHARS = 20
+
+# Text of a dense contract page; sizes a PDF from its page count before extraction
+PDF_PAGE_CHARS = 3000
+
+# Returned instead of an extraction failure when OCR_MOCK_FALLBACK is set (dev environments only)
+MOCK_CONTRACT = """
             SERVICE AGREEMENT
-            
+
             1. PAYMENT TERMS. Client shall pay Contractor $50 per hour. Payment is due within 90 days of invoice receipt.
             2. TERMINATION. Client may terminate this agreement immediately without notice. Contractor must provide 30 days notice.
             3. INTELLECTUAL PROPERTY. Client owns all work product, including pre-existing IP of Contractor incorporated into the work.
             4. LIABILITY. Contractor’s liability is unlimited. Client’s liability is limited to $100.
             5. JURISDICTION. This agreement is governed by the laws of Mars.
             """
+
+# docTR predictor, loaded once per OCR worker process
+_predictor = None
+
+
+def _init_ocr_worker():
+    global _predictor
+    from doctr.models import ocr_predictor
+    _predictor = ocr_predictor(pretrained=True)
+
+
+def _ocr_pdf_page(file_path: str, page_index: int, scale: float) -> str:
+    """Worker: rasterize a single page and OCR it. The bitmap never leaves this process."""
+    import numpy as np
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        image = np.asarray(pdf[page_index].render(scale=scale).to_pil().convert("RGB"))
+    finally:
+        pdf.close()
+    return _predictor([image]).render()
+
+
+def _ocr_image(file_path: str) -> str:
+    from doctr.io import DocumentFile
+    return _predictor(DocumentFile.from_images([file_path])).render()
+
+
+def _page_text(item) -> str:
+    if not isinstance(item, Future):
+        return item
+    try:
+        return item.result()
+    except Exception as e:
+        logger.error(f"OCR failed for page: {e}")
+        return ""
+
+
+class _Mapping(mmap.mmap):
+    """A memory map pdfium can read as a stream (it needs readinto, and seek returning the position)."""
+
+    def seek(self, pos: int, whence: int = os.SEEK_SET) -> int:
+        super().seek(pos, whence)
+        return self.tell()
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def _open_content(file_path: str, data: bytes = None):
+    """The file's bytes: the ingestion buffer when there is one, else a read-only memory map."""
+    if data is not None:
+        yield data
+        return
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with _Mapping(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+class OCRService:
+    def __init__(self):
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._ocr_available = None
+
+    def ocr_available(self) -> bool:
+        if self._ocr_available is None:
+            try:
+                import doctr  # noqa: F401
+                self._ocr_available = True
+            except ImportError:
+                logger.warning("⚠️ docTR not installed; scanned pages and images cannot be OCR'd")
+                self._ocr_available = False
+        return self._ocr_available
+
+    def _ocr_pool(self) -> ProcessPoolExecutor:
+        """Process pool with the docTR model loaded once per worker; created on first scanned page."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=settings.OCR_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_ocr_worker
+                )
+            return self._pool
+
+    def iter_pages(self, file_path: str, data: bytes = None):
+        """
+        Yield the text of each page, in order, as soon as it is available.
+        PDF pages with an embedded text layer are read directly; only pages
+        without one are rasterized and OCR'd, in parallel across the worker pool.
+        data is the file content when the caller already holds it (see upload_store).
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext == ".txt":
+            with _open_content(file_path, data) as content:
+                # Universal newlines, as text-mode open() would give
+                yield content[:].decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        elif ext == ".pdf":
+            yield from self._iter_pdf_pages(file_path, data)
+        elif ext in IMAGE_EXTENSIONS:
+            if self.ocr_available():
+                yield _page_text(self._ocr_pool().submit(_ocr_image, file_path))
+        else:
+            raise ValueError(f"Unsupported file type: {ext}")
+
+    def _iter_pdf_pages(self, file_path: str, data: bytes = None):
+        import pypdfium2 as pdfium
+
+        with _open_content(file_path, data) as content:
+            # pdfium reads bytes in place and a memory map as a stream; neither re-reads the file.
+            # OCR workers are separate processes and open scanned pages by path.
+            yield from self._iter_pdf_document(pdfium.PdfDocument(content), file_path)
+
+    def _iter_pdf_document(self, pdf, file_path: str):
+        try:
+            # Page texts (str) and OCR jobs (Future) in page order. At most
+            # OCR_MAX_PAGES_IN_FLIGHT pages are queued for rasterization at once.
+            pending = deque()
+            in_flight = 0
+            for index in range(len(pdf)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+
+                if len(text.strip()) >= MIN_TEXT_LAYER_CHARS or not self.ocr_available():
+                    pending.append(text)
+                else:
+                    pending.append(self._ocr_pool().submit(_ocr_pdf_page, file_path, index, settings.OCR_RENDER_SCALE))
+                    in_flight += 1
+
+                # Emit everything that is ready at the head; block when over the cap
+                while pending and (not isinstance(pending[0], Future) or pending[0].done() or in_flight >= settings.OCR_MAX_PAGES_IN_FLIGHT):
+                    item = pending.popleft()
+                    if isinstance(item, Future):
+                        in_flight -= 1
+                    yield _page_text(item)
+
+            while pending:
+                yield _page_text(pending.popleft())
+        finally:
+            pdf.close()
+
+    def iter_text(self, file_path: str, data: bytes = None):
+        """
+        The text process_file returns, as successive pieces (page texts and the
+        separators between them), for RiskEngine.analyze_stream. No mock fallback.
+        A .txt file is decoded STREAM_PIECE_CHARS bytes at a time instead of whole.
+        """
+        if os.path.splitext(file_path)[1].lower() == ".txt":
+            yield from self._iter_txt_pieces(file_path, data)
+            return
+        separator = ""
+        for page in self.iter_pages(file_path, data):
+            page = page.strip()
+            if page:
+                if separator:
+                    yield separator
+                yield page
+                separator = "\n\n"
+
+    def _iter_txt_pieces(self, file_path: str, data: bytes = None):
+        """The stripped, newline-normalized text of a .txt file, one chunk at a time."""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        size = settings.STREAM_PIECE_CHARS
+        with _open_content(file_path, data) as content:
+            carry = ""  # a trailing \r, in case the next chunk starts with \n
+            held = ""   # trailing whitespace, yielded only if more text follows
+            started = False
+            for offset in range(0, len(content), size):
+                final = offset + size >= len(content)
+                text = carry + decoder.decode(content[offset:offset + size], final=final)
+                carry = ""
+                if text.endswith("\r") and not final:
+                    text, carry = text[:-1], "\r"
+                text = held + text.replace("\r\n", "\n").replace("\r", "\n")
+                if not started:
+                    text = text.lstrip()
+                body = text.rstrip()
+                held = text[len(body):]
+                if body:
+                    started = True
+                    yield body
+
+    def estimated_chars(self, file_path: str, data: bytes = None) -> int:
+        """
+        Upper estimate of the text length, without extracting it: the byte size
+        of a .txt file, PDF_PAGE_CHARS per PDF page, 0 for an image (one page).
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        try:
+            if ext == ".txt":
+                return len(data) if data is not None else os.path.getsize(file_path)
+            if ext == ".pdf":
+                import pypdfium2 as pdfium
+
+                with _open_content(file_path, data) as content:
+                    pdf = pdfium.PdfDocument(content)
+                    try:
+                        return len(pdf) * PDF_PAGE_CHARS
+                    finally:
+                        pdf.close()
         except Exception as e:
-            print(f"OCR Error: {e}")
+            logger.warning(f"⚠️ Could not size {file_path}: {e}")
+        return 0
+
+    @STAGE_SECONDS.timed("ocr")
+    def process_file(self, file_path: str, data: bytes = None) -> str:
+        """
+        Extract text from file: PDF text layer where present, docTR OCR for
+        scanned pages and images, plain read for .txt. "" when nothing could be
+        extracted, including when the PDF/OCR dependencies are missing.
+        """
+        try:
+            text = "".join(self.iter_text(file_path, data))
+            if not text and not file_path.lower().endswith(".txt") and not self.ocr_available():
+                logger.warning("⚠️ No text layer and docTR is not installed; cannot OCR the file")
+                return self._unavailable()
+            return text
+        except ImportError as e:
+            logger.warning(f"⚠️ PDF dependencies missing ({e}); cannot extract text")
+            return self._unavailable()
+        except Exception as e:
+            logger.error(f"OCR Error: {e}")
             return ""
 
+    def _unavailable(self) -> str:
+        if settings.OCR_MOCK_FALLBACK:
+            logger.warning("⚠️ OCR_MOCK_FALLBACK is set; returning the mock contract text")
+            return MOCK_CONTRACT
+        return ""
+
 ocr_service = OCRService()
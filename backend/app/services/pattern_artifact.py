@@ -0,0 +1,94 @@
+# Versioned, precomputed risk-pattern embeddings: a normalized float32 matrix (.npy)
+# plus a JSON manifest, named by a fingerprint of the model and the pattern table.
+# Workers memory-map the matrix read-only, so uvicorn workers share the same pages,
+# and it is rebuilt only when the patterns or the model change.
+#
+# Build step (run from backend/): python -m app.services.pattern_artifact
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.services.similarity import PatternIndex, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_VERSION = 1
+
+
+def fingerprint(model_name: str, risk_patterns: dict) -> str:
+    payload = json.dumps(
+        {"version": ARTIFACT_VERSION, "model": model_name, "patterns": risk_patterns},
+        sort_keys=True
+    ).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def _paths(directory: str, fp: str):
+    return os.path.join(directory, f"patterns-{fp}.npy"), os.path.join(directory, f"patterns-{fp}.json")
+
+
+def build_artifact(model, model_name: str, risk_patterns: dict, directory: str) -> PatternIndex:
+    """Encode the patterns once and write matrix + manifest atomically."""
+    categories = list(risk_patterns.keys())
+    blocks = [normalize_rows(model.encode(risk_patterns[c])) for c in categories]
+    matrix = np.vstack(blocks).astype(np.float32)
+    offsets = np.concatenate([[0], np.cumsum([len(b) for b in blocks])[:-1]]).astype(np.intp)
+
+    fp = fingerprint(model_name, risk_patterns)
+    matrix_path, manifest_path = _paths(directory, fp)
+    os.makedirs(directory, exist_ok=True)
+
+    tmp_matrix = f"{matrix_path}.{os.getpid()}.tmp"
+    with open(tmp_matrix, "wb") as f:
+        np.save(f, matrix)
+    os.replace(tmp_matrix, matrix_path)
+
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "fingerprint": fp,
+        "model": model_name,
+        "categories": categories,
+        "offsets": offsets.tolist(),
+        "shape": list(matrix.shape),
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    tmp_manifest = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    # The manifest is written last: its presence marks a complete artifact
+    os.replace(tmp_manifest, manifest_path)
+
+    logger.info(f"Wrote pattern artifact {matrix_path}")
+    return PatternIndex(matrix, categories, offsets)
+
+
+def load_artifact(model_name: str, risk_patterns: dict, directory: str):
+    """Memory-map a matching artifact, or return None if it is missing or stale."""
+    matrix_path, manifest_path = _paths(directory, fingerprint(model_name, risk_patterns))
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        matrix = np.load(matrix_path, mmap_mode="r")
+        if manifest["version"] != ARTIFACT_VERSION or list(matrix.shape) != manifest["shape"]:
+            return None
+        return PatternIndex(matrix, manifest["categories"], np.asarray(manifest["offsets"], dtype=np.intp))
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable pattern artifact {matrix_path}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    from app.core.config import settings
+    from app.services.ml_service import ml_service
+
+    # Warm-up loads the artifact, or builds it when missing or stale
+    ml_service.warm_up()
+    if not ml_service.enabled:
+        raise SystemExit("ML model unavailable; pattern artifact not built")
+    print(f"Pattern artifact up to date in {settings.PATTERN_ARTIFACT_DIR}")
@@ -0,0 +1,160 @@
+# Async building blocks of the analysis pipeline, shared by the HTTP endpoints
+# and the background job stages.
+import logging
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.executor import run_cpu_bound
+from app.schemas import AnalysisResult, RiskItem
+from app.services.clause_index import clause_search
+from app.services.history import history_service
+from app.services.logic import risk_engine
+from app.services.ml_service import ml_service
+from app.services.ocr import ocr_service
+from app.services.result_cache import result_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def extract_text(file_path: str, file_hash: str, data: bytes = None) -> str:
+    """
+    The contract text; "" if none could be extracted. None, before anything is
+    extracted, when the file's estimated text length reaches STREAMING_ANALYSIS_MIN_CHARS:
+    too long to hold, it is read once, by analyze_streamed.
+    """
+    # Same bytes, same text: skip OCR on re-uploads
+    contract_text = await run_in_threadpool(result_cache.get_text, file_hash)
+    if contract_text is None:
+        limit = settings.STREAMING_ANALYSIS_MIN_CHARS
+        if limit and await run_in_threadpool(ocr_service.estimated_chars, file_path, data) >= limit:
+            return None
+        contract_text = await run_cpu_bound(ocr_service.process_file, file_path, data)
+        if contract_text:
+            await run_in_threadpool(result_cache.set_text, file_hash, contract_text)
+    return contract_text
+
+
+async def analyze_streamed(file_path: str, user_explanation: str, data: bytes = None):
+    """
+    risk_data of a document extract_text found too long to hold, analyzed piece
+    by piece as it is read (RiskEngine.analyze_stream); None if it cannot be read.
+    Streaming mode has no clause map, revision delta, clause index entry or risk
+    cache entry: each of those needs the whole text.
+    """
+    try:
+        return await run_cpu_bound(risk_engine.analyze_stream, ocr_service.iter_text(file_path, data), user_explanation)
+    except Exception as e:
+        logger.error(f"Streaming analysis failed: {e}")
+        return None
+
+
+async def cached_risks(contract_text: str, user_explanation: str):
+    """Returns (cached risk_data or None, engine version to cache a fresh result under)."""
+    engine_version = risk_engine.cache_version()
+    if engine_version is None:
+        return None, None
+    return await run_in_threadpool(result_cache.get_risks, contract_text, user_explanation, engine_version), engine_version
+
+
+async def analyze_revision(contract_text: str, user_explanation: str, previous):
+    """
+    Re-analyze a revised version of the contract behind `previous` (an Analysis row),
+    reusing its per-clause results. Returns (risk_data, clause map, revision delta).
+    """
+    previous_map = await run_in_threadpool(history_service.get_clause_map, previous.id)
+    risk_data, clause_map, revision = await run_cpu_bound(
+        risk_engine.analyze_revision, contract_text, user_explanation, previous_map
+    )
+    revision.update(
+        previous_analysis_id=previous.id,
+        previous_score=previous.score,
+        score_delta=risk_data["score"] - previous.score
+    )
+    await cache_clause_map(contract_text, clause_map)
+    return risk_data, clause_map, revision
+
+
+async def analyze_risks(contract_text: str, user_explanation: str):
+    """
+    Returns (risk_data, clause map or None). With revision tracking on, the clause
+    map comes out of the same analysis; on a cache hit it comes from the cache.
+    """
+    risk_data, engine_version = await cached_risks(contract_text, user_explanation)
+    if risk_data is not None:
+        return risk_data, await cached_clause_map(contract_text)
+
+    clause_map = None
+    if settings.REVISION_TRACKING_ENABLED:
+        risk_data, clause_map = await run_cpu_bound(risk_engine.analyze_with_clause_map, contract_text, user_explanation)
+    else:
+        risk_data = await run_cpu_bound(risk_engine.analyze, contract_text, user_explanation)
+    if engine_version is not None:
+        await run_in_threadpool(result_cache.set_risks, contract_text, user_explanation, engine_version, risk_data)
+    await cache_clause_map(contract_text, clause_map)
+    return risk_data, clause_map
+
+
+async def cached_clause_map(contract_text: str):
+    """Clause map stored by an earlier analysis of the same text, or None."""
+    version = risk_engine.clause_version()
+    if version is None or not settings.REVISION_TRACKING_ENABLED:
+        return None
+    return await run_in_threadpool(result_cache.get_clause_map, contract_text, version)
+
+
+async def cache_clause_map(contract_text: str, clause_map: dict):
+    if clause_map is not None and clause_map["version"] is not None:
+        await run_in_threadpool(result_cache.set_clause_map, contract_text, clause_map["version"], clause_map)
+
+
+def to_result(risk_data: dict, explanation: str = None, negotiation_email: str = None) -> AnalysisResult:
+    return AnalysisResult(
+        score=risk_data["score"],
+        risks=[RiskItem(**r) for r in risk_data["risks"]],
+        contract_summary=risk_data["contract_summary"],
+        explanation=explanation,
+        negotiation_email=negotiation_email
+    )
+
+
+async def index_clauses(analysis_id, document_hash: str, contract_text: str, risks: list) -> bool:
+    """Add the document's clauses to the similarity index; True if any were added. Failures are logged, never raised."""
+    if not clause_search.enabled:
+        return False
+    try:
+        embedded = await run_cpu_bound(ml_service.embed_clauses, contract_text)
+        if embedded is not None:
+            spans, embeddings = embedded
+            added = await run_in_threadpool(
+                clause_search.add_document, analysis_id, document_hash, contract_text, spans, embeddings, risks
+            )
+            return added > 0
+    except Exception as e:
+        logger.error(f"Could not index clauses: {e}")
+    return False
+
+
+async def record_clause_map(analysis_id: int, clause_map: dict = None):
+    """Store per-clause results for later revisions; analyses without a clause map are skipped."""
+    if analysis_id is None or clause_map is None or not settings.REVISION_TRACKING_ENABLED:
+        return
+    await run_in_threadpool(history_service.record_clause_map, analysis_id, clause_map)
+
+
+async def save_analysis(entry: dict, contract_text: str, clause_map: dict = None, clauses_indexed: bool = None):
+    """
+    Record a finished analysis in the history, index its clauses and store its clause
+    map; returns the history id. clauses_indexed is the result of an index_clauses call
+    made before the analysis had an id (job scoring stage): True attaches the id to
+    those clauses, False skips indexing, so this never needs the embedding model.
+    Nothing is indexed without contract_text (streaming mode).
+    """
+    analysis_id = await run_in_threadpool(history_service.record, entry)
+    if clauses_indexed is None and contract_text is not None:
+        await index_clauses(analysis_id, entry["document_hash"], contract_text, entry["risks"])
+    elif clauses_indexed and analysis_id is not None:
+        try:
+            await run_in_threadpool(clause_search.assign_analysis, entry["document_hash"], analysis_id)
+        except Exception as e:
+            logger.error(f"Could not attach analysis {analysis_id} to its clauses: {e}")
+    await record_clause_map(analysis_id, clause_map)
+    return analysis_id
@@ -5,46 +5,57 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
-import os
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+from app.core.metrics import STAGE_SECONDS
 
-def generate_pdf_report(score: int, risks: list, explanation: str, negotiation_email: str) -> str:
-    """Generate a PDF report of the contract analysis"""
-    
-    # Create reports directory
-    reports_dir = "backend/data/reports"
-    os.makedirs(reports_dir, exist_ok=True)
-    
-    # Generate filename with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    pdf_path = f"{reports_dir}/ContractIQ_Report_{timestamp}.pdf"
-    
-    # Create PDF
-    doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-    story = []
+@lru_cache(maxsize=None)
+def _styles() -> dict:
+    """Paragraph styles, built once per process and shared by every report"""
     styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#6366f1'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#1e293b'),
-        spaceAfter=12,
-        spaceBefore=20
-    )
+    return {
+        "normal": styles['Normal'],
+        "title": ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#6366f1'),
+            spaceAfter=30,
+            alignment=TA_CENTER
+        ),
+        "heading": ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor('#1e293b'),
+            spaceAfter=12,
+            spaceBefore=20
+        ),
+        "footer": ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.grey,
+            alignment=TA_CENTER
+        )
+    }
+
+@STAGE_SECONDS.timed("pdf_render")
+def generate_pdf_report(score: int, risks: list, explanation: str, negotiation_email: str) -> bytes:
+    """
+    Generate a PDF report of the contract analysis, entirely in memory.
+    Risk fields and LLM text are escaped: reportlab paragraphs parse markup.
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    story = []
+    style = _styles()
+    normal_style, title_style, heading_style = style["normal"], style["title"], style["heading"]
     
     # Title
     story.append(Paragraph("ContractIQ Analysis Report", title_style))
-    story.append(Paragraph(f"Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
+    story.append(Paragraph(f"Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", normal_style))
     story.append(Spacer(1, 0.3*inch))
     
     # Score Section
@@ -72,7 +83,7 @@ def generate_pdf_report(score: int, risks: list, explanation: str, negotiation_e
     else:
         interpretation = "✗ High Risk - Strongly recommend negotiation"
     
-    story.append(Paragraph(interpretation, styles['Normal']))
+    story.append(Paragraph(interpretation, normal_style))
     story.append(Spacer(1, 0.4*inch))
     
     # Risks Section
@@ -80,10 +91,10 @@ def generate_pdf_report(score: int, risks: list, explanation: str, negotiation_e
         story.append(Paragraph(f"Identified Risks ({len(risks)})", heading_style))
         
         for i, risk in enumerate(risks, 1):
-            risk_text = f"<b>{i}. {risk['category']}</b> ({risk['severity']})<br/>"
-            risk_text += f"{risk['finding']}<br/>"
-            risk_text += f"<i>Reality Check: {risk['expectation_check']}</i>"
-            story.append(Paragraph(risk_text, styles['Normal']))
+            risk_text = f"<b>{i}. {escape(risk['category'])}</b> ({escape(risk['severity'])})<br/>"
+            risk_text += f"{escape(risk['finding'])}<br/>"
+            risk_text += f"<i>Reality Check: {escape(risk['expectation_check'])}</i>"
+            story.append(Paragraph(risk_text, normal_style))
             story.append(Spacer(1, 0.2*inch))
     
     story.append(PageBreak())
@@ -92,7 +103,7 @@ def generate_pdf_report(score: int, risks: list, explanation: str, negotiation_e
     story.append(Paragraph("AI Assessment", heading_style))
     for paragraph in explanation.split('\n'):
         if paragraph.strip():
-            story.append(Paragraph(paragraph, styles['Normal']))
+            story.append(Paragraph(escape(paragraph), normal_style))
             story.append(Spacer(1, 0.1*inch))
     
     story.append(Spacer(1, 0.3*inch))
@@ -101,22 +112,16 @@ def generate_pdf_report(score: int, risks: list, explanation: str, negotiation_e
     story.append(Paragraph("Negotiation Strategy", heading_style))
     for paragraph in negotiation_email.split('\n'):
         if paragraph.strip():
-            story.append(Paragraph(paragraph, styles['Normal']))
+            story.append(Paragraph(escape(paragraph), normal_style))
             story.append(Spacer(1, 0.1*inch))
     
     # Footer
     story.append(Spacer(1, 0.5*inch))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.grey,
-        alignment=TA_CENTER
-    )
+    footer_style = style["footer"]
     story.append(Paragraph("Generated by ContractIQ - AI-Powered Contract Analysis", footer_style))
     story.append(Paragraph("This report is for informational purposes only and does not constitute legal advice.", footer_style))
     
     # Build PDF
     doc.build(story)
     
-    return pdf_path
+    return buffer.getvalue()
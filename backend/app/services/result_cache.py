@@ -0,0 +1,160 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from app.core.config import settings
+from app.core.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_hash(*parts) -> str:
+    """Stable hash of JSON-serializable parts (dict key order does not matter)."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry TTL; the local default."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisCacheBackend:
+    """Redis (or any Redis-protocol server). TTL per key; LRU via the server's maxmemory-policy."""
+
+    def __init__(self, url: str):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+
+    def get(self, key: str):
+        value = self.client.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str, ttl: int):
+        self.client.set(key, value, ex=ttl)
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+
+def create_backend():
+    if settings.RESULT_CACHE_BACKEND == "redis":
+        try:
+            backend = RedisCacheBackend(settings.REDIS_URL)
+            backend.client.ping()
+            return backend
+        except Exception as e:
+            logger.error(f"⚠️ Redis result cache unavailable ({e}); using in-memory cache")
+    return MemoryCacheBackend(settings.RESULT_CACHE_MAX_ENTRIES)
+
+
+class ResultCache:
+    """
+    Layered cache around the analysis pipeline:
+    - text: extracted text by file content hash
+    - risks: RiskEngine output by text hash + expectations + engine version
+    - clauses: clause maps (see RiskEngine.build_clause_map) by text hash + clause version
+    - llm: LLM outputs by canonical risk_data hash + prompt version
+    Backend errors are logged and treated as misses; the cache never fails a request.
+    Calls may block on network I/O (Redis), so async code runs them in the threadpool.
+    """
+
+    LAYERS = ("text", "risks", "clauses", "llm")
+
+    def __init__(self, backend, prefix: str = "contractiq"):
+        self.backend = backend
+        self.prefix = prefix
+        self.ttl = {
+            "text": settings.TEXT_CACHE_TTL_SECONDS,
+            "risks": settings.RISK_CACHE_TTL_SECONDS,
+            "clauses": settings.RISK_CACHE_TTL_SECONDS,
+            "llm": settings.LLM_CACHE_TTL_SECONDS
+        }
+        self.hits = dict.fromkeys(self.LAYERS, 0)
+        self.misses = dict.fromkeys(self.LAYERS, 0)
+
+    def _key(self, layer: str, *parts) -> str:
+        return f"{self.prefix}:{layer}:{canonical_hash(*parts)}"
+
+    def _get(self, layer: str, *parts):
+        try:
+            value = self.backend.get(self._key(layer, *parts))
+        except Exception as e:
+            logger.error(f"Result cache read failed: {e}")
+            value = None
+        if value is None:
+            self.misses[layer] += 1
+            CACHE_LOOKUPS.inc(layer, "miss")
+            return None
+        self.hits[layer] += 1
+        CACHE_LOOKUPS.inc(layer, "hit")
+        return json.loads(value)
+
+    def _set(self, layer: str, value, *parts):
+        try:
+            self.backend.set(self._key(layer, *parts), json.dumps(value), self.ttl[layer])
+        except Exception as e:
+            logger.error(f"Result cache write failed: {e}")
+
+    def get_text(self, file_hash: str):
+        return self._get("text", file_hash)
+
+    def set_text(self, file_hash: str, text: str):
+        self._set("text", text, file_hash)
+
+    def get_risks(self, text: str, user_expectations: str, engine_version: str):
+        return self._get("risks", hashlib.sha256(text.encode("utf-8")).hexdigest(), user_expectations, engine_version)
+
+    def set_risks(self, text: str, user_expectations: str, engine_version: str, risk_data: dict):
+        self._set("risks", risk_data, hashlib.sha256(text.encode("utf-8")).hexdigest(), user_expectations, engine_version)
+
+    def get_clause_map(self, text: str, clause_version: str):
+        return self._get("clauses", hashlib.sha256(text.encode("utf-8")).hexdigest(), clause_version)
+
+    def set_clause_map(self, text: str, clause_version: str, clause_map: dict):
+        self._set("clauses", clause_map, hashlib.sha256(text.encode("utf-8")).hexdigest(), clause_version)
+
+    def get_llm(self, kind: str, *parts):
+        return self._get("llm", kind, *parts)
+
+    def set_llm(self, kind: str, value: str, *parts):
+        self._set("llm", value, kind, *parts)
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "layers": {
+                layer: {"hits": self.hits[layer], "misses": self.misses[layer]} for layer in self.LAYERS
+            }
+        }
+
+result_cache = ResultCache(create_backend())
@@ -0,0 +1,376 @@
+import logging
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import ahocorasick  # pyahocorasick: C implementation of the same automaton
+except ImportError:
+    ahocorasick = None
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    A deterministic contract rule. It fires when any trigger phrase occurs and
+    every phrase in `requires` also occurs - anywhere in the document, or within
+    `proximity` characters of the trigger when set.
+    """
+    category: str
+    severity: str
+    penalty: int
+    finding: str
+    triggers: Tuple[str, ...]
+    requires: Tuple[str, ...] = ()
+    proximity: Optional[int] = None
+    # expectation_check is "Mismatch" when the user's expectations mention any of these
+    expectation_mismatch: Tuple[str, ...] = ()
+    expectation_default: str = "Mismatch"
+
+
+# Severity scale shared by all findings, most severe highest
+SEVERITY_ORDER = {"Critical": 4, "Severe": 3, "High": 2, "Medium": 1, "Low": 0}
+
+
+RULES = [
+    Rule(
+        category="Payment Terms",
+        severity="High",
+        penalty=20,
+        finding="Payment terms are Net 90, which is very long.",
+        triggers=("90 days",),
+        expectation_mismatch=("net 15", "net 30"),
+        expectation_default="Concern"
+    ),
+    Rule(
+        category="Termination",
+        severity="Critical",
+        penalty=30,
+        finding="Client can terminate immediately without cause. You are not protected.",
+        triggers=("immediately",),
+        requires=("without notice",)
+    ),
+    Rule(
+        category="Liability",
+        severity="Severe",
+        penalty=40,
+        finding="Your liability is unlimited. This is a major financial risk.",
+        triggers=("unlimited",)
+    ),
+]
+
+
+def lower_preserving_offsets(text: str) -> str:
+    """Lowercase without changing length, so match offsets map back onto the original text."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+# Phrase counts from which one automaton pass beats a str.find pass per phrase
+# (benchmarks/bench_rule_scan.py): with pyahocorasick, and with the pure-Python automaton
+AUTOMATON_MIN_PHRASES = 30
+PURE_AUTOMATON_MIN_PHRASES = 400
+
+
+class PhraseAutomaton:
+    """Pure-Python Aho-Corasick automaton over a fixed phrase list."""
+
+    def __init__(self, phrases: list):
+        self.phrases = phrases
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for pid, phrase in enumerate(phrases):
+            state = 0
+            for ch in phrase:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = nxt
+            self.out[state].append(pid)
+
+        # Breadth-first failure links; outputs are merged along them
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter_matches(self, text: str):
+        """Yield (phrase_id, end) for every occurrence; end is exclusive."""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for pid in out[state]:
+                    yield pid, i + 1
+
+
+class RuleEngine:
+    """
+    Finds every rule phrase in one pass of a multi-pattern automaton, so rule
+    evaluation cost stays flat as the rule table grows. Small tables are scanned
+    phrase by phrase with str.find instead, which is faster below the crossover
+    measured by benchmarks/bench_rule_scan.py.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = rules
+        self.phrases = sorted({p for r in rules for p in r.triggers + r.requires})
+        self.max_phrase_len = max((len(p) for p in self.phrases), default=0)
+        # Clause boundaries fall on sentence terminators and line breaks; phrases without
+        # them never straddle two clauses, so scanning clause by clause finds every match
+        self.clause_local = not any(c in p for p in self.phrases for c in ".!?\n")
+        # evaluate() needs every occurrence only of phrases in proximity rules; of the rest, the first
+        self._every_start = {p for r in rules if r.proximity is not None for p in r.triggers + r.requires}
+        self._automaton = None
+        if ahocorasick is not None:
+            if len(self.phrases) >= AUTOMATON_MIN_PHRASES:
+                self._automaton = ahocorasick.Automaton()
+                for pid, phrase in enumerate(self.phrases):
+                    self._automaton.add_word(phrase, pid)
+                self._automaton.make_automaton()
+        elif len(self.phrases) >= PURE_AUTOMATON_MIN_PHRASES:
+            logger.info("pyahocorasick not installed; using pure-Python rule automaton")
+            self._automaton = PhraseAutomaton(self.phrases)
+
+    def _iter_matches(self, text_lower: str):
+        """Yield (phrase_id, end) for every occurrence, in no particular order; end is exclusive."""
+        if self._automaton is None:
+            for pid, phrase in enumerate(self.phrases):
+                start = text_lower.find(phrase)
+                while start != -1:
+                    yield pid, start + len(phrase)
+                    start = text_lower.find(phrase, start + 1) if phrase in self._every_start else -1
+        elif isinstance(self._automaton, PhraseAutomaton):
+            yield from self._automaton.iter_matches(text_lower)
+        else:
+            for end, pid in self._automaton.iter(text_lower):
+                yield pid, end + 1
+
+    def scan(self, text: str, offset: int = 0) -> dict:
+        """
+        Phrase -> sorted match start offsets. Phrases outside proximity rules keep only
+        their first occurrence, which is all evaluate() looks at.
+        """
+        hits = {}
+        for pid, end in self._iter_matches(lower_preserving_offsets(text)):
+            phrase = self.phrases[pid]
+            hits.setdefault(phrase, []).append(offset + end - len(phrase))
+        for phrase, starts in hits.items():
+            starts.sort()
+            if phrase not in self._every_start:
+                del starts[1:]
+        return hits
+
+    def _near(self, starts: list, position: int, distance: int) -> Optional[int]:
+        i = bisect_left(starts, position - distance)
+        if i < len(starts) and starts[i] <= position + distance:
+            return starts[i]
+        return None
+
+    def evaluate(self, hits: dict):
+        """Yield (rule, start, end) for every rule satisfied by the scan hits."""
+        for rule in self.rules:
+            for trigger in rule.triggers:
+                match = self._match_rule(rule, trigger, hits)
+                if match is not None:
+                    yield (rule,) + match
+                    break
+
+    def _match_rule(self, rule: Rule, trigger: str, hits: dict):
+        for start in hits.get(trigger, ()):
+            span_start, span_end = start, start + len(trigger)
+            satisfied = True
+            for required in rule.requires:
+                starts = hits.get(required)
+                if not starts:
+                    return None
+                found = starts[0] if rule.proximity is None else self._near(starts, start, rule.proximity)
+                if found is None:
+                    satisfied = False
+                    break
+                span_start, span_end = min(span_start, found), max(span_end, found + len(required))
+            if satisfied:
+                return span_start, span_end
+        return None
+
+    def analyze(self, text: str, user_expectations: str):
+        """Returns (risks, total penalty) with the source offsets of each finding."""
+        return self.findings(self.scan(text), user_expectations)
+
+    def findings(self, hits: dict, user_expectations: str):
+        """(risks, total penalty) from scan hits, e.g. hits merged from per-clause scans."""
+        return self.risks(self.evaluate(hits), user_expectations)
+
+    def stream(self) -> "RuleStream":
+        """Evaluator for a document fed piece by piece (see RuleStream)."""
+        return RuleStream(self)
+
+    def risks(self, matches, user_expectations: str):
+        """(risks, total penalty) from (rule, start, end) matches, as evaluate() or RuleStream.matches() yield them."""
+        expectations_lower = user_expectations.lower()
+        risks = []
+        penalty = 0
+        for rule, start, end in matches:
+            mismatch = any(p in expectations_lower for p in rule.expectation_mismatch)
+            risks.append({
+                "category": rule.category,
+                "severity": rule.severity,
+                "finding": rule.finding,
+                "expectation_check": "Mismatch" if mismatch else rule.expectation_default,
+                "start": start,
+                "end": end
+            })
+            penalty += rule.penalty
+        return risks, penalty
+
+
+class _Hit:
+    """A phrase occurrence kept by RuleStream, with the clauses holding its first and last character."""
+    __slots__ = ("start", "end", "first_clause", "last_clause")
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+        self.first_clause = None
+        self.last_clause = None
+
+
+class RuleStream:
+    """
+    RuleEngine.evaluate() over a document fed piece by piece, in memory bounded by
+    the rule table rather than the document. Each piece is scanned once, together
+    with the last max_phrase_len - 1 characters of the previous one so phrases
+    straddling two pieces are found. Only the first occurrence of each phrase is
+    kept, plus, for rules with a proximity, the occurrences that can still pair
+    with a trigger. Clause spans given to add_clause, in document order and no later
+    than the text they cover, widen the matches exactly like expand_to_clauses.
+    """
+
+    def __init__(self, engine: RuleEngine):
+        self.engine = engine
+        self.offset = 0 # Document offset of the next piece
+        self.tail = ""
+        self.first = {} # phrase -> its first _Hit
+        near = [(i, rule) for i, rule in enumerate(engine.rules) if rule.proximity is not None]
+        self.window = max((rule.proximity for _, rule in near), default=0)
+        # Occurrences of phrases required near a trigger, from `window` before the oldest undecided trigger
+        self.recent = {phrase: deque() for _, rule in near for phrase in rule.requires}
+        self.keys = {} # trigger phrase -> (rule index, trigger) of the proximity rules it triggers
+        for i, rule in near:
+            for trigger in rule.triggers:
+                self.keys.setdefault(trigger, []).append((i, trigger))
+        self.pending = {key: deque() for keys in self.keys.values() for key in keys} # Undecided trigger occurrences
+        self.matched = {} # (rule index, trigger) -> hits of its earliest match
+        self.unplaced = [] # Hits whose clauses have not been seen yet
+        self.clause = None
+
+    def feed(self, piece: str):
+        text = self.tail + piece
+        base = self.offset - len(self.tail)
+        found = []
+        for pid, end in self.engine._iter_matches(lower_preserving_offsets(text)):
+            # Matches ending inside the tail were found with the previous piece
+            if end > len(self.tail):
+                phrase = self.engine.phrases[pid]
+                found.append((base + end - len(phrase), phrase))
+        for start, phrase in sorted(found):
+            self._add(phrase, start)
+        self.offset += len(piece)
+        self.tail = text[max(0, len(text) - (self.engine.max_phrase_len - 1)):]
+        # Every occurrence starting up to here has been seen
+        self._decide(self.offset - self.engine.max_phrase_len)
+
+    def add_clause(self, start: int, end: int):
+        self.clause = (start, end)
+        self.unplaced = [hit for hit in self.unplaced if self._place(hit, self.clause)]
+
+    def matches(self):
+        """Yield (rule, start, end) as evaluate() does for the whole document, widened to clauses; call once fed."""
+        self._decide(None)
+        for i, rule in enumerate(self.engine.rules):
+            for trigger in rule.triggers:
+                if rule.proximity is not None:
+                    hits = self.matched.get((i, trigger))
+                elif trigger in self.first and all(p in self.first for p in rule.requires):
+                    hits = [self.first[p] for p in (trigger,) + rule.requires]
+                else:
+                    hits = None
+                if hits is not None:
+                    yield (rule,) + self._widened(hits)
+                    break
+
+    def _add(self, phrase: str, start: int):
+        hit = None
+        if phrase not in self.first:
+            hit = self.first[phrase] = self._hit(phrase, start)
+        if phrase in self.recent:
+            hit = hit or self._hit(phrase, start)
+            self.recent[phrase].append(hit)
+        for key in self.keys.get(phrase, ()):
+            if key not in self.matched:
+                hit = hit or self._hit(phrase, start)
+                self.pending[key].append(hit)
+
+    def _hit(self, phrase: str, start: int) -> _Hit:
+        hit = _Hit(start, start + len(phrase))
+        if self.clause is None or self._place(hit, self.clause):
+            self.unplaced.append(hit)
+        return hit
+
+    def _place(self, hit: _Hit, clause: tuple) -> bool:
+        """Note the clause if it holds either end of the hit; False once the hit is behind it."""
+        if clause[0] <= hit.start < clause[1]:
+            hit.first_clause = clause
+        if clause[0] <= hit.end - 1 < clause[1]:
+            hit.last_clause = clause
+        return hit.end - 1 >= clause[1]
+
+    def _decide(self, seen: Optional[int]):
+        """Settle the trigger occurrences whose whole proximity window lies before `seen` (None: all)."""
+        for key, triggers in self.pending.items():
+            rule = self.engine.rules[key[0]]
+            while triggers and (seen is None or triggers[0].start + rule.proximity <= seen):
+                trigger = triggers.popleft()
+                hits = [trigger]
+                for required in rule.requires:
+                    near = [h for h in self.recent[required] if abs(h.start - trigger.start) <= rule.proximity]
+                    if not near:
+                        break
+                    hits.append(near[0])
+                else:
+                    self.matched[key] = hits
+                    triggers.clear()
+        if seen is not None:
+            # Undecided triggers start after seen - window, and pair with occurrences at most window before them
+            for hits in self.recent.values():
+                while hits and hits[0].start < seen - 2 * self.window:
+                    hits.popleft()
+
+    def _widened(self, hits: list):
+        first = min(hits, key=lambda h: h.start)
+        last = max(hits, key=lambda h: h.end)
+        start = first.first_clause[0] if first.first_clause else first.start
+        end = last.last_clause[1] if last.last_clause else last.end
+        return start, end
+
+
+rule_engine = RuleEngine(RULES)
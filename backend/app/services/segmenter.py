@@ -0,0 +1,125 @@
+import re
+from bisect import bisect_right
+from app.core.metrics import STAGE_SECONDS
+
+# Tokens that end in a period without ending the sentence
+ABBREVIATIONS = {
+    "u.s", "u.k", "e.g", "i.e", "etc", "inc", "ltd", "llc", "llp", "co", "corp", "no", "nos",
+    "sec", "secs", "art", "para", "cl", "ch", "pp", "p", "vs", "v", "mr", "mrs", "ms", "dr",
+    "st", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+    "approx", "dept", "est", "fig", "ref", "viz", "cf", "al", "esq", "jr", "sr"
+}
+
+# Candidate boundaries: sentence terminators followed by whitespace/end, blank lines,
+# and line breaks that start a new numbered section or lettered sub-clause
+_BOUNDARY = re.compile(
+    r"[.!?][\"'”’)\]]*(?=\s|$)"
+    r"|\n[ \t]*\n"
+    r"|\n(?=[ \t]*(?:\d+(?:\.\d+)*[.)]?|\([a-z0-9]{1,4}\)|[ivx]{1,5}[.)])\s)"
+)
+# Characters iter_stream_clauses waits for after a boundary before trusting it;
+# the boundary patterns look at most this far ahead (barring absurd runs of spaces)
+STREAM_LOOKAHEAD = 256
+
+_SECTION_NUMBER = re.compile(r"^\(?(?:\d+(?:\.\d+)*|[a-z]|[ivx]{1,5})[.)]?$", re.IGNORECASE)
+_HEADING = re.compile(r"^[\s\d.()]*[A-Z][A-Z0-9 &,'/-]*$")
+
+
+def _is_false_stop(text: str, clause_start: int, stop: int) -> bool:
+    """True when the period at `stop` belongs to an abbreviation, section number or heading."""
+    if text[stop] != ".":
+        return False
+    word_start = stop
+    while word_start > clause_start and not text[word_start - 1].isspace():
+        word_start -= 1
+    token = text[word_start:stop].lstrip("(\"'")
+    if not token:
+        return False
+    if token.lower() in ABBREVIATIONS or (len(token) == 1 and token.isalpha()):
+        return True
+    # "1." / "2.1." / "(iv)." at the very start of a clause is a section number
+    if _SECTION_NUMBER.match(token) and not text[clause_start:word_start].strip():
+        return True
+    # "4. INTELLECTUAL PROPERTY." - keep a short heading with the clause it introduces
+    heading = text[clause_start:stop]
+    return len(heading.split()) <= 6 and bool(_HEADING.match(heading))
+
+
+def _trimmed(text: str, start: int, end: int):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _iter_closed(text: str, clause_start: int = 0, limit: int = None):
+    """
+    (start, end, next clause start) for each clause of text[clause_start:] closed by a
+    boundary, stopping at the first boundary that ends past `limit`.
+    """
+    for match in _BOUNDARY.finditer(text, clause_start):
+        if limit is not None and match.end() > limit:
+            return
+        stop = match.start()
+        if text[stop] not in "\n" and _is_false_stop(text, clause_start, stop):
+            continue
+        end = match.end() if text[stop] != "\n" else stop
+        start, end = _trimmed(text, clause_start, end)
+        clause_start = match.end()
+        yield start, end, clause_start
+
+
+def iter_clause_spans(text: str, min_length: int = 0):
+    """
+    Lazily yield (start, end) offsets of clauses in `text`, whitespace-trimmed.
+    Understands legal abbreviations ("U.S.", "Inc."), decimal amounts ("$1,000.00"),
+    numbered sections ("2.1", "(a)") and all-caps headings. No substrings are built
+    for the document as a whole.
+    """
+    clause_start = 0
+    for start, end, clause_start in _iter_closed(text):
+        if end - start > min_length:
+            yield start, end
+    start, end = _trimmed(text, clause_start, len(text))
+    if end - start > min_length:
+        yield start, end
+
+
+def iter_stream_clauses(pieces, min_length: int = 0, lookahead: int = STREAM_LOOKAHEAD):
+    """
+    Yield (start, end, clause text) for a document delivered as successive text
+    pieces, with offsets into their concatenation: the same clauses as
+    iter_clause_spans on the whole text. Only the text after the last closed clause
+    is buffered. A boundary is trusted once `lookahead` characters follow it, since
+    whether it is one can depend on the text just after it.
+    """
+    buffer, base = "", 0
+    for piece in pieces:
+        buffer += piece
+        clause_start = 0
+        for start, end, clause_start in _iter_closed(buffer, 0, len(buffer) - lookahead):
+            if end - start > min_length:
+                yield base + start, base + end, buffer[start:end]
+        buffer = buffer[clause_start:]
+        base += clause_start
+    for start, end in iter_clause_spans(buffer, min_length):
+        yield base + start, base + end, buffer[start:end]
+
+
+@STAGE_SECONDS.timed("segmentation")
+def segment_clauses(text: str, min_length: int = 0) -> list:
+    """All clause spans of a document; computed once per request and shared."""
+    return list(iter_clause_spans(text, min_length))
+
+
+def expand_to_clauses(spans: list, start: int, end: int):
+    """Widen [start, end) to the boundaries of the clauses it touches."""
+    starts = [s for s, _ in spans]
+    first = bisect_right(starts, start) - 1
+    last = bisect_right(starts, max(start, end - 1)) - 1
+    if first >= 0 and spans[first][1] > start:
+        start = spans[first][0]
+    if last >= 0 and spans[last][1] >= end:
+        end = spans[last][1]
+    return start, end
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """L2-normalize each row so a dot product equals cosine similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class PatternIndex:
+    """
+    All risk-pattern embeddings stacked into one pre-normalized matrix.
+    Patterns of a category are stored contiguously, so per-category maxima
+    can be taken with a single reduceat over the similarity matrix.
+    """
+
+    def __init__(self, matrix: np.ndarray, categories: list, offsets: np.ndarray):
+        self.matrix = matrix
+        self.categories = categories
+        self.offsets = offsets
+
+    @classmethod
+    def from_embeddings(cls, pattern_embeddings: dict) -> "PatternIndex":
+        categories = list(pattern_embeddings.keys())
+        blocks = [np.asarray(pattern_embeddings[c], dtype=np.float32) for c in categories]
+        sizes = [len(b) for b in blocks]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        return cls(normalize_rows(np.vstack(blocks)), categories, offsets)
+
+    def category_scores(self, sentence_embeddings) -> np.ndarray:
+        """(n_sentences, n_categories) matrix of max cosine similarity per category."""
+        sims = normalize_rows(sentence_embeddings) @ self.matrix.T
+        return np.maximum.reduceat(sims, self.offsets, axis=1)
+
+    def best_matches(self, sentence_embeddings, threshold: float):
+        """
+        Best category per sentence, keeping only sentences above threshold.
+        Returns (sentence_indices, category_indices, confidences).
+        """
+        scores = self.category_scores(sentence_embeddings)
+        best_cat = np.argmax(scores, axis=1)
+        best = scores[np.arange(len(scores)), best_cat]
+        keep = np.flatnonzero(best > threshold)
+        return keep, best_cat[keep], best[keep]
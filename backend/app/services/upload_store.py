@@ -0,0 +1,165 @@
+# Content-addressed upload storage. Uploads are streamed in chunks into a
+# temporary file while being hashed and size-checked, then moved to
+# UPLOAD_FOLDER/<sha256[:2]>/<sha256><ext>: identical files are stored once, and
+# concurrent uploads with the same name no longer overwrite each other. Small
+# uploads are also kept in memory and handed to OCR as a buffer. The store is
+# bounded: past UPLOAD_STORE_MAX_BYTES the least recently used files are evicted
+# (never ones used in the last UPLOAD_STORE_MIN_AGE_SECONDS, which queued jobs may
+# still read), along with temporary files left behind by interrupted uploads.
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+TEMP_DIR = "tmp"
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit / (1024 * 1024):.1f} MB limit.")
+        self.limit = limit
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    path: str
+    sha256: str
+    size: int
+    data: Optional[bytes] = None # The content, for uploads up to UPLOAD_MEMORY_MAX_BYTES
+    deduplicated: bool = False # An identical file was already stored
+
+
+class UploadStore:
+    def __init__(self, root: str, max_bytes: int, min_age_seconds: float):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.min_age = min_age_seconds
+        # Bytes added by this process since the last scan; a scan is the only
+        # authoritative count, since other workers write to the same directory
+        self._estimated_bytes = None
+        self._lock = threading.Lock()
+
+    def _final_path(self, sha256: str, filename: str) -> str:
+        # The extension selects the extraction path (PDF, image, text)
+        ext = os.path.splitext(filename or "")[1].lower()
+        return os.path.join(self.root, sha256[:2], sha256 + ext)
+
+    async def ingest(self, file, max_bytes: int = None) -> StoredUpload:
+        """Stream an UploadFile into the store; raises UploadTooLarge past max_bytes (UPLOAD_MAX_BYTES)."""
+        max_bytes = settings.UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+        temp_dir = os.path.join(self.root, TEMP_DIR)
+        await run_in_threadpool(os.makedirs, temp_dir, exist_ok=True)
+        temp_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}.part")
+
+        digest = hashlib.sha256()
+        size = 0
+        memory = bytearray()
+        keep_in_memory = True
+        with STAGE_SECONDS.time("upload_save"):
+            out = await run_in_threadpool(open, temp_path, "wb")
+            try:
+                while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise UploadTooLarge(max_bytes)
+                    digest.update(chunk)
+                    if keep_in_memory:
+                        if size <= settings.UPLOAD_MEMORY_MAX_BYTES:
+                            memory += chunk
+                        else:
+                            keep_in_memory = False
+                            memory = bytearray()
+                    await run_in_threadpool(out.write, chunk)
+            except BaseException:
+                await run_in_threadpool(out.close)
+                await run_in_threadpool(_remove, temp_path)
+                raise
+            await run_in_threadpool(out.close)
+
+            sha256 = digest.hexdigest()
+            path = self._final_path(sha256, file.filename)
+            deduplicated = await run_in_threadpool(self._commit, temp_path, path, size)
+        return StoredUpload(path, sha256, size, bytes(memory) if keep_in_memory else None, deduplicated)
+
+    def _commit(self, temp_path: str, path: str, size: int) -> bool:
+        """Move the temp file into place, or drop it when the content is already stored. True if deduplicated."""
+        if os.path.exists(path):
+            os.remove(temp_path)
+            # Recently used: keeps it at the back of the eviction order
+            os.utime(path)
+            return True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Atomic, so readers never see a partial file (two workers racing store the same bytes)
+        os.replace(temp_path, path)
+        self._added(size)
+        return False
+
+    def _added(self, size: int):
+        with self._lock:
+            if self._estimated_bytes is not None:
+                self._estimated_bytes += size
+            if self._estimated_bytes is not None and self._estimated_bytes <= self.max_bytes:
+                return
+        self.evict()
+
+    def evict(self) -> dict:
+        """Scan the store; delete stale temp files, then LRU files until under the byte bound."""
+        now = time.time()
+        files, total, removed, evicted, freed = [], 0, 0, 0, 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".part"):
+                    # Left behind by an interrupted upload
+                    if now - stat.st_mtime > self.min_age and _remove(path):
+                        removed += 1
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        # Evict down to 90% of the bound, so the next few uploads do not rescan
+        target = self.max_bytes * 0.9
+        for mtime, size, path in sorted(files):
+            if total <= target or now - mtime < self.min_age:
+                break
+            if _remove(path):
+                total -= size
+                freed += size
+                evicted += 1
+        if removed or evicted:
+            logger.info(
+                f"🧹 Upload store: evicted {evicted} file(s) ({freed / 1024 / 1024:.1f} MB), "
+                f"removed {removed} temp file(s); {total / 1024 / 1024:.1f} MB stored"
+            )
+        with self._lock:
+            self._estimated_bytes = total
+        return {"files": len(files) - evicted, "bytes": total, "evicted": evicted, "temp_removed": removed}
+
+    def stats(self) -> dict:
+        with self._lock:
+            estimated = self._estimated_bytes
+        return {"root": self.root, "max_bytes": self.max_bytes, "stored_bytes": estimated}
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+upload_store = UploadStore(settings.UPLOAD_FOLDER, settings.UPLOAD_STORE_MAX_BYTES, settings.UPLOAD_STORE_MIN_AGE_SECONDS)
@@ -0,0 +1,84 @@
+# Celery worker for background analysis jobs (JOB_QUEUE_BACKEND=celery).
+# Each stage has its own queue, so stages scale and are limited independently.
+# Start one worker per stage (run from backend/):
+#   python -m app.worker ocr       # threads = JOB_OCR_CONCURRENCY
+#   python -m app.worker scoring   # threads = JOB_SCORING_CONCURRENCY
+#   python -m app.worker llm       # threads = JOB_LLM_CONCURRENCY
+#   python -m app.worker report    # threads = JOB_REPORT_CONCURRENCY
+# or a single worker for all of them: celery -A app.worker worker -P threads -Q ocr,scoring,llm,report
+#
+# Workers use the thread pool: the embedding model is loaded once per worker
+# process and kept warm, and OCR can still fan out to its own process pool.
+import asyncio
+import os
+import sys
+import threading
+from celery import Celery, chain
+from celery.signals import worker_init
+from app.core.config import settings
+from app.services.jobs import STAGES, run_stage, job_service
+
+celery_app = Celery("contractiq", broker=settings.CELERY_BROKER_URL or settings.REDIS_URL)
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    task_ignore_result=True,
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    task_routes={f"contractiq.{stage}": {"queue": stage} for stage in STAGES}
+)
+
+# Stage this worker process serves when started through `python -m app.worker <stage>`
+WORKER_STAGE = os.environ.get("CONTRACTIQ_WORKER_STAGE")
+
+_loops = threading.local()
+
+
+def _run(coro):
+    """Run a coroutine on this thread's long-lived event loop, so async clients are reused across tasks."""
+    loop = getattr(_loops, "loop", None)
+    if loop is None:
+        loop = _loops.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coro)
+
+
+@worker_init.connect
+def _warm_models(**kwargs):
+    from app.core.database import init_db
+    init_db()
+    if WORKER_STAGE in (None, "scoring"):
+        from app.services.ml_service import ml_service
+        ml_service.start_warm_up()
+
+
+def _stage_task(stage: str):
+    @celery_app.task(name=f"contractiq.{stage}")
+    def task(payload, job_id):
+        if payload is None:
+            # An earlier stage failed and already recorded it
+            return None
+        return _run(run_stage(job_service.store, job_id, stage, payload))
+    return task
+
+
+stage_tasks = {stage: _stage_task(stage) for stage in STAGES}
+
+
+def stage_chain(job_id: str, payload: dict):
+    first, *rest = STAGES
+    return chain(
+        stage_tasks[first].s(payload, job_id),
+        *(stage_tasks[stage].s(job_id) for stage in rest)
+    )
+
+
+if __name__ == "__main__":
+    stage = sys.argv[1] if len(sys.argv) > 1 else None
+    if stage not in STAGES:
+        raise SystemExit(f"usage: python -m app.worker {{{','.join(STAGES)}}}")
+    concurrency = getattr(settings, f"JOB_{stage.upper()}_CONCURRENCY")
+    os.environ["CONTRACTIQ_WORKER_STAGE"] = stage
+    WORKER_STAGE = stage
+    celery_app.worker_main([
+        "worker", "-P", "threads", "-c", str(concurrency), "-Q", stage, "-n", f"{stage}@%h", "--loglevel", "INFO"
+    ])
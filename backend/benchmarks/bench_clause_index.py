@@ -0,0 +1,99 @@
+# Benchmark: clause similarity search latency and IVF recall at scale
+# Run from backend/: python benchmarks/bench_clause_index.py --clauses 1000000
+# Random unit vectors stand in for clause embeddings (all-MiniLM-L6-v2: 384 dims);
+# the vector index is exercised directly, without the database.
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def clustered_vectors(rng, n: int, dim: int, centers: np.ndarray) -> np.ndarray:
+    """Clause-like data: points scattered around topic centers rather than uniform noise."""
+    vectors = centers[rng.integers(0, len(centers), size=n)] + 0.35 * rng.standard_normal((n, dim), dtype=np.float32)
+    return vectors.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clauses", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=50_000)
+    parser.add_argument("--nprobe", type=int, default=None)
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    settings.CLAUSE_INDEX_COMPACT_EVERY = args.clauses + 1 # Compaction is triggered explicitly below
+    if args.nprobe:
+        settings.CLAUSE_INDEX_NPROBE = args.nprobe
+    from app.services.clause_index import ClauseIndex
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((1000, args.dim), dtype=np.float32)
+    index = ClauseIndex(tempfile.mkdtemp())
+
+    started = time.perf_counter()
+    for start in range(0, args.clauses, args.batch):
+        n = min(args.batch, args.clauses - start)
+        index.add(np.arange(start, start + n), clustered_vectors(rng, n, args.dim, centers))
+    add_seconds = time.perf_counter() - started
+
+    queries = clustered_vectors(rng, args.queries, args.dim, centers)
+
+    def latencies():
+        samples = []
+        for q in queries:
+            t = time.perf_counter()
+            index.search(q, args.k)
+            samples.append((time.perf_counter() - t) * 1000)
+        samples.sort()
+        return {"p50_ms": round(statistics.median(samples), 3), "p95_ms": round(samples[int(0.95 * len(samples))], 3)}
+
+    # Exact search over the in-memory delta: the reference for recall
+    delta_latency = latencies()
+    _, exact_ids = index.search(queries, args.k)
+
+    started = time.perf_counter()
+    index.compact()
+    compact_seconds = time.perf_counter() - started
+
+    # Fresh reader: memory-maps the compacted base, as a newly started worker would
+    started = time.perf_counter()
+    reader = ClauseIndex(index.directory)
+    loaded = len(reader)
+    load_seconds = time.perf_counter() - started
+    index = reader
+    base_latency = latencies()
+    _, base_ids = index.search(queries, args.k)
+    recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(exact_ids, base_ids)])
+
+    json.dump({
+        "clauses": loaded,
+        "dim": args.dim,
+        "k": args.k,
+        "add_clauses_per_sec": round(args.clauses / add_seconds),
+        "delta_exact_search": delta_latency,
+        "compact_seconds": round(compact_seconds, 2),
+        "base_kind": index.kind,
+        "nprobe": settings.CLAUSE_INDEX_NPROBE if index.kind == "ivf" else None,
+        "mmap_load_seconds": round(load_seconds, 3),
+        "base_search": base_latency,
+        "recall_at_k_vs_exact": round(float(recall), 3),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
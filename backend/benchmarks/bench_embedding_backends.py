@@ -0,0 +1,160 @@
+# Benchmark: embedding backends (torch, torch-int8, onnx, onnx-int8) on CPU
+# Run from backend/: python benchmarks/bench_embedding_backends.py --threads 4
+# Each backend runs in its own process (fresh RSS, its own thread pool). Reports
+# encode throughput and peak RSS, and checks every backend against torch:
+# per-clause cosine similarity of the embeddings and the semantic category each
+# clause is assigned. Exits 1 if any backend changes a classification.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BACKENDS = ["torch", "torch-int8", "onnx", "onnx-int8"]
+
+CLAUSES = [
+    "Client may terminate this agreement immediately without notice.",
+    "Either party may terminate this Agreement upon thirty days written notice to the other party.",
+    "Contractor must provide 30 days notice before terminating the engagement.",
+    "This Agreement shall automatically renew for successive one-year terms unless cancelled.",
+    "Payment is due within 90 days of invoice receipt.",
+    "Client shall pay Contractor $50 per hour for services rendered.",
+    "Late payments shall accrue interest at 1.5% per month.",
+    "All fees are non-refundable once paid.",
+    "Contractor's liability is unlimited.",
+    "Client's liability is limited to $100.",
+    "In no event shall either party be liable for indirect or consequential damages.",
+    "Contractor shall indemnify and hold harmless Client against all claims arising from the services.",
+    "Client owns all work product, including pre-existing IP of Contractor incorporated into the work.",
+    "Contractor hereby assigns to Client all right, title and interest in any inventions conceived during the term.",
+    "Each party retains ownership of its pre-existing intellectual property.",
+    "Contractor grants Client a perpetual, irrevocable, royalty-free license to use the deliverables.",
+    "This agreement is governed by the laws of Mars.",
+    "Any dispute shall be resolved by binding arbitration in a venue chosen by Client.",
+    "The courts of New York shall have exclusive jurisdiction over any dispute.",
+    "Contractor waives any right to a jury trial.",
+    "Contractor shall not engage in any competing business for five years after termination.",
+    "Contractor shall not solicit Client's employees or customers for two years.",
+    "Contractor shall keep all Confidential Information strictly confidential in perpetuity.",
+    "Confidentiality obligations survive termination of this Agreement.",
+    "Client may modify the scope of work at any time without additional compensation.",
+    "Client may assign this Agreement without Contractor's consent.",
+    "Contractor may not assign or subcontract any obligations under this Agreement.",
+    "This Agreement constitutes the entire agreement between the parties.",
+    "Notices shall be sent by email to the addresses listed above.",
+    "Headings are for convenience only and do not affect interpretation.",
+    "If any provision is held invalid, the remaining provisions remain in full force.",
+    "The parties are independent contractors and not employees, partners or agents.",
+    "Contractor shall maintain general liability insurance of at least $1,000,000.",
+    "Client may audit Contractor's records upon reasonable notice.",
+    "Contractor shall comply with all applicable laws and regulations.",
+    "Force majeure events excuse performance for their duration.",
+    "Client shall reimburse pre-approved travel expenses within 30 days.",
+    "The deliverables shall be accepted if Client does not object within ten business days.",
+    "Contractor warrants that the services will be performed in a professional manner.",
+    "Except as expressly stated, all warranties are disclaimed.",
+]
+
+
+def child(args):
+    os.environ["EMBEDDING_BACKEND"] = args.backend
+    os.environ["EMBEDDING_THREADS"] = str(args.threads)
+    import numpy as np
+    from app.core.config import settings
+    from app.services.ml_service import ml_service
+
+    started = time.perf_counter()
+    ml_service.warm_up()
+    if not ml_service.enabled:
+        print(json.dumps({"backend": args.backend, "error": "backend unavailable (see log)"}))
+        return
+    load_s = time.perf_counter() - started
+
+    sentences = CLAUSES * args.repeat
+    # The backend directly: the embedding cache would turn repeats into hits
+    ml_service.model.encode(CLAUSES, batch_size=settings.ENCODE_BATCH_SIZE)
+    started = time.perf_counter()
+    ml_service.model.encode(sentences, batch_size=settings.ENCODE_BATCH_SIZE)
+    encode_s = time.perf_counter() - started
+
+    embeddings = np.asarray(ml_service.model.encode(CLAUSES, batch_size=settings.ENCODE_BATCH_SIZE), dtype=np.float32)
+    scores = ml_service.pattern_index.category_scores(embeddings)
+    best = scores.argmax(axis=1)
+    categories = [
+        ml_service.pattern_index.categories[c] if scores[i, c] > 0.45 else None for i, c in enumerate(best)
+    ]
+    np.save(args.out, embeddings)
+
+    print(json.dumps({
+        "backend": args.backend,
+        "load_s": round(load_s, 2),
+        "sentences_per_sec": round(len(sentences) / encode_s, 1),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "categories": categories
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=25, help="Corpus repetitions in the timed encode")
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.backend:
+        return child(args)
+
+    import numpy as np
+
+    results = []
+    embeddings = {}
+    workdir = tempfile.mkdtemp()
+    for backend in args.backends.split(","):
+        out = os.path.join(workdir, f"{backend}.npy")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--backend", backend, "--out", out,
+             "--threads", str(args.threads), "--repeat", str(args.repeat)],
+            capture_output=True, text=True
+        )
+        lines = proc.stdout.strip().splitlines()
+        result = json.loads(lines[-1]) if proc.returncode == 0 and lines else {
+            "backend": backend, "error": proc.stderr.strip().splitlines()[-1:] or "failed"
+        }
+        if "error" not in result:
+            embeddings[backend] = np.load(out)
+        results.append(result)
+
+    mismatches = 0
+    reference = next((r for r in results if r["backend"] == "torch" and "error" not in r), None)
+    reference_categories = reference["categories"] if reference else None
+    for result in results:
+        categories = result.pop("categories", None)
+        if reference is None or categories is None or result is reference:
+            continue
+        a, b = embeddings["torch"], embeddings[result["backend"]]
+        cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+        changed = [
+            {"clause": CLAUSES[i], "torch": reference_categories[i], result["backend"]: categories[i]}
+            for i in range(len(CLAUSES)) if categories[i] != reference_categories[i]
+        ]
+        result["min_cosine_vs_torch"] = round(float(cosine.min()), 4)
+        result["mean_cosine_vs_torch"] = round(float(cosine.mean()), 4)
+        result["classification_changes"] = changed
+        if changed or cosine.min() < args.min_cosine:
+            mismatches += 1
+
+    print(json.dumps({"clauses": len(CLAUSES), "threads": args.threads, "results": results}, indent=2))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
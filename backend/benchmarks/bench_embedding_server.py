@@ -0,0 +1,104 @@
+# Benchmark: N worker processes each loading the model vs one shared embedding server
+# Run from backend/: python benchmarks/bench_embedding_server.py --workers 4 --threads 8
+# Every worker runs --threads concurrent "requests", each encoding one contract's
+# clauses (the fixture corpus) --requests times. Reports total throughput and the
+# summed peak RSS of all processes involved (workers + server).
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_embedding_backends import CLAUSES
+
+
+def worker(args):
+    from app.services.ml_service import ml_service
+
+    ml_service.warm_up()
+    if not ml_service.enabled:
+        print(json.dumps({"error": "model unavailable (see log)"}))
+        return
+
+    def run():
+        for i in range(args.requests):
+            # Distinct sentences per request, so nothing is served from the embedding cache
+            ml_service.model.encode([f"{c} ({threading.get_ident()}-{i})" for c in CLAUSES])
+
+    threads = [threading.Thread(target=run) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(json.dumps({
+        "seconds": time.perf_counter() - started,
+        "sentences": len(CLAUSES) * args.requests * args.threads,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }))
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_mode(args, socket_path):
+    env = dict(os.environ, EMBEDDING_SERVER_SOCKET=socket_path or "")
+    server = None
+    if socket_path:
+        server = subprocess.Popen([sys.executable, "-m", "app.services.embedding_server", "--socket", socket_path], env=env)
+
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--threads", str(args.threads), "--requests", str(args.requests)]
+    started = time.perf_counter()
+    procs = [subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, text=True) for _ in range(args.workers)]
+    outputs = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+    wall = time.perf_counter() - started
+
+    server_rss = 0
+    if server is not None:
+        server_rss = peak_rss_mb(server.pid)
+        server.terminate()
+        server.wait()
+    if any("error" in o for o in outputs):
+        return {"error": outputs[0].get("error")}
+    worker_rss = sum(o["peak_rss_mb"] for o in outputs)
+    return {
+        "workers": args.workers,
+        "sentences_per_sec": round(sum(o["sentences"] for o in outputs) / max(o["seconds"] for o in outputs), 1),
+        "wall_seconds": round(wall, 1),
+        "worker_peak_rss_mb": round(worker_rss, 1),
+        "server_peak_rss_mb": round(server_rss, 1),
+        "total_peak_rss_mb": round(worker_rss + server_rss, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent requests per worker")
+    parser.add_argument("--requests", type=int, default=10, help="Requests per thread")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args)
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "embedding.sock")
+    results = {
+        "local": run_mode(args, None),
+        "server": run_mode(args, socket_path)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Benchmark: history listing for a user with 100k stored analyses
+# Run from backend/: python benchmarks/bench_history.py --rows 100000
+# Uses a throwaway SQLite database (WAL, pooled) unless DATABASE_URL is set.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": round(statistics.median(samples), 3), "p95_ms": round(percentile(samples, 0.95), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--other-users", type=int, default=50, help="Rows for other users, per user, x1000")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=5000)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'history_bench.db')}"
+
+    from sqlalchemy import select
+    from app.core.database import SessionLocal, init_db
+    from app.models.analysis import Analysis
+    from app.services.history import LIST_COLUMNS, history_entry, history_service
+
+    init_db()
+    risk_data = {
+        "score": 35,
+        "risks": [{"category": "Payment Terms", "severity": "High", "finding": "Net 90", "expectation_check": "Mismatch"}],
+        "contract_summary": "SERVICE AGREEMENT. Client shall pay Contractor within 90 days..."
+    }
+    users = ["bench-user"] * args.rows + [f"other-{i}" for i in range(args.other_users) for _ in range(1000)]
+    random.Random(0).shuffle(users)
+
+    started = time.perf_counter()
+    base = time.time() - len(users)
+    for i in range(0, len(users), args.batch):
+        entries = []
+        for j, user_id in enumerate(users[i:i + args.batch], start=i):
+            entry = history_entry(risk_data, user_id, f"contract_{j}.pdf", f"{j:064x}", "Net 30")
+            entry["created_at"] = base + j
+            entries.append(entry)
+        history_service.record_many(entries)
+    insert_seconds = time.perf_counter() - started
+
+    # Cursors of the first, a middle and the last page, from one walk through the history
+    walk_started = time.perf_counter()
+    cursors = [None]
+    cursor = None
+    while True:
+        _, cursor = history_service.list_for_user("bench-user", args.page_size, cursor)
+        if cursor is None:
+            break
+        cursors.append(cursor)
+    walk_seconds = time.perf_counter() - walk_started
+    pages = len(cursors)
+
+    def offset_page(offset):
+        query = (
+            select(*LIST_COLUMNS).where(Analysis.user_id == "bench-user")
+            .order_by(Analysis.created_at.desc(), Analysis.id.desc())
+            .offset(offset).limit(args.page_size)
+        )
+        with SessionLocal() as session:
+            return session.execute(query).all()
+
+    results = {}
+    for name, index in (("first_page", 0), ("middle_page", pages // 2), ("last_page", pages - 1)):
+        results[name] = {
+            "keyset": timed(lambda: history_service.list_for_user("bench-user", args.page_size, cursors[index]), 50),
+            "offset": timed(lambda: offset_page(index * args.page_size), 20)
+        }
+
+    json.dump({
+        "database": os.environ["DATABASE_URL"],
+        "user_rows": args.rows,
+        "total_rows": len(users),
+        "page_size": args.page_size,
+        "bulk_insert_rows_per_sec": round(len(users) / insert_seconds),
+        "full_walk_pages": pages,
+        "full_walk_seconds": round(walk_seconds, 2),
+        "pages": results
+    }, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
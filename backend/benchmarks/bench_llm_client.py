@@ -0,0 +1,109 @@
+# Benchmark: LLM client under load against the fake Groq server (benchmarks/fake_groq_server.py)
+# Run from backend/: python benchmarks/bench_llm_client.py --requests 200 --concurrency 32 --server-rpm 300
+# Each request generates the explanation and negotiation email for a distinct risk
+# set (nothing is served from the LLM cache). The client-side limits come from the
+# usual LLM_* settings; the server enforces --server-rpm/--server-tpm with 429s.
+# Reports latency percentiles, how many outputs degraded to the mock, client
+# retry/breaker counters and what the server saw.
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import percentile
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def risk_data(i: int) -> dict:
+    return {
+        "score": 40 + i % 50,
+        "risks": [
+            {"category": "Payment Terms", "severity": "High", "finding": f"Payment terms are Net {60 + i} days.", "expectation_check": "Mismatch"},
+            {"category": "Termination", "severity": "High", "finding": "Client may terminate immediately without notice."},
+            {"category": "Liability", "severity": "Medium", "finding": "Contractor liability is unlimited and uncapped. " * 6}
+        ]
+    }
+
+
+async def run(args):
+    from app.services.llm import llm_service
+
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+    latencies, fallbacks = [], 0
+
+    async def worker():
+        nonlocal fallbacks
+        while not queue.empty():
+            i = queue.get_nowait()
+            data = risk_data(i)
+            started = time.perf_counter()
+            explanation, email = await llm_service.agenerate_all(data, "Net 30 payment", timeout=args.timeout)
+            latencies.append(time.perf_counter() - started)
+            fallbacks += (explanation == llm_service._generate_mock_explanation(data, "Net 30 payment"))
+            fallbacks += (email == llm_service._generate_mock_email(data))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "requests": args.requests,
+        "wall_seconds": round(wall, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mock_outputs": fallbacks,
+        "client": llm_service.client.stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-call timeout, as LLM_TIMEOUT_SECONDS")
+    parser.add_argument("--server-rpm", type=int, default=0)
+    parser.add_argument("--server-tpm", type=int, default=0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--server-latency-ms", type=float, default=800)
+    args = parser.parse_args()
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_groq_server.py"),
+        "--port", str(port), "--rpm", str(args.server_rpm), "--tpm", str(args.server_tpm),
+        "--error-rate", str(args.server_error_rate), "--latency-ms", str(args.server_latency_ms)
+    ])
+    try:
+        for _ in range(50):
+            try:
+                httpx.get(f"{base_url}/stats")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        # Settings are read at import time
+        os.environ.update(GROQ_BASE_URL=base_url, GROQ_API_KEY="fake", RESULT_CACHE_BACKEND="memory")
+        results = asyncio.run(run(args))
+        results["server"] = httpx.get(f"{base_url}/stats").json()
+    finally:
+        server.terminate()
+        server.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Benchmark: OCR throughput (pages/sec) on a multi-page scanned contract
+# Run from backend/: python benchmarks/bench_ocr.py --pages 20 --workers 2 --in-flight 4
+# Needs python-doctr with its pretrained weights; generates an image-only PDF unless --file is given.
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CLAUSES = [
+    "1. SERVICES. Contractor will build and maintain a web application for the Client.",
+    "2. PAYMENT. Payment is due within 90 days of invoice receipt.",
+    "3. TERMINATION. Client may terminate this agreement immediately without notice.",
+    "4. INTELLECTUAL PROPERTY. Client owns all work product, including pre-existing IP.",
+    "5. LIABILITY. Contractor's liability is unlimited for any damages caused.",
+    "6. CONFIDENTIALITY. Each party shall keep the other party's information confidential.",
+]
+
+
+def make_scanned_pdf(path: str, pages: int):
+    """Image-only PDF: each page is a rendered bitmap with no text layer."""
+    from PIL import Image, ImageDraw
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    width, height = letter
+    pdf = canvas.Canvas(path, pagesize=letter)
+    for page in range(pages):
+        image = Image.new("RGB", (1224, 1584), "white")
+        draw = ImageDraw.Draw(image)
+        y = 80
+        for i in range(40):
+            draw.text((80, y), f"{CLAUSES[(page + i) % len(CLAUSES)]} (p{page + 1})", fill="black")
+            y += 36
+        pdf.drawImage(ImageReader(image), 0, 0, width=width, height=height)
+        pdf.showPage()
+    pdf.save()
+
+
+def peak_rss_mb(who):
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", default=None)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--in-flight", type=int, default=None)
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    if args.workers:
+        settings.OCR_WORKERS = args.workers
+    if args.in_flight:
+        settings.OCR_MAX_PAGES_IN_FLIGHT = args.in_flight
+    from app.services.ocr import ocr_service
+
+    path = args.file
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "scanned_contract.pdf")
+        make_scanned_pdf(path, args.pages)
+
+    # First pass spawns the workers and loads the model; only the second is timed
+    cold_started = time.perf_counter()
+    list(ocr_service.iter_pages(path))
+    cold_seconds = time.perf_counter() - cold_started
+
+    started = time.perf_counter()
+    first_page = None
+    pages = 0
+    characters = 0
+    for text in ocr_service.iter_pages(path):
+        if first_page is None:
+            first_page = time.perf_counter() - started
+        pages += 1
+        characters += len(text)
+    elapsed = time.perf_counter() - started
+    if ocr_service._pool is not None:
+        # Reaped workers are what RUSAGE_CHILDREN reports on
+        ocr_service._pool.shutdown()
+
+    json.dump({
+        "file": path,
+        "pages": pages,
+        "characters": characters,
+        "workers": settings.OCR_WORKERS,
+        "max_pages_in_flight": settings.OCR_MAX_PAGES_IN_FLIGHT,
+        "cold_seconds": round(cold_seconds, 2),
+        "seconds": round(elapsed, 2),
+        "pages_per_sec": round(pages / elapsed, 2),
+        "first_page_seconds": round(first_page or 0, 2),
+        "peak_rss_mb_parent": peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_rss_mb_largest_worker": peak_rss_mb(resource.RUSAGE_CHILDREN)
+    }, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Benchmark: PDF report rendering (reports/sec, peak memory) for a 50-risk report
+# Run from backend/: python benchmarks/bench_report.py --risks 50 --reports 50
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ["Payment Terms", "Termination", "Liability", "Intellectual Property"]
+SEVERITIES = ["Critical", "Severe", "High", "Medium"]
+
+
+def make_risks(count: int) -> list:
+    return [
+        {
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "severity": SEVERITIES[i % len(SEVERITIES)],
+            "finding": f"Clause {i + 1}: payment is due within 90 days & the client may withhold it <for any reason>.",
+            "expectation_check": "Mismatch"
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--risks", type=int, default=50)
+    parser.add_argument("--reports", type=int, default=50)
+    args = parser.parse_args()
+
+    from app.services.llm import llm_service
+    from app.services.report_generator import generate_pdf_report
+
+    risk_data = {"score": 35, "risks": make_risks(args.risks)}
+    explanation = llm_service._generate_mock_explanation(risk_data, "Net 30 payment, 30 days notice")
+    email = llm_service._generate_mock_email(risk_data)
+
+    # First report builds the shared styles and loads fonts; not timed
+    size = len(generate_pdf_report(risk_data["score"], risk_data["risks"], explanation, email))
+
+    started = time.perf_counter()
+    for _ in range(args.reports):
+        generate_pdf_report(risk_data["score"], risk_data["risks"], explanation, email)
+    elapsed = time.perf_counter() - started
+
+    # Peak Python allocations of one report, measured separately: tracing slows rendering down
+    tracemalloc.start()
+    generate_pdf_report(risk_data["score"], risk_data["risks"], explanation, email)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    json.dump({
+        "risks": args.risks,
+        "reports": args.reports,
+        "pdf_bytes": size,
+        "seconds": round(elapsed, 2),
+        "reports_per_sec": round(args.reports / elapsed, 2),
+        "ms_per_report": round(1000 * elapsed / args.reports, 1),
+        "peak_mb_per_report": round(peak / (1024 * 1024), 2),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
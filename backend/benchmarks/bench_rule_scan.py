@@ -0,0 +1,87 @@
+# Benchmark: rule scan time vs number of rules and document size, for the three
+# scan strategies of RuleEngine: one str.find pass per phrase, the pyahocorasick
+# automaton and the pure-Python automaton. The crossovers it reports are what
+# AUTOMATON_MIN_PHRASES / PURE_AUTOMATON_MIN_PHRASES in rules.py are set from.
+# Run from backend/: python benchmarks/bench_rule_scan.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import rules
+from app.services.rules import Rule, RuleEngine
+
+CHARS_PER_PAGE = 3000
+VOCABULARY = [
+    "agreement", "contractor", "client", "shall", "payment", "invoice", "days", "notice", "terminate",
+    "liability", "damages", "indemnify", "license", "property", "services", "term", "party", "fees",
+    "warranty", "confidential", "breach", "cure", "period", "written", "consent", "assign", "law"
+]
+
+
+def make_rules(rng, n):
+    phrases = set()
+    while len(phrases) < n:
+        phrases.add(" ".join(rng.sample(VOCABULARY, rng.randint(2, 3))) + f" {rng.randint(1, 999)}")
+    return [
+        Rule(category="Synthetic", severity="Medium", penalty=1, finding=p, triggers=(p,))
+        for p in sorted(phrases)
+    ]
+
+
+def make_document(rng, pages, phrases):
+    words = []
+    size = 0
+    while size < pages * CHARS_PER_PAGE:
+        word = rng.choice(phrases) if rng.random() < 0.002 else rng.choice(VOCABULARY)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words).capitalize() + "."
+
+
+def engine_with(table, strategy):
+    """RuleEngine forced onto one scan strategy: "find", "automaton" (pyahocorasick) or "pure"."""
+    saved = rules.ahocorasick, rules.AUTOMATON_MIN_PHRASES, rules.PURE_AUTOMATON_MIN_PHRASES
+    try:
+        if strategy == "pure":
+            rules.ahocorasick = None
+        rules.AUTOMATON_MIN_PHRASES = rules.PURE_AUTOMATON_MIN_PHRASES = float("inf") if strategy == "find" else 0
+        return RuleEngine(table)
+    finally:
+        rules.ahocorasick, rules.AUTOMATON_MIN_PHRASES, rules.PURE_AUTOMATON_MIN_PHRASES = saved
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    rng = random.Random(0)
+    strategies = ["find", "pure"] + (["automaton"] if rules.ahocorasick is not None else [])
+    print(f"{'rules':>6} {'pages':>6} " + " ".join(f"{name + ' ms':>13}" for name in strategies))
+    for n_rules in (3, 10, 30, 60, 100, 300, 1000):
+        table = make_rules(rng, n_rules)
+        phrases = [r.triggers[0] for r in table]
+        engines = {name: engine_with(table, name) for name in strategies}
+        for pages in (10, 50, 200):
+            text = make_document(rng, pages, phrases)
+            expected = engines["find"].scan(text)
+            assert all(engine.scan(text) == expected for engine in engines.values())
+            times = [timed(lambda: engine.scan(text), repeat=1 if name == "pure" else 3) for name, engine in engines.items()]
+            print(f"{n_rules:>6} {pages:>6} " + " ".join(f"{ms:>13.1f}" for ms in times))
+
+    if rules.ahocorasick is None:
+        print("\nNote: pyahocorasick is not installed; only the find and pure-Python strategies were measured.")
+    print(f"\nIn use: pyahocorasick from {rules.AUTOMATON_MIN_PHRASES} phrases, "
+          f"pure-Python automaton (no pyahocorasick) from {rules.PURE_AUTOMATON_MIN_PHRASES}, str.find below.")
+
+
+if __name__ == "__main__":
+    main()
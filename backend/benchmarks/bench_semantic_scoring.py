@@ -0,0 +1,77 @@
+# Benchmark: semantic risk scoring, per-sentence loop vs batched PatternIndex
+# Run from backend/: python benchmarks/bench_semantic_scoring.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from app.services.similarity import PatternIndex
+
+DIM = 384
+CATEGORIES = ["Termination", "Liability", "Payment Terms", "Intellectual Property"]
+PATTERNS_PER_CATEGORY = 4
+THRESHOLD = 0.45
+
+
+def loop_scoring(sentence_embeddings, pattern_embeddings, threshold):
+    """The original nested loop from MLService.analyze_clause_semantic."""
+    results = []
+    for i, s_emb in enumerate(sentence_embeddings):
+        for category, p_embs in pattern_embeddings.items():
+            max_sim = np.max(cosine_similarity([s_emb], p_embs)[0])
+            if max_sim > threshold:
+                results.append((i, category, float(max_sim)))
+    best = {}
+    for i, category, conf in sorted(results, key=lambda x: x[2], reverse=True):
+        best.setdefault(i, (category, conf))
+    return best
+
+
+def batched_scoring(sentence_embeddings, index, threshold):
+    keep, cats, conf = index.best_matches(sentence_embeddings, threshold)
+    return {int(i): (index.categories[c], float(s)) for i, c, s in zip(keep, cats, conf)}
+
+
+def make_embeddings(rng, pattern_embeddings, n):
+    # Mix of near-pattern and random sentences so some cross the threshold
+    base = np.vstack(list(pattern_embeddings.values()))
+    picks = base[rng.integers(0, len(base), n)]
+    noise = rng.normal(size=(n, DIM)).astype(np.float32)
+    return picks + noise * rng.uniform(0.02, 0.2, size=(n, 1)).astype(np.float32)
+
+
+def clauses_per_sec(fn, n, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return n * repeat / (time.perf_counter() - start)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    pattern_embeddings = {
+        c: rng.normal(size=(PATTERNS_PER_CATEGORY, DIM)).astype(np.float32) for c in CATEGORIES
+    }
+    index = PatternIndex.from_embeddings(pattern_embeddings)
+
+    print(f"{'sentences':>10} {'loop clauses/s':>16} {'batched clauses/s':>18} {'speedup':>8}")
+    for n in (10, 100, 1000):
+        embeddings = make_embeddings(rng, pattern_embeddings, n)
+
+        expected = loop_scoring(embeddings, pattern_embeddings, THRESHOLD)
+        actual = batched_scoring(embeddings, index, THRESHOLD)
+        assert expected.keys() == actual.keys()
+        assert all(expected[i][0] == actual[i][0] for i in expected)
+        assert all(abs(expected[i][1] - actual[i][1]) < 1e-4 for i in expected)
+
+        repeat = max(1, 2000 // n)
+        loop_rate = clauses_per_sec(lambda: loop_scoring(embeddings, pattern_embeddings, THRESHOLD), n, repeat)
+        batched_rate = clauses_per_sec(lambda: batched_scoring(embeddings, index, THRESHOLD), n, repeat * 20)
+        print(f"{n:>10} {loop_rate:>16,.0f} {batched_rate:>18,.0f} {batched_rate / loop_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# End-to-end benchmark suite on a synthetic contract corpus (benchmarks/corpus.py)
+# Run from backend/: python benchmarks/bench_suite.py --docs 50 --pages 3 --risk-density 0.3 --output bench.json
+# Compare two commits: python benchmarks/bench_suite.py --compare old.json new.json
+#
+# Stages, each in its own process (so peak RSS is per stage), each over --docs
+# distinct documents after one untimed warm-up document:
+#   ocr         OCRService.process_file on text-layer PDFs
+#   risk_engine RiskEngine.analyze (rules + semantic when the model loads)
+#   semantic    MLService.analyze_clause_semantic
+#   pdf_report  generate_pdf_report with the mock LLM texts
+#   analyze     POST /api/v1/analyze end to end (upload, OCR, scoring, mock LLM, history)
+# The LLM runs on its mock paths (no GROQ_API_KEY), and every process gets a
+# throwaway database, upload/report folders and clause index, with the result
+# cache in memory. Output is JSON: per-stage throughput, latency percentiles and
+# peak RSS, plus the commit and settings the numbers belong to.
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from corpus import make_corpus, write_pdf
+from load_test import percentile
+
+STAGES = ["ocr", "risk_engine", "semantic", "pdf_report", "analyze"]
+EXPECTATION = "I expect Net 30 payment and 30 days termination notice."
+
+
+def _warm_model():
+    from app.services.ml_service import ml_service
+    # Idempotent, unlike warm_up(): the app lifespan may already have started it
+    ml_service.start_warm_up()
+    ml_service.ready.wait()
+    return ml_service.enabled
+
+
+def _pdfs(texts: list, workdir: str) -> list:
+    paths = []
+    for i, text in enumerate(texts):
+        path = os.path.join(workdir, f"contract-{i}.pdf")
+        write_pdf(text, path)
+        paths.append(path)
+    return paths
+
+
+def stage_runner(stage: str, texts: list, workdir: str):
+    """(setup info, run(i) for document i); setup is not timed."""
+    if stage == "ocr":
+        from app.services.ocr import ocr_service
+        paths = _pdfs(texts, workdir)
+        return {}, lambda i: ocr_service.process_file(paths[i])
+
+    if stage == "risk_engine":
+        from app.services.logic import risk_engine
+        return {"semantic": _warm_model()}, lambda i: risk_engine.analyze(texts[i], EXPECTATION)
+
+    if stage == "semantic":
+        from app.services.ml_service import ml_service
+        if not _warm_model():
+            return {"skipped": "embedding model unavailable (see log)"}, None
+        return {}, lambda i: ml_service.analyze_clause_semantic(texts[i])
+
+    if stage == "pdf_report":
+        from app.services.llm import llm_service
+        from app.services.logic import risk_engine
+        from app.services.report_generator import generate_pdf_report
+        # Rule-only risks: this stage measures rendering, not scoring
+        analyses = []
+        for text in texts:
+            risk_data = risk_engine.analyze(text, EXPECTATION)
+            analyses.append((
+                risk_data["score"], risk_data["risks"],
+                llm_service._generate_mock_explanation(risk_data, EXPECTATION), llm_service._generate_mock_email(risk_data)
+            ))
+        return {}, lambda i: generate_pdf_report(*analyses[i])
+
+    if stage == "analyze":
+        from fastapi.testclient import TestClient
+        import main
+        paths = _pdfs(texts, workdir)
+        payloads = []
+        for path in paths:
+            with open(path, "rb") as f:
+                payloads.append(f.read())
+        client = TestClient(main.app)
+        client.__enter__()
+        semantic = _warm_model()
+
+        def run(i):
+            response = client.post(
+                "/api/v1/analyze",
+                files={"file": (f"contract-{i}.pdf", payloads[i], "application/pdf")},
+                data={"user_explanation": EXPECTATION}
+            )
+            response.raise_for_status()
+        return {"semantic": semantic}, run
+
+    raise ValueError(f"Unknown stage {stage!r}")
+
+
+def worker(args):
+    texts = make_corpus(args.docs + 1, args.pages, args.risk_density, args.seed)
+    setup_started = time.perf_counter()
+    info, run = stage_runner(args.stage, texts, args.workdir)
+    info["setup_seconds"] = round(time.perf_counter() - setup_started, 2)
+    if run is None:
+        print(json.dumps(info))
+        return
+
+    # One extra document warms up lazy imports and pools; it is not timed
+    run(args.docs)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(args.docs):
+        t = time.perf_counter()
+        run(i)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+
+    chars = sum(len(text) for text in texts[:args.docs])
+    print(json.dumps({
+        **info,
+        "docs": args.docs,
+        "docs_per_sec": round(args.docs / elapsed, 2),
+        "chars_per_sec": round(chars / elapsed),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p90": round(percentile(latencies, 90) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "mean": round(statistics.mean(latencies) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2)
+        },
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }))
+
+
+def run_stage(stage: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            GROQ_API_KEY="",
+            RESULT_CACHE_BACKEND="memory",
+            JOB_QUEUE_BACKEND="local",
+            EMBEDDING_SERVER_SOCKET="",
+            DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+            UPLOAD_FOLDER=f"{workdir}/uploads",
+            REPORT_FOLDER=f"{workdir}/reports",
+            CLAUSE_INDEX_DIR=f"{workdir}/clause_index",
+            PATTERN_ARTIFACT_DIR=f"{workdir}/artifacts"
+        )
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--worker", "--stage", stage, "--workdir", workdir,
+            "--docs", str(args.docs), "--pages", str(args.pages), "--risk-density", str(args.risk_density), "--seed", str(args.seed)
+        ]
+        proc = subprocess.run(cmd, env=env, cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        return {"error": f"exited with {proc.returncode} (see stderr)"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(old_path: str, new_path: str) -> dict:
+    """Per-stage ratios new/old: above 1 is faster (throughput) or slower (latency) respectively."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    stages = {}
+    for stage, result in new["stages"].items():
+        before = old["stages"].get(stage, {})
+        if "docs_per_sec" not in result or "docs_per_sec" not in before:
+            continue
+        stages[stage] = {
+            "docs_per_sec": round(result["docs_per_sec"] / before["docs_per_sec"], 3),
+            "p50": round(result["latency_ms"]["p50"] / before["latency_ms"]["p50"], 3),
+            "p99": round(result["latency_ms"]["p99"] / before["latency_ms"]["p99"], 3),
+            "peak_rss_mb": round(result["peak_rss_mb"] / before["peak_rss_mb"], 3)
+        }
+    return {"old": old.get("commit"), "new": new.get("commit"), "ratios": stages}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50, help="Timed documents per stage")
+    parser.add_argument("--pages", type=float, default=3, help="Document size, in ~3000-character pages")
+    parser.add_argument("--risk-density", type=float, default=0.3, help="Share of clauses drawn from risky templates")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated subset of " + ",".join(STAGES))
+    parser.add_argument("--output", help="Also write the JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files instead of running")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stage", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args)
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        return
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {"docs": args.docs, "pages": args.pages, "risk_density": args.risk_density, "seed": args.seed},
+        "stages": {stage: run_stage(stage, args) for stage in args.stages.split(",")}
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
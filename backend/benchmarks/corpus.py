@@ -0,0 +1,93 @@
+# Synthetic contract corpus for benchmarks: service agreements assembled from
+# clause templates with randomized parties, amounts and durations, so repeated
+# documents do not hit the text/risk/embedding caches. risk_density is the share
+# of clauses drawn from the risky templates (ones the rule engine or semantic
+# patterns flag); the rest are boilerplate. Same seed, same corpus.
+import random
+
+CHARS_PER_PAGE = 3000
+
+PARTIES = ["Acme Corp", "Globex LLC", "Initech Inc", "Umbrella Ltd", "Hooli", "Stark Industries", "Wayne Enterprises"]
+PLACES = ["Delaware", "New York", "California", "Texas", "Ontario", "England and Wales"]
+
+RISKY = [
+    "PAYMENT. Payment is due within {long_days} days of invoice receipt.",
+    "PAYMENT. Client shall pay Contractor ${rate} per hour; invoices are payable net {long_days}.",
+    "TERMINATION. {client} may terminate this agreement immediately without notice.",
+    "TERMINATION. {client} may terminate at any time without cause, and no fees are owed for work in progress.",
+    "INTELLECTUAL PROPERTY. {client} owns all work product, including pre-existing IP of Contractor incorporated into the work.",
+    "INTELLECTUAL PROPERTY. Contractor hereby assigns to {client} all right, title and interest in any inventions conceived during the term.",
+    "LIABILITY. Contractor's liability is unlimited. {client}'s liability is limited to ${small_amount}.",
+    "INDEMNITY. Contractor shall indemnify and hold harmless {client} against all claims arising from the services.",
+    "NON-COMPETE. Contractor shall not engage in any competing business for {years} years after termination.",
+    "DISPUTES. Any dispute shall be resolved by binding arbitration in a venue chosen by {client}.",
+    "SCOPE. {client} may modify the scope of work at any time without additional compensation.",
+]
+
+BENIGN = [
+    "SERVICES. Contractor will provide software development services to {client} as described in Schedule {schedule}.",
+    "NOTICES. Notices shall be sent by email to the addresses listed above and are effective on receipt.",
+    "GOVERNING LAW. This agreement is governed by the laws of {place}.",
+    "INDEPENDENT CONTRACTOR. The parties are independent contractors and not employees, partners or agents.",
+    "INSURANCE. Contractor shall maintain general liability insurance of at least ${large_amount}.",
+    "EXPENSES. {client} shall reimburse pre-approved travel expenses within {short_days} days.",
+    "ACCEPTANCE. Deliverables are accepted if {client} does not object within {short_days} business days.",
+    "CONFIDENTIALITY. Each party shall keep the other party's confidential information secret for {years} years.",
+    "SEVERABILITY. If any provision is held invalid, the remaining provisions remain in full force.",
+    "ENTIRE AGREEMENT. This agreement constitutes the entire agreement between {client} and Contractor.",
+    "FORCE MAJEURE. Force majeure events excuse performance for their duration, up to {short_days} days.",
+    "COMPLIANCE. Contractor shall comply with all applicable laws and regulations in {place}.",
+]
+
+
+def _fill(rng: random.Random, template: str, client: str) -> str:
+    return template.format(
+        client=client,
+        place=rng.choice(PLACES),
+        long_days=rng.choice([60, 75, 90, 120]),
+        short_days=rng.randint(5, 30),
+        rate=rng.randint(40, 250),
+        small_amount=rng.randint(50, 500),
+        large_amount=f"{rng.randint(1, 5) * 1_000_000:,}",
+        years=rng.randint(1, 5),
+        schedule=rng.choice("ABCD")
+    )
+
+
+def make_contract(seed: int, pages: float = 3, risk_density: float = 0.3) -> str:
+    """A contract of about `pages` * CHARS_PER_PAGE characters."""
+    rng = random.Random(seed)
+    client = rng.choice(PARTIES)
+    lines = [f"SERVICE AGREEMENT between {client} (\"Client\") and Contractor, reference {rng.randint(10000, 99999)}.", ""]
+    size = 0
+    number = 1
+    while size < pages * CHARS_PER_PAGE:
+        template = rng.choice(RISKY if rng.random() < risk_density else BENIGN)
+        clause = f"{number}. {_fill(rng, template, client)}"
+        lines.append(clause)
+        size += len(clause) + 1
+        number += 1
+    return "\n".join(lines)
+
+
+def make_corpus(count: int, pages: float = 3, risk_density: float = 0.3, seed: int = 0) -> list:
+    return [make_contract(seed * 1_000_003 + i, pages, risk_density) for i in range(count)]
+
+
+def write_pdf(text: str, path: str):
+    """PDF with a text layer (the common, non-scanned case), one line per clause, wrapped."""
+    import textwrap
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    y = height - 54
+    for paragraph in text.split("\n"):
+        for line in textwrap.wrap(paragraph, 95) or [""]:
+            if y < 54:
+                pdf.showPage()
+                y = height - 54
+            pdf.drawString(54, y, line)
+            y -= 14
+    pdf.save()
@@ -0,0 +1,118 @@
+# Local stand-in for the Groq chat completions API, for load tests without a key or quota
+# Run from backend/: python benchmarks/fake_groq_server.py --port 8099 --rpm 120 --error-rate 0.05
+# then start the API with GROQ_BASE_URL=http://127.0.0.1:8099 GROQ_API_KEY=fake.
+# Replies after --latency-ms (+ jitter), streams when asked, reports usage like Groq
+# (usage / x_groq.usage), answers 429 with Retry-After once the --rpm or --tpm budget
+# (refilled continuously, as Groq does) is used up, and fails --error-rate of requests with a 503.
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm_client import TokenBucket
+
+WORDS = ("the contract clause payment notice liability termination client contractor "
+         "days terms risk propose mutual agreement cap review fair standard").split()
+
+
+def create_app(args) -> FastAPI:
+    app = FastAPI()
+    buckets = [(TokenBucket(args.rpm), lambda tokens: 1)] if args.rpm else []
+    if args.tpm:
+        buckets.append((TokenBucket(args.tpm), lambda tokens: tokens))
+    counts = collections.Counter()
+
+    def rate_limited(tokens: int) -> float:
+        """Seconds until the request would fit the per-minute limits, or 0 once it is admitted."""
+        waits = [(bucket, cost(tokens), bucket.reserve(cost(tokens))) for bucket, cost in buckets]
+        if all(wait == 0 for _, _, wait in waits):
+            return 0
+        # Rejected requests do not count against the budget
+        for bucket, amount, _ in waits:
+            bucket.refund(amount)
+        return max(wait for _, _, wait in waits)
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counts["requests"] += 1
+        prompt_tokens = sum(len(m.get("content", "")) // 4 + 1 for m in body.get("messages", []))
+        completion_tokens = min(body.get("max_tokens") or args.completion_tokens, args.completion_tokens)
+
+        retry_after = rate_limited(prompt_tokens + completion_tokens)
+        if retry_after:
+            counts["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+                status_code=429, headers={"retry-after": f"{retry_after:.1f}"}
+            )
+        if random.random() < args.error_rate:
+            counts["errors"] += 1
+            return JSONResponse({"error": {"message": "Service unavailable", "type": "internal_server_error"}}, status_code=503)
+
+        await asyncio.sleep((args.latency_ms + random.uniform(0, args.jitter_ms)) / 1000)
+        counts["completed"] += 1
+        counts["prompt_tokens"] += prompt_tokens
+        counts["completion_tokens"] += completion_tokens
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        words = [random.choice(WORDS) for _ in range(completion_tokens)]
+        base = {"id": completion_id, "created": int(time.time()), "model": body.get("model", "fake")}
+
+        if not body.get("stream"):
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+
+        async def events():
+            for i in range(0, len(words), 8):
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": " ".join(words[i:i + 8]) + " "}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(args.chunk_ms / 1000)
+            final = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                     "x_groq": {"id": completion_id, "usage": usage}}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return dict(counts)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=800, help="Base time to answer a completion")
+    parser.add_argument("--jitter-ms", type=float, default=400)
+    parser.add_argument("--chunk-ms", type=float, default=20, help="Delay between streamed chunks")
+    parser.add_argument("--completion-tokens", type=int, default=300)
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before 429s; 0 = unlimited")
+    parser.add_argument("--tpm", type=int, default=0, help="Tokens per minute before 429s; 0 = unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 503")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Load test: concurrent /analyze uploads while probing /health
+# Start the API (uvicorn main:app --port 8000), then from backend/:
+#   python benchmarks/load_test.py --concurrency 16 --requests 64
+# Run once on the old commit and once on the new one to compare p50/p99.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sample_contract.txt")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def summarize(name, latencies, errors):
+    return {
+        "endpoint": name,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else None
+    }
+
+
+async def upload_worker(client, queue, payload, filename, latencies, errors):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/v1/analyze",
+                files={"file": (filename, payload, "text/plain")},
+                data={"user_explanation": "I expect Net 30 payment and 30 days termination notice."}
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors.append(1)
+
+
+async def health_probe(client, stop, latencies, errors, interval):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = await client.get("/health")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors.append(1)
+        await asyncio.sleep(interval)
+
+
+async def run(args):
+    with open(args.file, "rb") as f:
+        payload = f.read()
+    filename = os.path.basename(args.file)
+
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    analyze_latencies, analyze_errors = [], []
+    health_latencies, health_errors = [], []
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        probe = asyncio.create_task(health_probe(client, stop, health_latencies, health_errors, args.health_interval))
+        await asyncio.gather(*(
+            upload_worker(client, queue, payload, filename, analyze_latencies, analyze_errors)
+            for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    return {
+        "concurrency": args.concurrency,
+        "wall_time_s": round(elapsed, 2),
+        "throughput_rps": round(len(analyze_latencies) / elapsed, 2),
+        "results": [
+            summarize("/api/v1/analyze", analyze_latencies, len(analyze_errors)),
+            summarize("/health", health_latencies, len(health_errors))
+        ]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--file", default=DEFAULT_FILE)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--health-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Startup instrumentation for CI: how long `import main` takes, and which modules dominate.
+# Run from backend/: python benchmarks/startup_time.py [--max-seconds 5]
+# Exits non-zero when the import exceeds --max-seconds, so CI can track regressions.
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str):
+    """Parse `python -X importtime` output into (module, cumulative_us) rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((module.strip(), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ, HF_HUB_OFFLINE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        sys.exit(result.returncode)
+
+    rows = parse_importtime(result.stderr)
+    total_us = next((us for module, us in rows if module == "main"), 0)
+    top_level = sorted((r for r in rows if "." not in r[0] and r[0] != "main"), key=lambda r: r[1], reverse=True)
+    report = {
+        "import_main_seconds": round(total_us / 1e6, 3),
+        "slowest_top_level_imports": [
+            {"module": module, "seconds": round(us / 1e6, 3)} for module, us in top_level[:args.top]
+        ]
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+    if args.max_seconds is not None and report["import_main_seconds"] > args.max_seconds:
+        sys.stderr.write(f"import main took {report['import_main_seconds']}s > {args.max_seconds}s\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,33 @@
-from fastapi import FastAPI
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+import logging
 import os
+from app.core import metrics
 from app.core.config import settings
+from app.core.database import init_db
+from app.core.tracing import TRACE_HEADER, configure_logging, new_trace_id, trace_id_var
+from app.services.ml_service import ml_service
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    # Bind immediately; the embedding model loads in the background
+    ml_service.start_warm_up()
+    yield
 
 app = FastAPI(
     title="ContractIQ API",
     description="Backend for ContractIQ - Discrepancy Detection & Negotiation System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Middleware
@@ -18,8 +39,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[TRACE_HEADER],
 )
 
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """Refuse oversized bodies from their Content-Length, before they are read and spooled; ingestion caps each file."""
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > settings.UPLOAD_MAX_REQUEST_BYTES:
+        return JSONResponse({"detail": "Request body too large."}, status_code=413)
+    return await call_next(request)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Trace id per request (echoed in the response) and request latency by route template."""
+    trace_id = request.headers.get(TRACE_HEADER) or new_trace_id()
+    token = trace_id_var.set(trace_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers[TRACE_HEADER] = trace_id
+        return response
+    finally:
+        # Route template, not the raw path, to keep label cardinality bounded
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started, request.method, route.path if route else "unmatched", status
+        )
+        trace_id_var.reset(token)
+
 from app.api.endpoints import analysis
 app.include_router(analysis.router, prefix="/api/v1", tags=["analysis"])
 
@@ -30,3 +80,29 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Stage timings, LLM and cache counters of this worker process, in the Prometheus text format."""
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving requests."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Ready once model warm-up has finished; 503 while it is still running."""
+    body = {
+        "status": "ready" if ml_service.ready.is_set() else "warming_up",
+        "semantic_analysis": ml_service.enabled,
+        "import_seconds": round(IMPORT_SECONDS, 3),
+        "warm_up_seconds": round(ml_service.warm_up_seconds, 3) if ml_service.warm_up_seconds is not None else None
+    }
+    return JSONResponse(body, status_code=200 if ml_service.ready.is_set() else 503)
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+logger.info(f"Application imported in {IMPORT_SECONDS:.2f}s")
@@ -1,8 +1,10 @@
 # Quick test to verify Groq API is working
+# Run from anywhere: python backend/test_llm.py (uses GROQ_API_KEY, else the mock responses)
+import os
 import sys
-sys.path.insert(0, 'c:/Users/kshitij sharma/.gemini/antigravity/scratch/ContractAI/backend')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app.services.llm import llm_service
+from app.services.llm import format_risks, llm_service
 
 # Test the service
 test_risk_data = {
@@ -27,5 +29,18 @@ email = llm_service.generate_negotiation_email(test_risk_data)
 print("\n✅ Email generated:")
 print(email[:200] + "...")
 
+# Under a tight token budget the most severe risks are the ones kept
+many_risks = [
+    {"category": "Scope", "severity": "Medium", "finding": "Scope may change at any time without compensation. " * 3},
+    {"category": "Termination", "severity": "Critical", "finding": "Client can terminate immediately without cause."},
+    {"category": "Disputes", "severity": "Medium", "finding": "Disputes go to arbitration in a venue chosen by the client. " * 3},
+    {"category": "Liability", "severity": "Severe", "finding": "Your liability is unlimited."},
+    {"category": "Indemnity", "severity": "Medium", "finding": "Contractor indemnifies the client against all claims. " * 3},
+]
+truncated = format_risks(many_risks, 60)
+assert "[Critical] Termination" in truncated and "[Severe] Liability" in truncated, truncated
+assert "(3 less severe risk(s) omitted)" in truncated, truncated
+print("\n✅ Risk list truncation keeps Critical and Severe risks")
+
 print("\n" + "=" * 50)
 print("✅ LLM Service is working!")
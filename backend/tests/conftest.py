@@ -0,0 +1,63 @@
+# Shared pytest setup. Run from backend/: python -m pytest tests
+# Storage goes to a temporary directory, and the semantic tests use a deterministic
+# hashed bag-of-words encoder instead of the sentence-transformers model, so the
+# suite needs neither a model download nor a Redis/Postgres service.
+import hashlib
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, "benchmarks"))
+
+_data = tempfile.mkdtemp(prefix="contract-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_data}/test.db",
+    UPLOAD_FOLDER=f"{_data}/uploads",
+    REPORT_FOLDER=f"{_data}/reports",
+    PATTERN_ARTIFACT_DIR=f"{_data}/artifacts",
+    CLAUSE_INDEX_DIR=f"{_data}/clause_index",
+    EMBEDDING_CACHE_DIR="",
+    RESULT_CACHE_BACKEND="memory"
+)
+
+HASHED_DIMENSIONS = 64
+
+
+class HashedEncoder:
+    """Stands in for the embedding model: word counts hashed into a fixed-size vector."""
+
+    def encode(self, sentences, **kwargs):
+        vectors = np.zeros((len(sentences), HASHED_DIMENSIONS), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            for word in sentence.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % HASHED_DIMENSIONS] += 1
+        return vectors
+
+
+@pytest.fixture(scope="session")
+def semantic():
+    """ml_service with the hashed encoder in place of the model, on an empty database."""
+    from app.core.database import init_db
+    from app.services.ml_service import ml_service
+    from app.services.similarity import PatternIndex
+
+    init_db()
+    ml_service.model = HashedEncoder()
+    ml_service.pattern_index = PatternIndex.from_embeddings(
+        {category: ml_service.model.encode(patterns) for category, patterns in ml_service.risk_patterns.items()}
+    )
+    ml_service.enabled = True
+    ml_service.ready.set()
+    return ml_service
+
+
+@pytest.fixture(scope="session")
+def sample_contract():
+    """The sample agreement used by the load test (data/sample_contract.txt)."""
+    with open(os.path.join(BACKEND, "data", "sample_contract.txt"), encoding="utf-8") as f:
+        return f.read().strip()
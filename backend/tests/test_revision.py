@@ -0,0 +1,75 @@
+# RiskEngine.analyze_revision against a stored clause map must give the same
+# result as analyze() on the revised text, while reusing the unchanged clauses.
+import pytest
+from corpus import make_contract
+from app.services.history import history_entry, history_service
+from app.services.logic import risk_engine
+from app.services.segmenter import segment_clauses
+
+EXPECTATIONS = "I expect Net 30 payment and 30 days notice before termination"
+
+INSERTED = "The Client may terminate this Agreement immediately without notice."
+EXTENDED = ", and the Contractor's liability under it is unlimited."
+
+
+def revise(text: str, modify: list = (), insert_after: list = (), remove: list = ()):
+    """The text with the given clauses (by position) extended, followed by a new clause, or dropped."""
+    spans = segment_clauses(text)
+    pieces, position = [], 0
+    for j, (start, end) in enumerate(spans):
+        pieces.append(text[position:start])
+        if j not in remove:
+            clause = text[start:end]
+            pieces.append(clause[:-1] + EXTENDED if j in modify else clause)
+            if j in insert_after:
+                pieces.append(" " + INSERTED)
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def stored_map(text: str) -> dict:
+    """Analyze a first version and store its clause map as an upload would."""
+    risk_data, clause_map, _ = risk_engine.analyze_revision(text, EXPECTATIONS)
+    analysis_id = history_service.record(history_entry(risk_data, "revision-tests"))
+    history_service.record_clause_map(analysis_id, clause_map)
+    return history_service.get_clause_map(analysis_id)
+
+
+@pytest.fixture(scope="module")
+def document(semantic):
+    text = make_contract(21, pages=1, risk_density=0.3)
+    return text, stored_map(text)
+
+
+@pytest.mark.parametrize("edits,statuses", [
+    ({}, set()),
+    ({"modify": [2]}, {"modified"}),
+    ({"insert_after": [4]}, {"inserted"}),
+    ({"remove": [6]}, {"removed"}),
+    ({"modify": [1, 9], "insert_after": [3, 12], "remove": [7, 8]}, {"modified", "inserted", "removed"})
+])
+def test_revision_matches_full_analysis(document, edits, statuses):
+    text, previous = document
+    revised = revise(text, **edits)
+    risk_data, clause_map, revision = risk_engine.analyze_revision(revised, EXPECTATIONS, previous)
+
+    assert risk_data == risk_engine.analyze(revised, EXPECTATIONS)
+    assert revision["incremental"]
+    assert revision["clauses_total"] == len(segment_clauses(revised)) == len(clause_map["clauses"])
+    assert revision["clauses_analyzed"] == len(edits.get("modify", [])) + len(edits.get("insert_after", []))
+    assert revision["clauses_reused"] == revision["clauses_total"] - revision["clauses_analyzed"]
+    assert {delta["status"] for delta in revision["clauses"]} - {"unchanged"} == statuses
+    # The new map is what a full analysis of the revised text would store
+    assert clause_map == risk_engine.analyze_with_clause_map(revised, EXPECTATIONS)[1]
+
+
+def test_other_version_is_reanalyzed(document):
+    """A map from another model or pattern table is not reused, but the result is the same."""
+    text, previous = document
+    revised = revise(text, modify=[2])
+    risk_data, _, revision = risk_engine.analyze_revision(revised, EXPECTATIONS, {**previous, "version": "other"})
+
+    assert risk_data == risk_engine.analyze(revised, EXPECTATIONS)
+    assert not revision["incremental"]
+    assert revision["clauses_analyzed"] == revision["clauses_total"]
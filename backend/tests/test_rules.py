@@ -0,0 +1,143 @@
+# RuleEngine must give the same findings whichever scan strategy it picks
+# (str.find per phrase, pyahocorasick, pure-Python automaton), and the same
+# findings and score as the substring checks it replaced.
+import random
+import pytest
+from app.services import rules
+from app.services.rules import RULES, Rule, RuleEngine
+
+STRATEGIES = ["find", "pure", "automaton"]
+
+# Co-occurrence, proximity and expectation rules over a small vocabulary
+TABLE = [
+    Rule("Payment Terms", "High", 20, "Net 90.", triggers=("90 days", "ninety days"),
+         expectation_mismatch=("net 15", "net 30"), expectation_default="Concern"),
+    Rule("Termination", "Critical", 30, "No notice.", triggers=("immediately",), requires=("without notice",)),
+    Rule("Liability", "Severe", 40, "Unlimited.", triggers=("unlimited",), requires=("liability",), proximity=25),
+    Rule("Indemnity", "High", 10, "Broad indemnity.", triggers=("indemnify", "hold harmless"),
+         requires=("all claims", "third party"), proximity=40),
+    Rule("Scope", "Medium", 5, "Open scope.", triggers=("at any time",), requires=("scope",),
+         expectation_mismatch=("fixed scope",))
+]
+WORDS = [
+    "90 days", "ninety days", "immediately", "without notice", "unlimited", "liability", "indemnify",
+    "hold harmless", "all claims", "third party", "at any time", "scope", "the client", "shall", "pay",
+    "Unlimited", "WITHOUT NOTICE", "İ", "and", "\n\n", "2.", "Liability"
+]
+
+
+def engine_with(table, strategy, monkeypatch):
+    """RuleEngine forced onto one scan strategy, as in benchmarks/bench_rule_scan.py."""
+    if strategy == "automaton" and rules.ahocorasick is None:
+        pytest.skip("pyahocorasick not installed")
+    with monkeypatch.context() as patch:
+        if strategy == "pure":
+            patch.setattr(rules, "ahocorasick", None)
+        threshold = float("inf") if strategy == "find" else 0
+        patch.setattr(rules, "AUTOMATON_MIN_PHRASES", threshold)
+        patch.setattr(rules, "PURE_AUTOMATON_MIN_PHRASES", threshold)
+        engine = RuleEngine(table)
+    assert (engine._automaton is None) == (strategy == "find")
+    return engine
+
+
+def substring_rules(contract_text: str, user_expectations: str):
+    """analyze_rules as it was before the rule engine: one `in` test per phrase."""
+    risks, score = [], 100
+    contract_lower, expectations_lower = contract_text.lower(), user_expectations.lower()
+    if "90 days" in contract_lower:
+        mismatch = "net 15" in expectations_lower or "net 30" in expectations_lower
+        risks.append(("Payment Terms", "High", "Payment terms are Net 90, which is very long.", "Mismatch" if mismatch else "Concern"))
+        score -= 20
+    if "immediately" in contract_lower and "without notice" in contract_lower:
+        risks.append(("Termination", "Critical", "Client can terminate immediately without cause. You are not protected.", "Mismatch"))
+        score -= 30
+    if "unlimited" in contract_lower:
+        risks.append(("Liability", "Severe", "Your liability is unlimited. This is a major financial risk.", "Mismatch"))
+        score -= 40
+    return risks, score
+
+
+def brute_force(table, text: str, user_expectations: str):
+    """Every rule checked against every occurrence of every phrase."""
+    # "İ".lower() is two characters; offsets are reported against the original text
+    lowered = rules.lower_preserving_offsets(text)
+
+    def starts(phrase):
+        return [i for i in range(len(lowered)) if lowered.startswith(phrase, i)]
+
+    risks, penalty = [], 0
+    for rule in table:
+        match = None
+        for trigger in rule.triggers:
+            for start in starts(trigger):
+                span = (start, start + len(trigger))
+                for required in rule.requires:
+                    candidates = starts(required)
+                    if rule.proximity is not None:
+                        candidates = [s for s in candidates if abs(s - start) <= rule.proximity]
+                    if not candidates:
+                        span = None
+                        break
+                    span = (min(span[0], candidates[0]), max(span[1], candidates[0] + len(required)))
+                if span is not None:
+                    match = span
+                    break
+            if match is not None:
+                break
+        if match is not None:
+            mismatch = any(p in user_expectations.lower() for p in rule.expectation_mismatch)
+            risks.append((rule.category, "Mismatch" if mismatch else rule.expectation_default, match))
+            penalty += rule.penalty
+    return risks, penalty
+
+
+def summary(risks):
+    return [(r["category"], r["expectation_check"], (r["start"], r["end"])) for r in risks]
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+@pytest.mark.parametrize("expectations", ["", "I expect net 30 payment", "fixed scope please"])
+def test_current_rules_match_substring_checks(sample_contract, strategy, expectations, monkeypatch):
+    engine = engine_with(RULES, strategy, monkeypatch)
+    variants = [
+        sample_contract,
+        sample_contract.replace("without notice", "with notice"),
+        sample_contract.replace("90 days", "30 days").replace("unlimited", "capped"),
+        sample_contract.upper(),
+        ""
+    ]
+    for text in variants:
+        risks, penalty = engine.analyze(text, expectations)
+        expected, score = substring_rules(text, expectations)
+        assert [(r["category"], r["severity"], r["finding"], r["expectation_check"]) for r in risks] == expected
+        assert 100 - penalty == score
+        for risk in risks:
+            assert text[risk["start"]:risk["end"]]
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_co_occurrence_proximity_and_expectations(strategy, monkeypatch):
+    engine = engine_with(TABLE, strategy, monkeypatch)
+    rng = random.Random(6)
+    for _ in range(300):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 40)))
+        expectations = rng.choice(["", "net 30 please", "a fixed scope"])
+        risks, penalty = engine.analyze(text, expectations)
+        expected, expected_penalty = brute_force(TABLE, text, expectations)
+        assert summary(risks) == [(c, e, span) for c, e, span in expected], text
+        assert penalty == expected_penalty
+
+
+def test_strategies_agree_on_many_phrases(sample_contract, monkeypatch):
+    """A larger table with overlapping phrases: all three scans return the same hits and findings."""
+    table = TABLE + [Rule("Synthetic", "Low", 1, p, triggers=(p,)) for p in sample_contract.lower().split()[:80]]
+    rng = random.Random(7)
+    text = " ".join(rng.choice(WORDS + sample_contract.split()) for _ in range(2000))
+    results = []
+    for strategy in STRATEGIES:
+        if strategy == "automaton" and rules.ahocorasick is None:
+            continue
+        engine = engine_with(table, strategy, monkeypatch)
+        results.append((engine.scan(text), engine.analyze(text, "net 30")))
+    assert all(result == results[0] for result in results)
@@ -0,0 +1,79 @@
+# Clause segmentation: the exact spans for abbreviations, decimals, numbered
+# sections, headings, soft wraps and the other boundary cases.
+import pytest
+from app.services.segmenter import expand_to_clauses, iter_stream_clauses, segment_clauses
+
+CASES = [
+    # Abbreviations
+    ("The laws of the U.S. apply. Notices go to Acme Inc. in writing.",
+     ["The laws of the U.S. apply.", "Notices go to Acme Inc. in writing."]),
+    ("Acme Corp. and Globex Ltd. agree. See Sec. 4 and Art. 2 for details.",
+     ["Acme Corp. and Globex Ltd. agree.", "See Sec. 4 and Art. 2 for details."]),
+    ("e.g. the client, i.e. Acme, etc. apply here. Done.",
+     ["e.g. the client, i.e. Acme, etc. apply here.", "Done."]),
+    ("Fees are 10 U.S. dollars. Mr. Smith signs.",
+     ["Fees are 10 U.S. dollars.", "Mr. Smith signs."]),
+    # Decimal amounts
+    ("The fee is $1,000.00 per month. Late fees are 1.5% monthly.",
+     ["The fee is $1,000.00 per month.", "Late fees are 1.5% monthly."]),
+    # Numbered sections and sub-clauses
+    ("2.1 Payment is due in 30 days. 2.2 Interest accrues daily.",
+     ["2.1 Payment is due in 30 days.", "2.2 Interest accrues daily."]),
+    ("The Contractor shall:\n(a) deliver the work;\n(b) fix defects.",
+     ["The Contractor shall:", "(a) deliver the work;", "(b) fix defects."]),
+    ("iv. Fourth item here. v) Fifth item.",
+     ["iv. Fourth item here.", "v) Fifth item."]),
+    # All-caps headings stay with the clause they introduce
+    ("1. PAYMENT. Client pays monthly. 2. TERMINATION. Either party may terminate.",
+     ["1. PAYMENT. Client pays monthly.", "2. TERMINATION. Either party may terminate."]),
+    ("CONFIDENTIALITY. Each party keeps secrets.\n\nGOVERNING LAW. Delaware law applies.",
+     ["CONFIDENTIALITY. Each party keeps secrets.", "GOVERNING LAW. Delaware law applies."]),
+    # Soft wraps do not end a clause; blank lines do
+    ("The Contractor shall deliver the work\non time and within budget. It will\nreport weekly.",
+     ["The Contractor shall deliver the work\non time and within budget.", "It will\nreport weekly."]),
+    ("Payment\n\n\nis separate.", ["Payment", "is separate."]),
+    # Other terminators, closing quotes, whitespace
+    ("Is this binding? Yes! It is.", ["Is this binding?", "Yes!", "It is."]),
+    ('He said "stop." Then he left.', ['He said "stop."', "Then he left."]),
+    ("  Leading and trailing whitespace.   ", ["Leading and trailing whitespace."]),
+    ("", [])
+]
+
+
+def located(text: str, clauses: list) -> list:
+    """(start, end) of each expected clause, searched in order."""
+    spans, position = [], 0
+    for clause in clauses:
+        start = text.index(clause, position)
+        spans.append((start, start + len(clause)))
+        position = start + len(clause)
+    return spans
+
+
+@pytest.mark.parametrize("text,clauses", CASES)
+def test_spans(text, clauses):
+    assert segment_clauses(text) == located(text, clauses)
+
+
+@pytest.mark.parametrize("text,clauses", CASES)
+def test_stream_spans(text, clauses):
+    pieces = [text[i:i + 3] for i in range(0, len(text), 3)]
+    expected = [(start, end, text[start:end]) for start, end in located(text, clauses)]
+    assert list(iter_stream_clauses(pieces, lookahead=8)) == expected
+
+
+def test_min_length():
+    text = "Yes. The client pays within thirty days. No."
+    assert segment_clauses(text, min_length=4) == located(text, ["The client pays within thirty days."])
+
+
+@pytest.mark.parametrize("start,end,expected", [
+    (10, 14, (0, 24)),   # inside the first clause
+    (20, 30, (0, 49)),   # straddles the first two
+    (30, 34, (25, 49)),  # inside the second
+    (24, 25, (24, 25)),  # the gap between clauses
+])
+def test_expand_to_clauses(start, end, expected):
+    spans = segment_clauses("The client pays monthly. Contractor works weekly.")
+    assert spans == [(0, 24), (25, 49)]
+    assert expand_to_clauses(spans, start, end) == expected
@@ -0,0 +1,90 @@
+# The batched pattern scoring (one matmul + reduceat over PatternIndex) must give
+# the same semantic findings as the original per-category cosine loop.
+import numpy as np
+import pytest
+from app.services.similarity import PatternIndex, normalize_rows
+
+THRESHOLD = 0.45
+
+PATTERNS = {
+    "Payment Terms": np.array([[1, 0, 0, 0], [0.9, 0.1, 0, 0]], dtype=np.float32),
+    "Termination": np.array([[0, 1, 0, 0], [0, 0.8, 0.6, 0], [0, 0.5, 0, 0.5]], dtype=np.float32),
+    "Liability": np.array([[0, 0, 0, 1]], dtype=np.float32)
+}
+
+# (sentence, embedding): a clear match per category, a tie between two categories,
+# a near miss, a zero vector, unnormalized inputs and a repeated sentence
+SENTENCES = [
+    ("Payment is due within ninety days.", [2.0, 0.1, 0, 0]),
+    ("Either party may end this agreement.", [0, 3.0, 1.0, 0]),
+    ("Liability of the contractor is unlimited.", [0, 0, 0.1, 0.7]),
+    ("Payment or termination, equally.", [1.0, 1.0, 0, 0]),
+    ("Nothing in particular happens here.", [-1.0, 0, 1.0, 0]),
+    ("Blank embedding of a clause.", [0, 0, 0, 0]),
+    ("Payment is due within ninety days.", [2.0, 0.1, 0, 0]),
+    ("Termination with a liability angle.", [0, 0.4, 0, 0.6])
+]
+
+
+def cosine_loop(sentences, embeddings, patterns, threshold):
+    """The scoring loop PatternIndex replaced: every sentence against every category."""
+    risks = []
+    for i, embedding in enumerate(embeddings):
+        for category, pattern_embeddings in patterns.items():
+            norms = np.linalg.norm(pattern_embeddings, axis=1) * (np.linalg.norm(embedding) or 1.0)
+            max_sim = np.max(pattern_embeddings @ embedding / norms)
+            if max_sim > threshold:
+                risks.append({
+                    "category": category,
+                    "finding": sentences[i],
+                    "severity": "High" if max_sim > 0.65 else "Medium",
+                    "confidence": float(max_sim)
+                })
+    refined, seen = [], set()
+    for risk in sorted(risks, key=lambda x: x["confidence"], reverse=True):
+        if risk["finding"] not in seen:
+            refined.append(risk)
+            seen.add(risk["finding"])
+    return refined
+
+
+def summary(risks):
+    return [(r["category"], r["finding"], r["severity"], pytest.approx(r["confidence"], abs=1e-6)) for r in risks]
+
+
+def test_category_scores_are_per_category_maxima():
+    index = PatternIndex.from_embeddings(PATTERNS)
+    embeddings = np.array([e for _, e in SENTENCES], dtype=np.float32)
+    scores = index.category_scores(embeddings)
+    assert scores.shape == (len(SENTENCES), len(PATTERNS))
+    for column, patterns in enumerate(PATTERNS.values()):
+        expected = (normalize_rows(embeddings) @ normalize_rows(patterns).T).max(axis=1)
+        np.testing.assert_allclose(scores[:, column], expected, atol=1e-6)
+
+
+def test_best_matches_keep_strictly_above_threshold():
+    index = PatternIndex.from_embeddings({"A": np.array([[1, 0]], dtype=np.float32), "B": np.array([[0, 1]], dtype=np.float32)})
+    # Row 0 leans to B, row 1 ties A and B (the first category wins), row 2 is a zero vector
+    keep, categories, confidences = index.best_matches(np.array([[0.6, 0.8], [1, 1], [0, 0]], dtype=np.float32), 0.5)
+    assert keep.tolist() == [0, 1]
+    assert categories.tolist() == [1, 0]
+    assert confidences == pytest.approx([0.8, np.sqrt(0.5)])
+    # A similarity equal to the threshold is not a match
+    keep, _, _ = index.best_matches(np.array([[2, 0]], dtype=np.float32), 1.0)
+    assert keep.tolist() == []
+
+
+def test_findings_match_cosine_loop(semantic, monkeypatch):
+    monkeypatch.setattr(semantic, "pattern_index", PatternIndex.from_embeddings(PATTERNS))
+    sentences = [s for s, _ in SENTENCES]
+    embeddings = np.array([e for _, e in SENTENCES], dtype=np.float32)
+    spans = [(i * 100, i * 100 + len(s)) for i, s in enumerate(sentences)]
+
+    findings = semantic.assemble_findings(semantic._raw_findings(sentences, spans, embeddings, THRESHOLD))
+    expected = cosine_loop(sentences, embeddings, PATTERNS, THRESHOLD)
+
+    assert summary(findings) == summary(expected)
+    assert len(findings) == 5 # the near miss and the zero vector drop out, the repeat is reported once
+    for finding in findings:
+        start = spans[sentences.index(finding["finding"])][0]
+        assert (finding["start"], finding["end"]) == (start, start + len(finding["finding"]))
@@ -0,0 +1,54 @@
+# RiskEngine.analyze_stream must give the same result as analyze() on the joined
+# text: same findings (with their clause offsets), same order, same score.
+import pytest
+from corpus import make_contract
+from app.services.logic import risk_engine
+from app.services.rules import rule_engine
+
+EXPECTATIONS = "I expect Net 30 payment and 30 days notice before termination"
+
+# 1 and 7 put boundaries inside nearly every phrase and clause; 4096 is one piece per page
+CHUNK_SIZES = [1, 7, 64, 4096]
+
+
+def chunks(text: str, size: int):
+    return iter([text[i:i + size] for i in range(0, len(text), size)])
+
+
+def split_at(text: str, cuts: list):
+    cuts = [0] + sorted(set(cuts)) + [len(text)]
+    return iter([text[start:end] for start, end in zip(cuts, cuts[1:]) if end > start])
+
+
+def corpus_documents():
+    return [make_contract(seed, pages=pages, risk_density=density)
+            for seed, (pages, density) in enumerate([(0.3, 0.0), (1, 0.3), (3, 0.6), (3, 1.0)])]
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_sample_contract(semantic, sample_contract, size):
+    expected = risk_engine.analyze(sample_contract, EXPECTATIONS)
+    assert {risk["expectation_check"] for risk in expected["risks"]} >= {"Mismatch", "AI Flagged"}
+    assert risk_engine.analyze_stream(chunks(sample_contract, size), EXPECTATIONS) == expected
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+@pytest.mark.parametrize("document", range(len(corpus_documents())))
+def test_corpus(semantic, document, size):
+    text = corpus_documents()[document]
+    expected = risk_engine.analyze(text, EXPECTATIONS)
+    assert risk_engine.analyze_stream(chunks(text, size), EXPECTATIONS) == expected
+
+
+def test_boundaries_inside_rule_phrases(semantic, sample_contract):
+    """Every occurrence of every rule phrase split in the middle, all in the same stream."""
+    lowered = sample_contract.lower()
+    cuts = []
+    for phrase in {p for rule in rule_engine.rules for p in rule.triggers + rule.requires}:
+        start = lowered.find(phrase)
+        while start != -1:
+            cuts.append(start + len(phrase) // 2)
+            start = lowered.find(phrase, start + 1)
+    assert cuts
+    expected = risk_engine.analyze(sample_contract, EXPECTATIONS)
+    assert risk_engine.analyze_stream(split_at(sample_contract, cuts), EXPECTATIONS) == expected